@@ -10,6 +10,7 @@ from google.adk.models.google_llm import Gemini
 from google.adk.runners import InMemoryRunner
 from google.adk.tools import google_search
 from google.genai import types
+from services.context_accounting import ContextAccounting
 print("ADK components imported")
 
 #in case of errors, we want to automatically retry the request
@@ -33,13 +34,19 @@ root_agent = Agent(
 )
 print("root agent defined")
 
+# prompt and response tokens, context events and state bytes of every model call.
+# CONTEXT_ACCOUNTING=<file> (or "console") exports them as OpenTelemetry JSON lines
+context_accounting = ContextAccounting(export = os.getenv("CONTEXT_ACCOUNTING"))
+
 #and here we make a runner to orchestrate
 async def main():
-    runner = InMemoryRunner(agent = root_agent)
+    runner = InMemoryRunner(agent = root_agent, plugins = [context_accounting])
     print("runner created")
 
     user_question = input("Ask the agent a question: ")
     response = await runner.run_debug(user_question)
     print(response)
+    print("context per agent:", context_accounting.summary())
 
-asyncio.run(main())
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
@@ -3,15 +3,20 @@
 import os
 from dotenv import load_dotenv, dotenv_values
 import asyncio
+import re
 load_dotenv() 
 print("environment keys loaded")
 # os.getenv("GOOGLE_API_KEY")
 
 from google.adk.agents import Agent, SequentialAgent, ParallelAgent, LoopAgent
+from google.adk.agents.callback_context import CallbackContext
 from google.adk.models.google_llm import Gemini
 from google.adk.runners import InMemoryRunner
 from google.adk.tools import AgentTool, FunctionTool, google_search
 from google.genai import types
+from services.context_accounting import ContextAccounting
+from services.near_duplicates import NearDuplicateIndex, split_snippets
+from services.search_cache import CachedAgentTool, SearchCache
 print("ADK components imported")
 
 # in case of errors, we want to automatically retry the request
@@ -51,6 +56,45 @@ summary_agent = Agent(
 )
 print("summary_agent created")
 
+# repeated research topics are answered from a cache instead of re-running ResearchAgent
+search_cache = SearchCache(
+    path = os.getenv("SEARCH_CACHE_PATH", "search_cache.db"),
+    ttl = float(os.getenv("SEARCH_CACHE_TTL", "3600")),
+)
+
+# findings this session already reported are collapsed before they reach the summarizer;
+# findings from other sessions are kept (a repeated query must still get its summary),
+# but flagged as seen before
+findings_index = NearDuplicateIndex(path = os.getenv("FINDINGS_INDEX_PATH", "research_findings.db"))
+
+
+def collapse_findings(findings: str, scope: str) -> tuple[str, int]:
+    """drops snippets that nearly duplicate one already reported in `scope` (a session id);
+    returns (text, dropped)"""
+    kept = []
+    snippets = split_snippets(findings)
+    for snippet in snippets:
+        matches = findings_index.record(snippet, scope = scope)
+        if any(match.seen_in_scope for match in matches):
+            continue
+        kept.append(f"(seen before) {snippet}" if matches else snippet)
+    dropped = len(snippets) - len(kept)
+    if snippets and not kept:
+        kept.append(f"(all {dropped} findings were already reported in this conversation)")
+    return "\n".join(kept), dropped
+
+
+def collapse_research_tool_output(tool, args, tool_context, tool_response):
+    """after_tool_callback: collapses repeated findings returned by ResearchAgent"""
+    if tool.name != research_agent.name or not isinstance(tool_response, str):
+        return None
+    findings, dropped = collapse_findings(tool_response, tool_context.session.id)
+    if not dropped:
+        return None
+    tool_context.state["collapsed_findings"] = dropped
+    return {"result": findings}
+
+
 #root agent to manage both
 root_agent = Agent(
     name = "RootAgent", 
@@ -63,18 +107,126 @@ root_agent = Agent(
     2. Next, after receiving the research findings, you MUST call the `SummarizerAgent` tool to create a concise summary.
     3. Finally, present the final summary clearly to the user as your response.""",
     # We wrap the sub-agents in `AgentTool` to make them callable tools for the root agent.
-    tools = [AgentTool(research_agent), AgentTool(summary_agent)],
+    tools = [CachedAgentTool(research_agent, cache = search_cache), AgentTool(summary_agent)],
+    after_tool_callback = collapse_research_tool_output,
 )
 print("root agent created")
 
+# 3. Parallel research pipeline
+# instead of the coordinator calling ResearchAgent and then SummaryAgent one turn at a time,
+# split the query into subtopics locally, research them all at once, then summarize once
+
+RESEARCH_FANOUT = 3  # number of parallel research agents
+
+# angles to research when the query is a single topic rather than an explicit list
+RESEARCH_ANGLES = [
+    "background and key concepts",
+    "latest developments and results",
+    "open challenges, risks and criticism",
+]
+
+
+def split_into_subtopics(query: str, max_subtopics: int = RESEARCH_FANOUT) -> list[str]:
+    """Splits a query into at most max_subtopics subtopics, without a model call.
+
+    Explicit lists (separated by ';' or new lines, optionally numbered or bulleted)
+    are used as given; a single topic is split into fixed research angles.
+    """
+    items = [
+        re.sub(r"^\s*(?:\d+[.)]|[-*\u2022])\s*", "", item).strip()
+        for item in re.split(r"[;\n]", query)
+    ]
+    items = [item for item in items if item]
+    if len(items) > 1:
+        return items[:max_subtopics]
+    topic = items[0] if items else query.strip()
+    return [f"{topic} ({angle})" for angle in RESEARCH_ANGLES[:max_subtopics]]
+
+
+def plan_subtopics(callback_context: CallbackContext):
+    """before_agent_callback: writes subtopic_0..N into state for the parallel researchers"""
+    query = ""
+    if callback_context.user_content and callback_context.user_content.parts:
+        query = " ".join(part.text for part in callback_context.user_content.parts if part.text)
+    subtopics = split_into_subtopics(query)
+    for i in range(RESEARCH_FANOUT):
+        callback_context.state[f"subtopic_{i}"] = subtopics[i] if i < len(subtopics) else ""
+        callback_context.state[f"research_findings_{i}"] = ""
+    return None
+
+
+def skip_without_subtopic(i: int):
+    """before_agent_callback factory: researcher i sits this run out if it has no subtopic"""
+    def callback(callback_context: CallbackContext):
+        if not callback_context.state.get(f"subtopic_{i}"):
+            return types.Content(role="model", parts=[types.Part(text="")])
+        return None
+    return callback
+
+
+def merge_findings(callback_context: CallbackContext):
+    """before_agent_callback: merges every researcher's output into {research_findings},
+    collapsing findings that more than one researcher (or an earlier turn) reported"""
+    sections = []
+    collapsed = 0
+    for i in range(RESEARCH_FANOUT):
+        subtopic = callback_context.state.get(f"subtopic_{i}")
+        findings = callback_context.state.get(f"research_findings_{i}")
+        if subtopic and findings:
+            findings, dropped = collapse_findings(findings, callback_context.session.id)
+            collapsed += dropped
+            sections.append(f"## {subtopic}\n{findings}")
+    callback_context.state["research_findings"] = "\n\n".join(sections)
+    callback_context.state["collapsed_findings"] = collapsed
+    return None
+
+
+# one research agent per subtopic, each writing its own output_key
+subtopic_research_agents = [
+    research_agent.clone(
+        update = {
+            "name": f"ResearchAgent_{i}",
+            "instruction": f"""You are a specialized research agent. Your only job is to use the google_search tool
+    to find 2-3 pieces of relevant information on this subtopic: {{subtopic_{i}}}
+    Present the findings with citations.""",
+            "output_key": f"research_findings_{i}",
+            "before_agent_callback": skip_without_subtopic(i),
+        }
+    )
+    for i in range(RESEARCH_FANOUT)
+]
+
+research_pipeline = SequentialAgent(
+    name = "ResearchPipeline",
+    description = "Researches subtopics in parallel, then summarizes the merged findings once.",
+    before_agent_callback = plan_subtopics,
+    sub_agents = [
+        ParallelAgent(name = "ParallelResearch", sub_agents = subtopic_research_agents),
+        summary_agent.clone(update = {"before_agent_callback": merge_findings}),
+    ],
+)
+print("research pipeline created")
+
+# pick the orchestration: "coordinator" (root agent calling tools) or "pipeline" (parallel fan-out)
+RESEARCH_MODE = os.getenv("RESEARCH_MODE", "coordinator")
+
+# prompt and response tokens, context events and state bytes of every model call.
+# CONTEXT_ACCOUNTING=<file> (or "console") exports them as OpenTelemetry JSON lines
+context_accounting = ContextAccounting(export = os.getenv("CONTEXT_ACCOUNTING"))
+
 
 #and here we make a runner to orchestrate
 async def main():
-    runner = InMemoryRunner(agent = root_agent)
-    print("runner created")
+    runner = InMemoryRunner(
+        agent = research_pipeline if RESEARCH_MODE == "pipeline" else root_agent,
+        plugins = [context_accounting],
+    )
+    print(f"runner created ({RESEARCH_MODE} mode)")
 
     user_question = input("Ask the agent a question: ")
     response = await runner.run_debug(user_question)
     print(response)
+    print("context per agent:", context_accounting.summary())
     
-asyncio.run(main())
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
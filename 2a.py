@@ -2,7 +2,15 @@
 # 1. setup
 import os
 from dotenv import load_dotenv, dotenv_values
+import ast
 import asyncio
+import decimal
+import math
+import operator
+import re
+from collections import defaultdict
+import numpy as np
+from pydantic import BaseModel, Field, ValidationError, field_validator
 load_dotenv() 
 print("environment keys loaded")
 # os.getenv("GOOGLE_API_KEY")
@@ -13,8 +21,9 @@ from google.adk.agents import LlmAgent
 from google.adk.models.google_llm import Gemini
 from google.adk.runners import InMemoryRunner
 from google.adk.sessions import InMemorySessionService
-from google.adk.tools import google_search, AgentTool, ToolContext
+from google.adk.tools import google_search, AgentTool, FunctionTool, ToolContext
 from google.adk.code_executors import BuiltInCodeExecutor
+from services.context_accounting import ContextAccounting
 
 print("ADK components imported successfully.")
 
@@ -51,6 +60,139 @@ print("helper function defined")
 # 2. Custom Tools
 
 #just making more helper functions i suppose
+
+# company fee structure, keyed by the canonical payment method name
+FEE_DATABASE = {
+    "platinum card": 0.02,
+    "gold card": 0.035,
+    "bank transfer": 0.01,
+}
+
+# other ways users (and the model) name the same methods
+FEE_ALIASES = {
+    "platinum card": ["platinum credit card", "platinum debit card", "platinum", "amex platinum", "platinum visa"],
+    "gold card": ["gold credit card", "gold debit card", "gold", "gold visa"],
+    "bank transfer": ["wire transfer", "bank wire", "wire", "ach transfer", "ach", "sepa transfer", "direct bank transfer"],
+}
+
+# words that say nothing about which method is meant
+FEE_STOPWORDS = {
+    "a", "an", "the", "my", "our", "your", "with", "using", "use", "via", "by",
+    "through", "from", "to", "for", "of", "pay", "paying", "payment", "method",
+    "credit", "debit", "account",
+}
+
+
+def _stem(word: str) -> str:
+    """Very small suffix stripper: cards -> card, wired/wiring -> wir, transferring -> transfer"""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    if len(word) > 5 and word.endswith("ing"):
+        word = word[:-3]
+    elif len(word) > 4 and word.endswith("ed"):
+        word = word[:-2]
+    if len(word) > 4 and word[-1] == word[-2]:
+        word = word[:-1]
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+class FeeIndex:
+    """Maps free-form payment method names onto fee entries in one lookup.
+
+    Lookups try, in order: the canonical name, a normalized alias key
+    (stemmed tokens, stopwords removed, order ignored), then partial matches
+    ranked by IDF-weighted token overlap. Every lookup is counted so we can
+    see how many misses (and model retries) the aliasing saves.
+    """
+
+    def __init__(self, fees: dict, aliases: dict, min_score: float = 0.5):
+        self.fees = dict(fees)
+        self.min_score = min_score
+        self.alias_keys = {}
+        self.postings = defaultdict(set)
+        for method in self.fees:
+            for name in [method, *aliases.get(method, [])]:
+                tokens = self.tokens(name)
+                self.alias_keys[self.key(tokens)] = method
+                for token in tokens:
+                    self.postings[token].add(method)
+        # rarer tokens say more about which method is meant
+        self.idf = {
+            token: math.log(1 + len(self.fees) / len(methods))
+            for token, methods in self.postings.items()
+        }
+        self.unknown_weight = max(self.idf.values(), default=1.0)
+        self.metrics = {"exact": 0, "alias": 0, "partial": 0, "miss": 0}
+
+    @staticmethod
+    def tokens(text: str) -> list:
+        return [
+            _stem(word)
+            for word in re.findall(r"[a-z0-9]+", text.lower())
+            if word not in FEE_STOPWORDS
+        ]
+
+    @staticmethod
+    def key(tokens: list) -> str:
+        return " ".join(sorted(set(tokens)))
+
+    def rank(self, tokens: list) -> list:
+        """Returns [(method, score)] best first; score is the weighted share of query tokens matched"""
+        total = sum(self.idf.get(token, self.unknown_weight) for token in set(tokens))
+        if not total:
+            return []
+        scores = defaultdict(float)
+        for token in set(tokens):
+            for method in self.postings.get(token, ()):
+                scores[method] += self.idf[token]
+        return sorted(
+            ((method, score / total) for method, score in scores.items()),
+            key=lambda item: (-item[1], item[0]),
+        )
+
+    def lookup(self, method: str):
+        """Resolves a method name.
+
+        Returns:
+            (canonical method or None, ranked suggestions for a miss)
+        """
+        lowered = method.strip().lower()
+        if lowered in self.fees:
+            self.metrics["exact"] += 1
+            return lowered, []
+        tokens = self.tokens(method)
+        canonical = self.alias_keys.get(self.key(tokens))
+        if canonical is not None:
+            self.metrics["alias"] += 1
+            return canonical, []
+        ranked = self.rank(tokens)
+        best_is_clear = len(ranked) == 1 or (len(ranked) > 1 and ranked[0][1] > ranked[1][1])
+        if ranked and ranked[0][1] >= self.min_score and best_is_clear:
+            self.metrics["partial"] += 1
+            return ranked[0][0], []
+        self.metrics["miss"] += 1
+        return None, [name for name, _ in ranked] or sorted(self.fees)
+
+    def stats(self) -> dict:
+        """Hit/miss counters; every alias or partial hit is a lookup that used to fail
+        and cost the agent an extra model turn to recover from"""
+        lookups = sum(self.metrics.values())
+        hits = lookups - self.metrics["miss"]
+        return {
+            **self.metrics,
+            "lookups": lookups,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "model_turns_saved": self.metrics["alias"] + self.metrics["partial"],
+        }
+
+
+fee_index = FeeIndex(FEE_DATABASE, FEE_ALIASES)
+
+
 def get_fee_for_payment_method(method: str) -> dict:
     """Looks up the transaction fee percentage for a given payment method.
 
@@ -63,30 +205,134 @@ def get_fee_for_payment_method(method: str) -> dict:
 
     Returns:
         Dictionary with status and fee information.
-        Success: {"status": "success", "fee_percentage": 0.02}
-        Error: {"status": "error", "error_message": "Payment method not found"}
+        Success: {"status": "success", "fee_percentage": 0.02, "payment_method": "platinum card"}
+        Error: {"status": "error", "error_message": "Payment method not found", "suggestions": [...]}
     """
     # very important to tell it what you want ^
 
-    fee_database = {
-        "platinum card": 0.02,
-        "gold card": 0.035,
-        "bank transfer": 0.01
-    }
-
-    fee = fee_database.get(method.lower())
-    if fee is not None:
-        return {"status": "success", "fee_percentage": fee}
+    canonical, suggestions = fee_index.lookup(method)
+    if canonical is not None:
+        return {
+            "status": "success",
+            "fee_percentage": FEE_DATABASE[canonical],
+            "payment_method": canonical,
+        }
     else: 
         return {"status": "error",
                 "error_message": f"payment method '{method}' not found",
+                "suggestions": suggestions,
                 }
 
 print("fee lookup function created")
 print(f"test: {get_fee_for_payment_method('platinum card')}")
+print(f"test: {get_fee_for_payment_method('platinum credit card')}")
+
+
+#another helper, backed by a rate engine:
+
+# static data simulating a live exchange rate API: units of each currency per 1 USD
+# this would call something like: requests.get("api.exchangerates.com")
+USD_RATES = {
+    "USD": 1.0,  # US Dollar
+    "EUR": 0.93,  # Euro
+    "JPY": 157.50,  # Japanese Yen
+    "INR": 83.58,  # Indian Rupee
+    "GBP": 0.79,  # Pound Sterling
+    "CHF": 0.90,  # Swiss Franc
+    "CAD": 1.37,  # Canadian Dollar
+    "AUD": 1.51,  # Australian Dollar
+    "NZD": 1.64,  # New Zealand Dollar
+    "CNY": 7.24,  # Chinese Yuan
+    "HKD": 7.82,  # Hong Kong Dollar
+    "SGD": 1.35,  # Singapore Dollar
+    "KRW": 1372.0,  # South Korean Won
+    "TWD": 32.3,  # New Taiwan Dollar
+    "THB": 36.6,  # Thai Baht
+    "IDR": 16250.0,  # Indonesian Rupiah
+    "MYR": 4.71,  # Malaysian Ringgit
+    "PHP": 58.6,  # Philippine Peso
+    "VND": 25450.0,  # Vietnamese Dong
+    "PKR": 278.0,  # Pakistani Rupee
+    "AED": 3.6725,  # UAE Dirham
+    "SAR": 3.75,  # Saudi Riyal
+    "ILS": 3.72,  # Israeli New Shekel
+    "TRY": 32.4,  # Turkish Lira
+    "ZAR": 18.4,  # South African Rand
+    "EGP": 47.1,  # Egyptian Pound
+    "NGN": 1480.0,  # Nigerian Naira
+    "KES": 131.0,  # Kenyan Shilling
+    "SEK": 10.6,  # Swedish Krona
+    "NOK": 10.7,  # Norwegian Krone
+    "DKK": 6.94,  # Danish Krone
+    "PLN": 3.97,  # Polish Zloty
+    "CZK": 23.1,  # Czech Koruna
+    "HUF": 362.0,  # Hungarian Forint
+    "RON": 4.63,  # Romanian Leu
+    "MXN": 17.1,  # Mexican Peso
+    "BRL": 5.12,  # Brazilian Real
+    "ARS": 905.0,  # Argentine Peso
+    "CLP": 925.0,  # Chilean Peso
+    "COP": 3900.0,  # Colombian Peso
+    "PEN": 3.74,  # Peruvian Sol
+}
+
+
+class RateEngine:
+    """Holds every cross rate between the supported currencies in one matrix.
+
+    Rates are triangulated once through a pivot currency, so
+    matrix[i, j] is how many units of currency j one unit of currency i buys.
+    Single lookups are a dict hit plus an array index; batches of conversions
+    are a single fancy-indexing multiply.
+    """
+
+    def __init__(self, pivot_rates: dict, pivot: str = "USD"):
+        if pivot_rates.get(pivot) != 1.0:
+            raise ValueError(f"pivot_rates must be quoted per 1 {pivot}")
+        self.codes = np.array(sorted(pivot_rates))
+        self.index = {code: i for i, code in enumerate(self.codes.tolist())}
+        per_pivot = np.array([pivot_rates[code] for code in self.codes.tolist()], dtype=np.float64)
+        self.matrix = per_pivot[np.newaxis, :] / per_pivot[:, np.newaxis]
+        self.matrix.setflags(write=False)
+
+    def rate(self, base_currency: str, target_currency: str):
+        """Returns the base->target rate as a float, or None if either code is unknown"""
+        i = self.index.get(base_currency.strip().upper())
+        j = self.index.get(target_currency.strip().upper())
+        if i is None or j is None:
+            return None
+        return float(self.matrix[i, j])
+
+    def _indices(self, currencies) -> np.ndarray:
+        # normalize each distinct code once, then scatter back over the array
+        codes, inverse = np.unique(np.asarray(currencies, dtype=str), return_inverse=True)
+        lookup = np.array([self.index.get(code.strip().upper(), -1) for code in codes.tolist()], dtype=np.intp)
+        if np.any(lookup < 0):
+            raise KeyError(f"unsupported currencies: {codes[lookup < 0].tolist()}")
+        return lookup[inverse].reshape(np.shape(currencies))
+
+    def convert(self, amounts, base_currencies, target_currencies) -> np.ndarray:
+        """Converts arrays of amounts in one vectorized call.
+
+        Args:
+            amounts: amounts in the base currencies (scalar or array)
+            base_currencies: ISO 4217 code(s) to convert from, broadcast against amounts
+            target_currencies: ISO 4217 code(s) to convert to, broadcast against amounts
+
+        Returns:
+            numpy array of converted amounts
+
+        Raises:
+            KeyError: if any currency code is not supported
+        """
+        rates = self.matrix[self._indices(base_currencies), self._indices(target_currencies)]
+        return np.asarray(amounts, dtype=np.float64) * rates
+
+
+rate_engine = RateEngine(USD_RATES)
+print(f"rate engine built: {len(rate_engine.codes)} currencies")
 
 
-#another helper:
 def get_exchange_rate(base_currency: str, target_currency: str) -> dict:
     """Looks up and returns the exchange rate between two currencies.
 
@@ -102,22 +348,8 @@ def get_exchange_rate(base_currency: str, target_currency: str) -> dict:
         Error: {"status": "error", "error_message": "Unsupported currency pair"}
     """
 
-    # static data simulating a live exchange rate API
-    # this would call something like: requests.get("api.exchangerates.com")
-    rate_database = {
-        "usd": {
-            "eur": 0.93,  # Euro
-            "jpy": 157.50,  # Japanese Yen
-            "inr": 83.58,  # Indian Rupee
-        }
-    }
-
-    # input validation and processing
-    base = base_currency.lower()
-    target = target_currency.lower()
-
     # return structured result and status
-    rate = rate_database.get(base, {}).get(target)
+    rate = rate_engine.rate(base_currency, target_currency)
     if rate is not None:
         return {"status": "success", "rate": rate}
     else:
@@ -194,52 +426,296 @@ calculation_agent = LlmAgent(
     code_executor = BuiltInCodeExecutor(),  # the built-in Code Executor Tool gives the agent code execution capabilities
 )
 
+# 4. A local calculator (no extra model call, no remote code execution)
+
+def _calc_divmod(left, right):
+    # Decimal's // and % truncate toward zero; floor them, as Python's int and float do (-7 // 2 == -4)
+    quotient, remainder = divmod(left, right)
+    if remainder and (remainder < 0) != (right < 0):
+        quotient, remainder = quotient - 1, remainder + right
+    return quotient, remainder
+
+
+# operators the calculator understands; anything else in the expression is rejected
+CALC_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: lambda left, right: _calc_divmod(left, right)[0],
+    ast.Mod: lambda left, right: _calc_divmod(left, right)[1],
+    ast.Pow: operator.pow,
+}
+CALC_UNARY_OPS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+CALC_MAX_LENGTH = 500
+CALC_MAX_EXPONENT = 100
+# largest power of ten any number or intermediate result may reach
+CALC_MAX_MAGNITUDE = 50
+
+# a fixed context so results never depend on whatever decimal settings the process has;
+# Overflow is trapped, so nested powers like (10**99)**100 stop at the first step past 1e50
+CALC_CONTEXT = decimal.Context(
+    prec=34,
+    rounding=decimal.ROUND_HALF_EVEN,
+    Emax=CALC_MAX_MAGNITUDE,
+    Emin=-CALC_MAX_MAGNITUDE,
+    traps=[decimal.Overflow, decimal.InvalidOperation, decimal.DivisionByZero],
+)
+
+
+def _calc_round(value, digits=0):
+    # money rounding: half up, unlike Python's round()
+    return value.quantize(decimal.Decimal(1).scaleb(-int(digits)), rounding=decimal.ROUND_HALF_UP)
+
+
+CALC_FUNCTIONS = {"round": _calc_round, "abs": abs, "min": min, "max": max}
+
+
+def _evaluate(node):
+    """Walks a parsed expression, allowing only numbers, arithmetic and CALC_FUNCTIONS"""
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        # repr() is the literal as written, so 0.93 stays exactly 0.93
+        value = decimal.Decimal(repr(node.value))
+        if not value.is_finite() or value.adjusted() > CALC_MAX_MAGNITUDE:
+            raise ValueError(f"numbers must be finite and below 1e{CALC_MAX_MAGNITUDE}")
+        return value
+    if isinstance(node, ast.BinOp) and type(node.op) in CALC_BINARY_OPS:
+        left, right = _evaluate(node.left), _evaluate(node.right)
+        if isinstance(node.op, ast.Pow) and (right != right.to_integral_value() or abs(right) > CALC_MAX_EXPONENT):
+            raise ValueError(f"exponents must be whole numbers up to {CALC_MAX_EXPONENT}")
+        return CALC_BINARY_OPS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in CALC_UNARY_OPS:
+        return CALC_UNARY_OPS[type(node.op)](_evaluate(node.operand))
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in CALC_FUNCTIONS
+        and not node.keywords
+    ):
+        return CALC_FUNCTIONS[node.func.id](*[_evaluate(arg) for arg in node.args])
+    raise ValueError(f"unsupported element in expression: {type(node).__name__}")
+
+
+def calculate(expression: str) -> dict:
+    """Evaluates an arithmetic expression exactly and returns the result.
+
+    Supports numbers, + - * / // % **, parentheses, and the functions
+    round(x, digits), abs(x), min(...), max(...). // and % round down, as
+    in Python (-7 // 2 is -4). Numbers and results must stay below 1e50.
+
+    Args:
+        expression: The arithmetic to evaluate, e.g. "1250 * (1 - 0.01) * 83.58".
+
+    Returns:
+        Dictionary with status and result.
+        Success: {"status": "success", "result": 103430.25, "exact_result": "103430.2500"}
+        Error: {"status": "error", "error_message": "division by zero"}
+    """
+    if len(expression) > CALC_MAX_LENGTH:
+        return {"status": "error", "error_message": f"expression longer than {CALC_MAX_LENGTH} characters"}
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+        with decimal.localcontext(CALC_CONTEXT):
+            value = _evaluate(tree)
+    except ArithmeticError as e:
+        if isinstance(e, ZeroDivisionError):
+            reason = "division by zero"
+        elif isinstance(e, decimal.Overflow):
+            reason = f"result is 1e{CALC_MAX_MAGNITUDE} or larger"
+        else:
+            reason = f"arithmetic error ({type(e).__name__})"
+        return {"status": "error", "error_message": f"could not evaluate '{expression}': {reason}"}
+    except (SyntaxError, ValueError, TypeError, RecursionError) as e:
+        return {"status": "error", "error_message": f"could not evaluate '{expression}': {e}"}
+    return {"status": "success", "result": float(value), "exact_result": format(value, "f")}
+
+
+calculator_tool = FunctionTool(func=calculate)
+print("local calculator created")
+print(f"test: {calculate('1250 * (1 - 0.01) * 83.58')}")
+
+# 5. One tool call for the whole conversion (or several of them)
+
+CONVERSION_MAX_AMOUNT = 1e15
+
+
+class ConversionRequest(BaseModel):
+    amount: float = Field(gt=0, le=CONVERSION_MAX_AMOUNT, allow_inf_nan=False)
+    payment_method: str
+    base_currency: str
+    target_currency: str
+
+    @field_validator("base_currency", "target_currency")
+    @classmethod
+    def _normalize_code(cls, code: str) -> str:
+        return code.strip().upper()
+
+
+def _convert_one(request: ConversionRequest) -> dict:
+    fee = get_fee_for_payment_method(request.payment_method)
+    if fee["status"] != "success":
+        return fee
+    rate = get_exchange_rate(request.base_currency, request.target_currency)
+    if rate["status"] != "success":
+        return rate
+    # same exact Decimal arithmetic as calculate(), rounded to cents at the end
+    try:
+        with decimal.localcontext(CALC_CONTEXT):
+            amount = decimal.Decimal(repr(request.amount))
+            fee_amount = amount * decimal.Decimal(repr(fee["fee_percentage"]))
+            after_fee = amount - fee_amount
+            final_amount = after_fee * decimal.Decimal(repr(rate["rate"]))
+            fee_amount, after_fee, final_amount = (
+                _calc_round(value, 2) for value in (fee_amount, after_fee, final_amount)
+            )
+    except ArithmeticError as e:
+        return {
+            "status": "error",
+            "error_message": f"could not convert {request.amount} {request.base_currency}: "
+            f"arithmetic error ({type(e).__name__})",
+        }
+    return {
+        "status": "success",
+        "amount": request.amount,
+        "base_currency": request.base_currency,
+        "target_currency": request.target_currency,
+        "payment_method": fee["payment_method"],
+        "fee_percentage": fee["fee_percentage"],
+        "fee_amount": float(fee_amount),
+        "amount_after_fee": float(after_fee),
+        "rate": rate["rate"],
+        "final_amount": float(final_amount),
+    }
+
+
+def convert_currency(conversions: list[ConversionRequest]) -> dict:
+    """Converts one or more amounts between currencies, including transaction fees.
+
+    Looks up the fee for each payment method and the exchange rate for each
+    currency pair, then does all the arithmetic, so every conversion the user
+    asked about is answered in a single call.
+
+    Args:
+        conversions: Every conversion to perform. Each item has "amount" (above 0, at most 1e15),
+                     "payment_method" (e.g. "platinum credit card"),
+                     "base_currency" and "target_currency" (ISO 4217 codes).
+
+    Returns:
+        Dictionary with an overall status and one result per conversion, in order.
+        Success item: {"status": "success", "fee_percentage": 0.01, "fee_amount": 12.5,
+                       "amount_after_fee": 1237.5, "rate": 83.58, "final_amount": 103430.25, ...}
+        Error item: {"status": "error", "error_message": "Unsupported currency pair: USD/XXX"}
+    """
+    results = []
+    for item in conversions:
+        try:
+            request = ConversionRequest.model_validate(item)
+        except ValidationError as e:
+            problems = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            results.append({"status": "error", "error_message": f"invalid conversion request: {problems}"})
+            continue
+        results.append(_convert_one(request))
+    failed = sum(1 for result in results if result["status"] != "success")
+    status = "success" if not failed else ("error" if failed == len(results) else "partial")
+    return {"status": status, "conversions": results}
+
+
+print("composite conversion tool created")
+print(f"test: {convert_currency([{'amount': 1250, 'payment_method': 'bank transfer', 'base_currency': 'USD', 'target_currency': 'INR'}])}")
+
+CURRENCY_INSTRUCTION = """You are a smart currency conversion assistant. You must strictly follow these steps and use the available tools.
+
+  For any currency conversion request:
+
+   1. Get Transaction Fee: Use the get_fee_for_payment_method() tool to determine the transaction fee.
+   2. Get Exchange Rate: Use the get_exchange_rate() tool to get the currency conversion rate.
+   3. Error Check: After each tool call, you must check the "status" field in the response. If the status is "error", you must stop and clearly explain the issue to the user.
+   4. Calculate Final Amount (CRITICAL): You are strictly prohibited from performing any arithmetic calculations yourself. {calculation_step}
+   5. Provide Detailed Breakdown: In your summary, you must:
+       * State the final converted amount.
+       * Explain how the result was calculated, including:
+           * The fee percentage and the fee amount in the original currency.
+           * The amount remaining after deducting the fee.
+           * The exchange rate applied.
+    """
+
 #and we replace our silly old agent with
+code_executor_currency_agent = LlmAgent(
+    name = "code_executor_currency_agent",
+    model = Gemini(
+        model = "gemini-2.5-flash-lite",
+        retry_options = retry_config),
+    # updated instructions
+    instruction = CURRENCY_INSTRUCTION.replace(
+        "{calculation_step}",
+        """You must use the calculation_agent tool to generate Python code that calculates the final converted amount. This 
+      code will use the fee information from step 1 and the exchange rate from step 2.""",
+    ),
+    tools = [
+        get_fee_for_payment_method,
+        get_exchange_rate,
+        AgentTool(agent = calculation_agent),  # Using another agent as a tool
+    ],
+)
+
+# ...and then replace the calculation agent with the local calculator and the
+# composite convert_currency tool: same exact answers, but one tool round trip
+# per request instead of three per conversion, and no extra LLM call
 enhanced_currency_agent = LlmAgent(
     name = "enhanced_currency_agent",
     model = Gemini(
         model = "gemini-2.5-flash-lite",
         retry_options = retry_config),
-    # updated instructions
     instruction = """You are a smart currency conversion assistant. You must strictly follow these steps and use the available tools.
 
   For any currency conversion request:
 
-   1. Get Transaction Fee: Use the get_fee_for_payment_method() tool to determine the transaction fee.
-   2. Get Exchange Rate: Use the get_exchange_rate() tool to get the currency conversion rate.
-   3. Error Check: After each tool call, you must check the "status" field in the response. If the status is "error", you must stop and clearly explain the issue to the user.
-   4. Calculate Final Amount (CRITICAL): You are strictly prohibited from performing any arithmetic calculations yourself. You must use the calculation_agent tool to generate Python code that calculates the final converted amount. This 
-      code will use the fee information from step 1 and the exchange rate from step 2.
-   5. Provide Detailed Breakdown: In your summary, you must:
+   1. Convert: Call the convert_currency() tool ONCE, passing every conversion the user asked about (amount, payment method,
+      base currency and target currency for each). It looks up the fees and exchange rates and does all of the arithmetic.
+   2. Error Check: Check the "status" field of each conversion in the response. If a conversion has status "error", clearly explain the issue to the user for that conversion.
+   3. Calculations (CRITICAL): You are strictly prohibited from performing any arithmetic calculations yourself. If you need any
+      number that convert_currency() did not return, use the calculate() tool with a single arithmetic expression.
+   4. Provide Detailed Breakdown: In your summary, for each conversion you must:
        * State the final converted amount.
        * Explain how the result was calculated, including:
            * The fee percentage and the fee amount in the original currency.
            * The amount remaining after deducting the fee.
            * The exchange rate applied.
+
+  Use get_fee_for_payment_method() or get_exchange_rate() only for questions about a fee or a rate on its own.
     """,
     tools = [
+        convert_currency,
         get_fee_for_payment_method,
         get_exchange_rate,
-        AgentTool(agent = calculation_agent),  # Using another agent as a tool
+        calculator_tool,
     ],
 )
 
 print("enhanced currency agent created")
-print("new capability: delegate calculations to specialist agent")
+print("new capability: whole conversions in one call, math in a local deterministic calculator")
 print("Tool types used:")
-print("  • Function Tools (fees, rates)")
-print("  • Agent Tool (calculation specialist)")
+print("  • Function Tools (conversion, fees, rates, calculator)")
+print("  • Agent Tool (calculation specialist, in code_executor_currency_agent)")
 
 #finally, another runner
 
 
+# prompt and response tokens, context events and state bytes of every model call.
+# CONTEXT_ACCOUNTING=<file> (or "console") exports them as OpenTelemetry JSON lines
+context_accounting = ContextAccounting(export = os.getenv("CONTEXT_ACCOUNTING"))
+
 #and here we make a runner to orchestrate
 async def main():
-    enhanced_runner = InMemoryRunner(agent = enhanced_currency_agent)
+    enhanced_runner = InMemoryRunner(agent = enhanced_currency_agent, plugins = [context_accounting])
     print("runner created")
 
     user_question = input("Ask the agent a question: ")
     response = await enhanced_runner.run_debug(user_question)
     print(response)
+    print("context per agent:", context_accounting.summary())
     
-asyncio.run(main())
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
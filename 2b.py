@@ -10,6 +10,8 @@ load_dotenv()
 print("environment keys loaded")
 # os.getenv("GOOGLE_API_KEY")
 
+import inspect
+import time
 import uuid
 from google.genai import types
 
@@ -25,6 +27,7 @@ from mcp import StdioServerParameters
 
 from google.adk.apps.app import App, ResumabilityConfig
 from google.adk.tools.function_tool import FunctionTool
+from services.context_accounting import ContextAccounting
 print("ADK components imported successfully.")
 
 # in case of errors, we want to automatically retry the request
@@ -149,10 +152,14 @@ shipping_agent = LlmAgent(
 )
 print("shipping agent created")
 
+# prompt and response tokens, context events and state bytes of every model call.
+# CONTEXT_ACCOUNTING=<file> (or "console") exports them as OpenTelemetry JSON lines
+context_accounting = ContextAccounting(export=os.getenv("CONTEXT_ACCOUNTING"))
 shipping_app = App(
     name="shipping_coordinator",
     root_agent=shipping_agent,
     resumability_config=ResumabilityConfig(is_resumable=True),
+    plugins=[context_accounting],
 )
 print("resumable app created")
 
@@ -166,33 +173,25 @@ print("shipping runner created")
 
 #SECTION 4: building the workflow
 
-def check_for_approval(events):
+def get_approval_info(part, invocation_id):
     """
-    Check if events contain an approval request.
-    
+    Turn a part into approval details if it is an approval request.
+
     Returns:
         dict with approval details or None
     """
-    for event in events:
-        if event.content and event.content.parts:
-            for part in event.content.parts:
-                if (
-                    part.function_call
-                    and part.function_call.name == "adk_request_confirmation"
-                ):
-                    return {
-                        "approval_id": part.function_call.id,
-                        "invocation_id": event.invocation_id
-                    }
-    return None
-
-def print_agent_response(events):
-    """Print agent's text responses from events"""
-    for event in events:
-        if event.content and event.content.parts:
-            for part in event.content.parts:
-                if part.text:
-                    print(f"Agent > {part.text}")
+    if not (
+        part.function_call
+        and part.function_call.name == "adk_request_confirmation"
+    ):
+        return None
+    confirmation = part.function_call.args.get("toolConfirmation", {})
+    return {
+        "approval_id": part.function_call.id,
+        "invocation_id": invocation_id,
+        "hint": confirmation.get("hint"),
+        "payload": confirmation.get("payload"),
+    }
 
 def create_approval_response(approval_info, approved):
     """Create approval response message"""
@@ -206,6 +205,125 @@ def create_approval_response(approval_info, approved):
     )
 print("helper functions defined")
 
+async def decide_approval(decide, query, approval_info):
+    """Ask the decision callback (sync or async) whether to approve an order"""
+    decision = decide(query, approval_info)
+    if inspect.isawaitable(decision):
+        decision = await decision
+    return bool(decision)
+
+async def consume_shipping_events(event_stream, on_text=None, on_approval=None):
+    """Reads run_async events as they arrive instead of collecting them first
+
+    Text parts go to on_text straight away, and the first approval request
+    goes to on_approval the moment it shows up, so the human can be asked
+    while the rest of the invocation is still draining. Nothing is buffered.
+
+    Returns:
+        (approval_info or None, latest place_shipping_order response or None)
+    """
+    approval_info = None
+    order = None
+    async for event in event_stream:
+        if not (event.content and event.content.parts):
+            continue
+        for part in event.content.parts:
+            if part.text:
+                if on_text:
+                    on_text(part.text)
+            elif part.function_response:
+                if part.function_response.name == "place_shipping_order":
+                    order = part.function_response.response
+            elif approval_info is None:
+                approval_info = get_approval_info(part, event.invocation_id)
+                if approval_info and on_approval:
+                    on_approval(approval_info)
+    return approval_info, order
+
+async def process_shipping_order(query: str, decide, user_id: str = "test_user", on_text=None):
+    """Runs one shipping order through the agent, resolving approval with `decide`
+
+    Args:
+        query: User's shipping request
+        decide: callback (query, approval_info) -> bool, may be async. Only
+                called when the order needs human approval
+        user_id: user the order session belongs to
+        on_text: optional callback for each agent text part, as it streams
+
+    Returns:
+        dict with the session id, whether approval was requested, the decision,
+        the final order status/id and the agent's text responses. The
+        order's session is deleted once it finishes
+    """
+    session_id = f"order_{uuid.uuid4().hex[:8]}"
+
+    await session_service.create_session(
+        app_name="shipping_coordinator", user_id=user_id, session_id=session_id
+    )
+
+    query_content = types.Content(role="user", parts=[types.Part(text=query)])
+    responses = []
+    decision = None
+
+    def forward_text(text):
+        responses.append(text)
+        if on_text:
+            on_text(text)
+
+    def start_approval(approval_info):
+        # ask for the decision now, while the paused invocation finishes up
+        nonlocal decision
+        decision = asyncio.ensure_future(decide_approval(decide, query, approval_info))
+
+    # the session is only needed while the order runs; drop it afterwards so a
+    # long-running batch does not keep every finished order in memory
+    try:
+        # step 1: send initial request to agent, watching for "adk_request_confirmation" as events stream in
+        approval_info, order = await consume_shipping_events(
+            shipping_runner.run_async(
+                user_id=user_id, session_id=session_id, new_message=query_content
+            ),
+            on_text=forward_text,
+            on_approval=start_approval,
+        )
+
+        # step 2: if it was requested, resume with the human decision
+        approved = None
+        if approval_info:
+            approved = await decision
+            _, resumed_order = await consume_shipping_events(
+                shipping_runner.run_async(
+                    user_id=user_id,
+                    session_id=session_id,
+                    new_message=create_approval_response(
+                        approval_info, approved
+                    ),  # send human decision here
+                    invocation_id=approval_info[
+                        "invocation_id"
+                    ],  # tells ADK to RESUME
+                ),
+                on_text=forward_text,
+            )
+            order = resumed_order or order
+    finally:
+        # if the first run failed, nobody will await the decision any more
+        if decision is not None and not decision.done():
+            decision.cancel()
+        await session_service.delete_session(
+            app_name="shipping_coordinator", user_id=user_id, session_id=session_id
+        )
+
+    order = order or {}
+    return {
+        "query": query,
+        "session_id": session_id,
+        "approval_requested": approval_info is not None,
+        "approved": approved,
+        "status": order.get("status", "unknown"),
+        "order_id": order.get("order_id"),
+        "responses": responses,
+    }
+
 async def run_shipping_workflow(query: str, auto_approve: bool = True):
     """Runs a shipping workdlow with approval handling
     
@@ -217,46 +335,71 @@ async def run_shipping_workflow(query: str, auto_approve: bool = True):
     print(f"\n{'='*60}")
     print(f"User > {query}\n")
 
-    session_id = f"order_{uuid.uuid4().hex[:8]}"
+    def decide(query, approval_info):
+        print(f"pausing for approval...")
+        print(f"human decision: {'APPROVE' if auto_approve else 'REJECT'}\n")
+        return auto_approve
 
-    await session_service.create_session(
-        app_name="shipping_coordinator", user_id="test_user", session_id=session_id
+    await process_shipping_order(
+        query, decide, on_text=lambda text: print(f"Agent > {text}")
     )
 
-    query_content = types.Content(role="user", parts=[types.Part(text=query)])
-    events = []
+    print(f"{'='*60}\n")
+print("workflow function ready")
 
-    # step 1: send initial request to agent
-    async for event in shipping_runner.run_async(
-        user_id="test_user", session_id=session_id, new_message=query_content
-    ):
-        events.append(event)
-    # step 2: loop through events and check for "ask_request_confirmation" 
-    approval_info = check_for_approval(events)
+#SECTION 5: batch mode
 
-    # step 3: if it is present, handle approval workflow
-    if approval_info:
-        print(f"pausing for approval...")
-        print(f"human decision: {'APPROVE' if auto_approve else 'REJECT'}\n")
-        async for event in shipping_runner.run_async(
-            user_id="test_user",
-            session_id=session_id,
-            new_message=create_approval_response(
-                approval_info, auto_approve
-            ),  # send human decision here
-            invocation_id=approval_info[
-                "invocation_id"
-            ],  # tells ADK to RESUME
-        ):
-            if event.content and event.content.parts:
-                for part in event.content.parts:
-                    if part.text:
-                        print(f"Agent > {part.text}")
-    else:
-        print_agent_response(events)
+async def run_shipping_batch(queries, decide=None, concurrency: int = 50):
+    """Runs many shipping orders concurrently over the shared shipping_runner
 
-    print(f"{'='*60}\n")
-print("workflow function ready")
+    Args:
+        queries: iterable of user shipping requests
+        decide: approval callback (query, approval_info) -> bool, may be async.
+                Defaults to approving every large order
+        concurrency: max number of orders in flight at once, at least 1
+
+    Returns:
+        dict with "results" (one dict per order, in input order) and "stats"
+        (counts, elapsed time and throughput)
+
+    Raises:
+        ValueError: if concurrency is less than 1
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+    if decide is None:
+        decide = lambda query, approval_info: True
+    # a fixed pool of workers pulls orders off one iterator, so only
+    # `concurrency` coroutines exist at a time however long the batch is
+    pending = enumerate(queries)
+    results = {}
+
+    async def worker():
+        for index, query in pending:
+            try:
+                results[index] = await process_shipping_order(query, decide)
+            except Exception as e:
+                # one bad order should not sink the whole batch
+                results[index] = {"query": query, "status": "error", "error": repr(e)}
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    results = [results[index] for index in range(len(results))]
+
+    statuses = [result["status"] for result in results]
+    stats = {
+        "orders": len(results),
+        "approved": statuses.count("approved"),
+        "rejected": statuses.count("rejected"),
+        "errors": statuses.count("error"),
+        "approvals_requested": sum(1 for result in results if result.get("approval_requested")),
+        "elapsed_s": round(elapsed, 3),
+        "orders_per_second": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "concurrency": concurrency,
+    }
+    return {"results": results, "stats": stats}
+print("batch function ready")
 
 async def main():
     # Demo 1: It's a small order. Agent receives auto-approved status from tool
@@ -268,5 +411,22 @@ async def main():
     # Demo 3: Workflow simulates human decision: REJECT
     await run_shipping_workflow("Ship 8 containers to Los Angeles", auto_approve=False)
 
+    # Demo 4: a burst of orders through the batch API, rejecting anything over 20 containers
+    batch = await run_shipping_batch(
+        [
+            "Ship 2 containers to Hamburg",
+            "Ship 12 containers to Shanghai",
+            "Ship 25 containers to Santos",
+            "Ship 4 containers to Durban",
+        ],
+        decide=lambda query, approval_info: approval_info["payload"]["num_containers"] <= 20,
+        concurrency=4,
+    )
+    for result in batch["results"]:
+        print(f"{result['query']} -> {result['status']} ({result.get('order_id')})")
+    print(f"batch stats: {batch['stats']}")
+    print("context per session:", context_accounting.summary(by="session"))
+
 
-asyncio.run(main())
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
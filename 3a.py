@@ -16,6 +16,9 @@ from google.adk.sessions import InMemorySessionService
 from google.adk.runners import Runner
 from google.adk.tools.tool_context import ToolContext
 from google.genai import types
+
+from services.context_accounting import ContextAccounting
+from services.sessions import CachedSessionService, get_or_create_session
 print("adk imported")
 
 
@@ -34,6 +37,8 @@ retry_config = types.HttpRetryOptions(
 # previous sections below 
 
 # Define scope levels for state keys
+# (each is its own tier: user: and app: keys are shared with the user's and app's other
+# sessions, temp: keys are never stored; see services/state_store.py)
 USER_NAME_SCOPE_LEVELS = ("temp", "user", "app")
 
 # init the agent
@@ -43,8 +48,15 @@ root_agent = Agent(
     description="A text chatbot",
 )
 
-session_service = InMemorySessionService()
-runner = Runner(agent=root_agent, app_name=APP_NAME, session_service=session_service)
+# prompt and response tokens, context events and state bytes of every model call.
+# CONTEXT_ACCOUNTING=<file> (or "console") exports them as OpenTelemetry JSON lines
+context_accounting = ContextAccounting(export=os.getenv("CONTEXT_ACCOUNTING"))
+
+# hot sessions are served from a process-local handle cache
+session_service = CachedSessionService(InMemorySessionService())
+runner = Runner(
+    agent=root_agent, app_name=APP_NAME, session_service=session_service, plugins=[context_accounting]
+)
 
 print("stateful agent initialized!")
 
@@ -57,20 +69,14 @@ async def run_session(
     print(f"\n### Session: {session_name}")
     app_name = runner_instance.app_name
 
-    try:
-        session = await session_service.create_session(
-            app_name=app_name,
-            user_id=USER_ID,
-            session_id=session_name,
-        )
-        print("Created session")
-    except Exception:
-        session = await session_service.get_session(
-            app_name=app_name,
-            user_id=USER_ID,
-            session_id=session_name,
-        )
-        print("Got existing session")
+    # one lookup for an existing session instead of a failed create followed by a get
+    session, created = await get_or_create_session(
+        runner_instance.session_service,
+        app_name=app_name,
+        user_id=USER_ID,
+        session_id=session_name,
+    )
+    print("Created session" if created else "Got existing session")
 
     if not user_queries:
         print("No queries!")
@@ -137,8 +143,10 @@ root_agent = LlmAgent(
 )
 
 # Set up session service and runner
-session_service = InMemorySessionService()
-runner = Runner(agent=root_agent, session_service=session_service, app_name="default")
+session_service = CachedSessionService(InMemorySessionService())
+runner = Runner(
+    agent=root_agent, session_service=session_service, app_name="default", plugins=[context_accounting]
+)
 
 print("agent w session state tools initialized")
 
@@ -159,9 +167,11 @@ async def main():
 
     print("Session State Contents:")
     print(session.state)
+    print("context per session:", context_accounting.summary(by="session"))
 
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())
 
 
 
@@ -190,6 +200,10 @@ asyncio.run(main())
 # # SQLite database will be created automatically
 # db_url = "sqlite:///my_agent_data.db"  # Local SQLite file
 # session_service = DatabaseSessionService(db_url=db_url)
+# # For many concurrent sessions: pooled connections, WAL and one commit per invocation
+# # (see `python -m benchmarks.sessions`). Uses its own schema, so give it a separate file.
+# # from services.sqlite_sessions import PooledSqliteSessionService
+# # session_service = PooledSqliteSessionService("sqlite:///my_agent_sessions.db")
 
 # # Step 3: Create a new runner with persistent storage
 # runner = Runner(agent=chatbot_agent, app_name=APP_NAME, session_service=session_service)
@@ -201,11 +215,19 @@ asyncio.run(main())
 
 # import sqlite3
 
-# def check_data_in_db():
+# def check_data_in_db(session_id="test-db-session-01", last=20):
 #     with sqlite3.connect("my_agent_data.db") as connection:
 #         cursor = connection.cursor()
+#         # only the session's latest events, read off an index instead of the whole table
+#         cursor.execute(
+#             "create index if not exists events_window"
+#             " on events (app_name, user_id, session_id, timestamp)"
+#         )
 #         result = cursor.execute(
 #             "select app_name, session_id, author, content from events"
+#             " where app_name = ? and user_id = ? and session_id = ?"
+#             " order by timestamp desc limit ?",
+#             (APP_NAME, USER_ID, session_id, last),
 #         )
 #         print([_[0] for _ in result.description])
 #         for each in result.fetchall():
@@ -213,6 +235,13 @@ asyncio.run(main())
 
 # check_data_in_db()
 
+# # To look at (or move) many sessions at once, export them to Parquet instead of querying
+# # row by row: files partitioned by app, user and day, readable with pyarrow.dataset or
+# # DuckDB, and importable into any session service (see `python -m benchmarks.archive`).
+# from services.session_archive import export_sessions, import_sessions
+# asyncio.run(export_sessions(session_service, "session_archive", app_name=APP_NAME))
+# asyncio.run(import_sessions(InMemorySessionService(), "session_archive"))
+
 # async def main():
 #     await run_session(
 #         runner,
@@ -225,6 +254,9 @@ asyncio.run(main())
 # 4. context compaction
 
 
+# from services.compaction import ExtractiveSummarizer, TokenBudgetCompactor
+# from services.sessions import iter_events
+
 # research_app_compacting = App(
 #     name="research_app_compacting",
 #     root_agent=chatbot_agent,
@@ -232,9 +264,19 @@ asyncio.run(main())
 #     events_compaction_config=EventsCompactionConfig(
 #         compaction_interval=3,  # Trigger compaction every 3 invocations
 #         overlap_size=1,  # Keep 1 previous turn for context
+#         # summarizer=ExtractiveSummarizer(),  # keeps tool results and state changes, no model call
 #     ),
 # )
 
+# # Or compact when the context passes a token budget, extractively and incrementally
+# # (per-session metrics: compactor.session_stats(APP_NAME, USER_ID, session_id))
+# compactor = TokenBudgetCompactor(token_budget=4_000)
+# research_app_compacting = App(
+#     name="research_app_compacting",
+#     root_agent=chatbot_agent,
+#     plugins=[compactor],
+# )
+
 # db_url = "sqlite:///my_agent_data.db"  # Local SQLite file
 # session_service = DatabaseSessionService(db_url=db_url)
 
@@ -274,16 +316,15 @@ asyncio.run(main())
 #         "Who are the main companies involved in that?",
 #         "compaction_demo",
 #     )
-#     # Get the final session state
-#     final_session = await session_service.get_session(
+#     print("--- Searching for Compaction Summary Event ---")
+#     found_summary = False
+#     # newest first, so only the events after the latest compaction are read
+#     async for event in iter_events(
+#         session_service,
 #         app_name=research_runner_compacting.app_name,
 #         user_id=USER_ID,
 #         session_id="compaction_demo",
-#     )
-
-#     print("--- Searching for Compaction Summary Event ---")
-#     found_summary = False
-#     for event in final_session.events:
+#     ):
 #         # Compaction events have a 'compaction' attribute
 #         if event.actions and event.actions.compaction:
 #             print("\n Found the Compaction Event:")
@@ -14,10 +14,15 @@ from google.adk.agents import LlmAgent
 from google.adk.models.google_llm import Gemini
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
-from google.adk.memory import InMemoryMemoryService
 from google.adk.tools import load_memory
 from google.genai import types
 
+from services.bm25_memory import BM25MemoryService
+from services.context_accounting import ContextAccounting
+from services.memory_prefetch import MemoryPrefetch
+from services.sessions import CachedSessionService, get_or_create_session
+from services.vector_memory import HashedNgramMemoryService
+
 print("ADK components imported")
 
 # Config
@@ -32,11 +37,26 @@ retry_config = types.HttpRetryOptions(
 )
 
 # Services
-session_service = InMemorySessionService()
-memory_service = InMemoryMemoryService()
+# hot sessions are served from a process-local handle cache instead of a fresh copy per turn
+session_service = CachedSessionService(InMemorySessionService())
+# indexed once per event and ranked with BM25, instead of scanning every event per load_memory call.
+# MEMORY_BACKEND=vector uses hashed n-gram vectors on disk instead: fuzzy matching, and the
+# memory survives a restart
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "bm25")
+if MEMORY_BACKEND == "vector":
+    memory_service = HashedNgramMemoryService(path=os.getenv("VECTOR_MEMORY_PATH", "vector_memory"))
+else:
+    # bounded, so a long-running process cannot grow memory without limit; evicted events
+    # are folded into per-session digests
+    memory_service = BM25MemoryService(
+        max_entries_per_user=5_000,
+        max_bytes=256 * 2**20,
+        eviction="importance",
+    )
 
-# Agent
-user_agent = LlmAgent(
+# Agents
+# tool path: the model spends a round trip calling load_memory before every answer
+memory_tool_agent = LlmAgent(
     model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
     name="MemoryDemoAgent",
     instruction="""You are a helpful assistant.
@@ -45,12 +65,31 @@ Do this before answering anything. If memory returns results, use them in your a
     tools=[load_memory],
 )
 
+# prefetch path: memories for the user's message are searched locally and put into the request
+memory_prefetch = MemoryPrefetch(top_k=5, token_budget=400)
+memory_prefetch_agent = LlmAgent(
+    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+    name="MemoryPrefetchAgent",
+    instruction="""You are a helpful assistant.
+Past conversation context relevant to the user's message, if any, is included below. Use it in your answer.""",
+    before_model_callback=memory_prefetch,
+)
+
+# MEMORY_MODE=tool keeps the original load_memory agent for comparison
+MEMORY_MODE = os.getenv("MEMORY_MODE", "prefetch")
+user_agent = memory_tool_agent if MEMORY_MODE == "tool" else memory_prefetch_agent
+
+# prompt and response tokens, context events and state bytes of every model call.
+# CONTEXT_ACCOUNTING=<file> (or "console") exports them as OpenTelemetry JSON lines
+context_accounting = ContextAccounting(export=os.getenv("CONTEXT_ACCOUNTING"))
+
 # Runner
 runner = Runner(
     agent=user_agent,
     app_name=APP_NAME,
     session_service=session_service,
     memory_service=memory_service,
+    plugins=[context_accounting],
 )
 
 
@@ -61,14 +100,10 @@ async def run_session(
 ):
     print(f"\n### Session: {session_id}")
 
-    try:
-        session = await session_service.create_session(
-            app_name=APP_NAME, user_id=USER_ID, session_id=session_id
-        )
-    except Exception:
-        session = await session_service.get_session(
-            app_name=APP_NAME, user_id=USER_ID, session_id=session_id
-        )
+    session, _ = await get_or_create_session(
+        runner_instance.session_service,
+        app_name=APP_NAME, user_id=USER_ID, session_id=session_id,
+    )
 
     if isinstance(user_queries, str):
         user_queries = [user_queries]
@@ -103,12 +138,14 @@ async def main():
     await memory_service.add_session_to_memory(session)
     print("Memory saved!")
 
-    print("Memory store:", memory_service._session_events)
+    print("Memory store:", memory_service.stats())
 
     await run_session(
         runner,
         "What is my favorite color?",
         "conversation-02",
     )
+    print("context per session:", context_accounting.summary(by="session"))
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,6 @@
+"""Offline benchmarks for the course agents, driven by a scripted Gemini stub."""
+
+from .conversations import AGENTS, AgentSpec
+from .harness import benchmark_agent, benchmark_all, stubbed
+from .scripts import load_script
+from .stub_model import ScriptedGemini, Turn, call, calls, say
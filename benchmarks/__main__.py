@@ -0,0 +1,110 @@
+"""Offline benchmark of every course agent.
+
+Usage:
+    python -m benchmarks                        # all agents, JSON to stdout
+    python -m benchmarks --agent RootAgent --repeat 20 --output bench.json
+
+    # real models: record once (needs GOOGLE_API_KEY), then replay offline
+    python -m benchmarks --model-cache model_cache.db --cache-mode record --repeat 1
+    python -m benchmarks --model-cache model_cache.db
+
+    # context size per agent, plus OpenTelemetry spans and metrics as JSON lines
+    python -m benchmarks --context-accounting context.jsonl
+
+    # compact each session once its context passes 2000 tokens
+    python -m benchmarks --compaction-budget 2000 --context-accounting console
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import time
+import warnings
+
+from google.adk import __version__ as adk_version
+
+from services.compaction import TokenBudgetCompactor
+from services.context_accounting import ContextAccounting
+from services.model_cache import MODES, ResponseStore
+
+from .conversations import AGENTS
+from .harness import benchmark_all
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--agent", action="append", choices=sorted(AGENTS),
+        help="agent to benchmark (repeatable, default: all)",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="replays per conversation")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="simulated seconds per model call"
+    )
+    parser.add_argument(
+        "--model-cache",
+        help="run the real models through this recorded response store instead of the stub",
+    )
+    parser.add_argument(
+        "--cache-mode", choices=MODES, default="replay",
+        help="how --model-cache is used (default: replay, offline)",
+    )
+    parser.add_argument(
+        "--context-accounting", metavar="PATH",
+        help="record prompt tokens, context events and state bytes of every model call, "
+        "export them as OpenTelemetry JSON lines to PATH ('console': stdout) and add a summary to the report",
+    )
+    parser.add_argument(
+        "--compaction-budget", type=int, metavar="TOKENS",
+        help="compact each session with TokenBudgetCompactor once its context passes TOKENS "
+        "and add the compaction stats to the report",
+    )
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    logging.getLogger("google").setLevel(logging.ERROR)
+
+    store = ResponseStore(args.model_cache) if args.model_cache else None
+    accounting = ContextAccounting(export=args.context_accounting) if args.context_accounting else None
+    compactor = TokenBudgetCompactor(token_budget=args.compaction_budget) if args.compaction_budget else None
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "adk_version": adk_version,
+        "repeat": args.repeat,
+        "latency": args.latency,
+        "model_cache": args.model_cache and {"path": args.model_cache, "mode": args.cache_mode},
+        "agents": asyncio.run(
+            benchmark_all(
+                args.agent,
+                repeat=args.repeat,
+                latency=args.latency,
+                store=store,
+                cache_mode=args.cache_mode,
+                accounting=accounting,
+                compactor=compactor,
+            )
+        ),
+    }
+    if store is not None:
+        store.close()
+    if accounting is not None:
+        report["context"] = accounting.summary(by="agent")
+        accounting.shutdown()
+    if compactor is not None:
+        report["compaction"] = compactor.stats()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"report written to {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
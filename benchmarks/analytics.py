@@ -0,0 +1,222 @@
+"""Throughput of the event-log analytics on synthetic logs of many millions of events.
+
+Builds an Arrow event table (vectorized, with numpy) shaped like the logs
+of three course agents:
+- enhanced_currency_agent: convert_currency, plus calculate in a share of
+  the conversions.
+- shipping_agent: place_shipping_order around an adk_request_confirmation,
+  answered after an exponentially distributed wait.
+- RootAgent: the ResearchAgent tool, then the SummaryAgent tool.
+
+The table is optionally written to Parquet, and the canned reports of
+benchmarks.reports are timed on it. Their answers can be checked against
+the known generating parameters (tool calls per conversion, mean wait, which
+sub-agent is slower). For comparison, the tool calls per conversion are also
+counted with a plain Python loop over the first --baseline-events rows.
+
+Usage:
+    python -m benchmarks.analytics
+    python -m benchmarks.analytics --invocations 20000000 --parquet
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from services.event_analytics import confirmation_waits, sub_agent_latency, tool_calls_per_invocation
+
+APP_NAME = "analytics_bench"
+USERS = 10_000
+TURNS_PER_SESSION = 4
+CALCULATE_SHARE = 0.3
+CONFIRMATION_WAIT_S = 45.0
+
+# (author, tool called, tool answered, mean seconds since the previous event) per event of an invocation
+SHAPES = {
+    "currency": [
+        ("user", None, None, 0.0),
+        ("enhanced_currency_agent", "convert_currency", None, 0.8),
+        ("enhanced_currency_agent", None, "convert_currency", 0.05),
+        ("enhanced_currency_agent", None, None, 0.9),
+    ],
+    "currency_calculate": [
+        ("user", None, None, 0.0),
+        ("enhanced_currency_agent", "convert_currency", None, 0.8),
+        ("enhanced_currency_agent", None, "convert_currency", 0.05),
+        ("enhanced_currency_agent", "calculate", None, 0.7),
+        ("enhanced_currency_agent", None, "calculate", 0.01),
+        ("enhanced_currency_agent", None, None, 0.9),
+    ],
+    "shipping": [
+        ("user", None, None, 0.0),
+        ("shipping_agent", "place_shipping_order", None, 0.7),
+        ("shipping_agent", "adk_request_confirmation", None, 0.01),
+        ("user", None, "adk_request_confirmation", CONFIRMATION_WAIT_S),
+        ("shipping_agent", None, "place_shipping_order", 0.02),
+        ("shipping_agent", None, None, 0.8),
+    ],
+    "research": [
+        ("user", None, None, 0.0),
+        ("RootAgent", "ResearchAgent", None, 0.6),
+        ("RootAgent", None, "ResearchAgent", 6.0),
+        ("RootAgent", "SummaryAgent", None, 0.6),
+        ("RootAgent", None, "SummaryAgent", 2.5),
+        ("RootAgent", None, None, 0.7),
+    ],
+}
+
+
+def _prefixed(prefix: str, numbers: np.ndarray) -> pa.Array:
+    return pc.binary_join_element_wise(prefix, pc.cast(pa.array(numbers), pa.string()), "")
+
+
+def _lists(present: np.ndarray, values: pa.Array) -> pa.ListArray:
+    """A one-or-zero element list per row, the row's value where `present`."""
+    offsets = np.concatenate([[0], np.cumsum(present)]).astype(np.int32)
+    return pa.ListArray.from_arrays(pa.array(offsets), values)
+
+
+def shape_events(shape: str, first: int, count: int, rng: np.random.Generator) -> pa.Table:
+    """`count` invocations of one shape, numbered from `first`, as an event table."""
+    steps = SHAPES[shape]
+    width = len(steps)
+    invocation = np.arange(first, first + count)
+    delays = rng.exponential([mean or 1e-9 for *_, mean in steps], size=(count, width))
+    timestamps = (1.7e9 + invocation * 0.25)[:, None] + np.cumsum(delays, axis=1)
+    step = np.tile(np.arange(width, dtype=np.int32), count)
+    rows = np.repeat(invocation, width)
+    session = rows // TURNS_PER_SESSION
+    invocation_ids = _prefixed("e-", rows)
+
+    def column(index: int) -> pa.Array:
+        return pa.DictionaryArray.from_arrays(
+            pa.array(step), pa.array([entry[index] for entry in steps], pa.string())
+        ).cast(pa.string())
+
+    authors, calls, responses = column(0), column(1), column(2)
+    has_call, has_response = pc.is_valid(calls), pc.is_valid(responses)
+    call_ids = pc.binary_join_element_wise(invocation_ids, pc.fill_null(pc.coalesce(calls, responses), ""), "-")
+    return pa.table(
+        {
+            "app_name": pa.DictionaryArray.from_arrays(
+                pa.array(np.zeros(len(rows), np.int32)), pa.array([APP_NAME])
+            ).cast(pa.string()),
+            "user_id": _prefixed("user-", session % USERS),
+            "session_id": _prefixed("s-", session),
+            "id": _prefixed("ev-", rows * width + step),
+            "invocation_id": invocation_ids,
+            "author": authors,
+            "timestamp": timestamps.ravel(),
+            "function_calls": _lists(has_call.to_numpy(zero_copy_only=False), calls.filter(has_call)),
+            "function_call_ids": _lists(has_call.to_numpy(zero_copy_only=False), call_ids.filter(has_call)),
+            "function_responses": _lists(has_response.to_numpy(zero_copy_only=False), responses.filter(has_response)),
+            "function_response_ids": _lists(
+                has_response.to_numpy(zero_copy_only=False), call_ids.filter(has_response)
+            ),
+        }
+    )
+
+
+def synthetic_events(invocations: int, seed: int = 0) -> pa.Table:
+    """Invocations split a third each between the currency, shipping and research shapes."""
+    rng = np.random.default_rng(seed)
+    third = invocations // 3
+    calculate = int(third * CALCULATE_SHARE)
+    counts = {
+        "currency": third - calculate,
+        "currency_calculate": calculate,
+        "shipping": third,
+        "research": invocations - 2 * third,
+    }
+    tables, first = [], 0
+    for shape, count in counts.items():
+        tables.append(shape_events(shape, first, count, rng))
+        first += count
+    return pa.concat_tables(tables)
+
+
+def python_calls_per_invocation(table: pa.Table, agent: str) -> float:
+    """The first report's mean, one row at a time, for comparison."""
+    calls: Counter = Counter()
+    for row in table.select(["invocation_id", "author", "function_calls"]).to_pylist():
+        if row["author"] == agent:
+            calls[row["invocation_id"]] += len(row["function_calls"])
+    return sum(calls.values()) / len(calls) if calls else 0.0
+
+
+def _timed(report, events) -> tuple[dict, float]:
+    started = time.perf_counter()
+    result = report(events)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--invocations", type=int, default=2_000_000)
+    parser.add_argument("--parquet", action="store_true", help="write the events to Parquet and report from the files")
+    parser.add_argument(
+        "--baseline-events", type=int, default=1_000_000, help="rows counted by the Python loop (0: skip)"
+    )
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    table = synthetic_events(args.invocations)
+    report = {
+        "events": table.num_rows,
+        "invocations": args.invocations,
+        "build_s": round(time.perf_counter() - started, 2),
+        "table_mb": round(table.nbytes / 2**20, 1),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        events = table
+        if args.parquet:
+            started = time.perf_counter()
+            ds.write_dataset(
+                table, directory, format="parquet", max_rows_per_group=1 << 17, max_rows_per_file=1 << 22,
+                existing_data_behavior="overwrite_or_ignore",
+            )
+            report["parquet_write_s"] = round(time.perf_counter() - started, 2)
+            report["parquet_mb"] = round(
+                sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / 2**20, 1
+            )
+            events = ds.dataset(directory, format="parquet")
+            del table
+
+        reports = {
+            "tool_calls_per_conversion": lambda events: tool_calls_per_invocation(events, "enhanced_currency_agent"),
+            "confirmation_wait": lambda events: confirmation_waits(events, caller="shipping_agent"),
+            "root_sub_agent_latency": lambda events: sub_agent_latency(events, "RootAgent"),
+        }
+        for name, run in reports.items():
+            result, seconds = _timed(run, events)
+            report[name] = {
+                "seconds": round(seconds, 2),
+                "events_per_s": round(report["events"] / seconds),
+                "result": result,
+            }
+        report["expected"] = {
+            "tool_calls_per_conversion": 1 + CALCULATE_SHARE,
+            "confirmation_wait_mean_s": CONFIRMATION_WAIT_S,
+            "confirmation_wait_p95_s": round(CONFIRMATION_WAIT_S * np.log(20), 1),
+            "root_dominant": "ResearchAgent",
+        }
+
+    if args.baseline_events and not args.parquet:
+        sample = table.slice(0, args.baseline_events)
+        started = time.perf_counter()
+        python_calls_per_invocation(sample, "enhanced_currency_agent")
+        seconds = time.perf_counter() - started
+        report["python_loop_baseline"] = {"events": sample.num_rows, "events_per_s": round(sample.num_rows / seconds)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Throughput and memory of the Parquet session export and import.
+
+Fills a PooledSqliteSessionService with synthetic sessions (see
+benchmarks.sessions), exports them with `export_sessions`, and imports the
+files into the in-memory, database and pooled services with
+`import_sessions`. The export reports the peak Arrow memory and how far the
+process's anonymous RSS grew (SQLite's mmap of the source file aside), both
+of which should stay flat as --sessions grows.
+For comparison, the first --baseline-sessions sessions are also copied into
+a DatabaseSessionService the ordinary way, create_session and then
+append_event per event.
+
+Usage:
+    python -m benchmarks.archive
+    python -m benchmarks.archive --sessions 20000 --events 50 --batch-rows 16384
+    python -m benchmarks.archive --targets memory,pooled --baseline-sessions 0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import pyarrow as pa
+from google.adk.sessions import DatabaseSessionService, InMemorySessionService
+
+from services.session_archive import export_sessions, import_sessions
+from services.sessions import iter_events
+from services.sqlite_sessions import PooledSqliteSessionService
+
+from .sessions import APP_NAME, write_sessions
+
+TARGETS = {
+    "memory": lambda directory: InMemorySessionService(),
+    "database": lambda directory: DatabaseSessionService(f"sqlite+aiosqlite:///{directory}/imported.db"),
+    "pooled": lambda directory: PooledSqliteSessionService(os.path.join(directory, "imported_pooled.db")),
+}
+
+
+def _anon_rss_mb() -> float:
+    """Resident memory not backed by a file (SQLite's mmap of the source database is excluded); Linux only."""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _size_mb(path: str) -> float:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files) / 2**20
+
+
+async def replay(source, target, sessions: int) -> dict:
+    """Copies the first `sessions` sessions through create_session and append_event."""
+    listed = (await source.list_sessions(app_name=APP_NAME)).sessions[:sessions]
+    events = 0
+    started = time.perf_counter()
+    for listed_session in listed:
+        session = await target.create_session(
+            app_name=APP_NAME, user_id=listed_session.user_id, session_id=listed_session.id,
+            state=listed_session.state,
+        )
+        async for event in iter_events(
+            source, app_name=APP_NAME, user_id=session.user_id, session_id=session.id, newest_first=False
+        ):
+            await target.append_event(session, event)
+            events += 1
+    seconds = time.perf_counter() - started
+    return {"sessions": len(listed), "events": events, "events_per_s": round(events / seconds) if seconds else 0}
+
+
+async def benchmark_archive(
+    sessions: int, events: int, concurrency: int, batch_rows: int, targets: list[str], baseline_sessions: int
+) -> dict:
+    report = {}
+    with tempfile.TemporaryDirectory() as directory:
+        async with PooledSqliteSessionService(os.path.join(directory, "source.db")) as source:
+            report["seed"] = await write_sessions(source, sessions, events, concurrency)
+
+            root = os.path.join(directory, "archive")
+            rss_before = _anon_rss_mb()
+            pa.default_memory_pool().release_unused()
+            arrow_before = pa.total_allocated_bytes()
+            exported = await export_sessions(source, root, app_name=APP_NAME, batch_rows=batch_rows)
+            report["export"] = {
+                **exported,
+                "events_per_s": round(exported["events"] / exported["seconds"]) if exported["seconds"] else 0,
+                "parquet_mb": round(_size_mb(root), 1),
+                "arrow_peak_mb": round((pa.default_memory_pool().max_memory() - arrow_before) / 2**20, 1),
+                "anon_rss_growth_mb": round(_anon_rss_mb() - rss_before, 1),
+            }
+
+            report["import"] = {}
+            for name in targets:
+                target = TARGETS[name](directory)
+                imported = await import_sessions(target, root, batch_rows=batch_rows)
+                report["import"][name] = {
+                    **imported,
+                    "events_per_s": round(imported["events"] / imported["seconds"]) if imported["seconds"] else 0,
+                }
+                if hasattr(target, "close"):
+                    await target.close()
+
+            if baseline_sessions:
+                target = DatabaseSessionService(f"sqlite+aiosqlite:///{directory}/replayed.db")
+                report["replay_database"] = await replay(source, target, baseline_sessions)
+                await target.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=5_000)
+    parser.add_argument("--events", type=int, default=40, help="events per session")
+    parser.add_argument("--concurrency", type=int, default=16, help="sessions written at once while seeding")
+    parser.add_argument("--batch-rows", type=int, default=8192, help="rows per Parquet row group")
+    parser.add_argument(
+        "--targets", default="memory,database,pooled",
+        help=f"comma separated services to import into ({', '.join(TARGETS)})",
+    )
+    parser.add_argument(
+        "--baseline-sessions", type=int, default=200,
+        help="sessions also copied into DatabaseSessionService one append_event at a time (0: skip)",
+    )
+    args = parser.parse_args()
+    report = asyncio.run(
+        benchmark_archive(
+            args.sessions, args.events, args.concurrency, args.batch_rows, args.targets.split(","),
+            args.baseline_sessions,
+        )
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compares the two ways 2a.py does currency arithmetic, on the stub model.
+
+`code_executor_currency_agent` hands the math to CalculationAgent (an extra
+model call that writes Python, then a BuiltInCodeExecutor run);
+`enhanced_currency_agent` does it locally (`convert_currency`, which shares
+the exact Decimal arithmetic of the `calculate` tool). With
+`--latency` set to a realistic per-call model time, the difference in model
+calls shows up directly as wall time.
+
+Usage:
+    python -m benchmarks.calculator --latency 0.4 --repeat 5
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+import warnings
+
+from .conversations import AGENTS
+from .harness import benchmark_agent
+from .scripts import load_script
+
+PATHS = ("code_executor_currency_agent", "enhanced_currency_agent")
+SAMPLE_EXPRESSIONS = (
+    "1250 * (1 - 0.01) * 83.58",
+    "round(500 * (1 - 0.02) * 0.93, 2)",
+    "(1000 - 1000 * 0.035) * 157.5",
+)
+
+
+def time_calculator(iterations: int = 10_000) -> dict:
+    """Times the local calculator and checks it answers identically every run."""
+    calculate = load_script("2a.py").calculate
+    results = {expression: calculate(expression) for expression in SAMPLE_EXPRESSIONS}
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for expression in SAMPLE_EXPRESSIONS:
+            if calculate(expression) != results[expression]:
+                raise AssertionError(f"calculate('{expression}') is not deterministic")
+    elapsed = time.perf_counter() - started
+    return {
+        "us_per_call": round(elapsed / (iterations * len(SAMPLE_EXPRESSIONS)) * 1e6, 2),
+        "results": {expression: result["exact_result"] for expression, result in results.items()},
+    }
+
+
+async def compare(repeat: int, latency: float) -> dict:
+    paths = {}
+    for name in PATHS:
+        paths[name] = await benchmark_agent(AGENTS[name], repeat=repeat, latency=latency)
+    before, after = (paths[name]["totals"] for name in PATHS)
+    turns = len(paths[PATHS[0]]["turns"])
+    return {
+        "latency": latency,
+        "repeat": repeat,
+        "paths": {name: result["totals"] for name, result in paths.items()},
+        "model_calls_saved_per_turn": (before["model_calls"] - after["model_calls"]) / turns,
+        "wall_ms_saved_per_turn": round((before["wall_ms"] - after["wall_ms"]) / turns, 3),
+        "calculator": time_calculator(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="replays per conversation")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="simulated seconds per model call"
+    )
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    logging.getLogger("google").setLevel(logging.ERROR)
+    print(json.dumps(asyncio.run(compare(args.repeat, args.latency)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""Fixed conversations and scripted model behaviour for every course agent.
+
+Each AgentSpec says where an agent lives, what the stub model should answer
+for the root agent and each of its sub-agents, and which user turns to play.
+The responders roughly follow the agent's own instruction, so the runs hit
+the same tools in the same order the real model is asked to.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from google.adk.memory import BaseMemoryService, InMemoryMemoryService
+from google.genai import types
+
+from services.bm25_memory import BM25MemoryService
+
+from .stub_model import Responder, Turn, call, say
+
+
+@dataclass
+class AgentSpec:
+    """How to find, stub and drive one root agent.
+
+    Attributes:
+        name: The root agent's name.
+        script: Script file ("2b.py") or module ("research_agent.agent").
+        attr: Module attribute that holds the root agent.
+        responders: Agent name -> responder, for the root and every sub-agent.
+        sessions: The fixed conversation, one list of user turns per session.
+        resumable: Run inside a resumable App (needed for confirmations).
+        decide: Human decision for a confirmation request, given the query.
+        remember: Add each finished session to the memory service.
+        memory_service: Factory for the memory service the script uses.
+    """
+
+    name: str
+    script: str
+    attr: str
+    responders: dict[str, Responder]
+    sessions: list[list[str]]
+    resumable: bool = False
+    decide: Optional[Callable[[str], bool]] = None
+    remember: bool = False
+    memory_service: Callable[[], BaseMemoryService] = InMemoryMemoryService
+
+
+def _text_result(turn: Turn) -> str:
+    """The text an AgentTool handed back, or the raw response."""
+    response = turn.last()
+    return str(response.get("result", response))
+
+
+# 1a.py
+def weird_little_guy(turn: Turn) -> types.Content:
+    return say(f"I am asked '{turn.user_text}'. What is... the answer you seek?")
+
+
+# 1b.py
+def research_coordinator(turn: Turn) -> types.Content:
+    if turn.step == 0:
+        return call("ResearchAgent", request=turn.user_text)
+    if turn.step == 1:
+        return call("SummaryAgent", request=_text_result(turn))
+    return say(_text_result(turn))
+
+
+def research_agent(turn: Turn) -> types.Content:
+    return say(
+        f"Findings on {turn.user_text}:\n"
+        "1. A 2024 survey reports steady progress [example.org/survey].\n"
+        "2. Two labs published new benchmark results [example.org/bench].\n"
+        "3. Open problems remain in scaling [example.org/scaling]."
+    )
+
+
+def summary_agent(turn: Turn) -> types.Content:
+    return say(
+        "- Progress is steady\n- New benchmarks were published\n- Scaling is still open"
+    )
+
+
+# 2a.py
+_PAYMENT_METHODS = ("platinum card", "gold card", "bank transfer")
+
+
+def parse_conversion(text: str) -> tuple[float, str, str, str]:
+    """Pulls (amount, method, base, target) out of a conversion request."""
+    amount = re.search(r"\d[\d,]*(?:\.\d+)?", text)
+    codes = re.findall(r"\b[A-Z]{3}\b", text)
+    lowered = text.lower()
+    method = next((m for m in _PAYMENT_METHODS if m in lowered), "bank transfer")
+    base, target = (codes + ["USD", "EUR"])[:2]
+    return float(amount.group().replace(",", "")) if amount else 100.0, method, base, target
+
+
+def parse_conversions(text: str) -> list[tuple[float, str, str, str]]:
+    """One conversion per ';' or line separated clause that mentions an amount."""
+    clauses = [clause for clause in re.split(r"[;\n]", text) if re.search(r"\d", clause)]
+    return [parse_conversion(clause) for clause in clauses] or [parse_conversion(text)]
+
+
+def currency_agent(turn: Turn) -> types.Content:
+    conversions = parse_conversions(turn.user_text)
+    if "convert_currency" in turn.request.tools_dict:
+        if turn.step == 0:
+            return call(
+                "convert_currency",
+                conversions=[
+                    {
+                        "amount": amount,
+                        "payment_method": method,
+                        "base_currency": base,
+                        "target_currency": target,
+                    }
+                    for amount, method, base, target in conversions
+                ],
+            )
+        results = turn.last("convert_currency").get("conversions", [])
+        return say(
+            "\n".join(f"{r.get('final_amount')} {r.get('target_currency')}" for r in results)
+        )
+
+    # one fee lookup, rate lookup and calculation per conversion
+    index, stage = divmod(turn.step, 3)
+    if index == len(conversions):
+        return say(f"Converted amount: {_text_result(turn)}")
+    amount, method, base, target = conversions[index]
+    if stage == 0:
+        return call("get_fee_for_payment_method", method=method)
+    if stage == 1:
+        return call("get_exchange_rate", base_currency=base, target_currency=target)
+    fee = turn.last("get_fee_for_payment_method").get("fee_percentage", 0)
+    rate = turn.last("get_exchange_rate").get("rate", 0)
+    expression = f"{amount} * (1 - {fee}) * {rate}"
+    if "calculate" in turn.request.tools_dict:
+        return call("calculate", expression=expression)
+    return call("CalculationAgent", request=f"Calculate {expression}")
+
+
+def calculation_agent(turn: Turn) -> types.Content:
+    expression = turn.user_text.removeprefix("Calculate ").strip()
+    return types.Content(
+        role="model",
+        parts=[
+            types.Part(
+                executable_code=types.ExecutableCode(
+                    language=types.Language.PYTHON, code=f"print({expression})"
+                )
+            ),
+            types.Part(
+                code_execution_result=types.CodeExecutionResult(
+                    outcome=types.Outcome.OUTCOME_OK, output=expression
+                )
+            ),
+            # Gemini closes a code execution turn with text; without it the
+            # flow treats the turn as unfinished and calls the model again
+            types.Part(text=expression),
+        ],
+    )
+
+
+# 2b.py
+def shipping_agent(turn: Turn) -> types.Content:
+    if turn.step == 0:
+        count = re.search(r"\d+", turn.user_text)
+        destination = re.search(r"\bto (.+?)\.?$", turn.user_text)
+        return call(
+            "place_shipping_order",
+            num_containers=int(count.group()) if count else 1,
+            destination=destination.group(1) if destination else "Singapore",
+        )
+    order = turn.last("place_shipping_order")
+    return say(f"Summary: {order.get('message', order.get('status'))}")
+
+
+# 3a.py
+def text_chat_bot(turn: Turn) -> types.Content:
+    name = re.search(r"my name is (\w+)", turn.user_text, re.IGNORECASE)
+    country = re.search(r"I'm from (\w+)", turn.user_text, re.IGNORECASE)
+    if turn.step == 0 and name:
+        return call(
+            "save_userinfo",
+            user_name=name.group(1),
+            country=country.group(1) if country else "unknown",
+        )
+    if turn.step == 0 and "my name" in turn.user_text.lower():
+        return call("retrieve_userinfo")
+    if turn.step:
+        return say(f"Noted: {turn.last()}")
+    return say("Hello! How can I help?")
+
+
+# 3b.py
+def memory_demo_agent(turn: Turn) -> types.Content:
+    if turn.step == 0:
+        return call("load_memory", query=turn.user_text)
+    memories = turn.last("load_memory").get("memories", [])
+    return say(f"I found {len(memories)} related memories.")
+
+
+def memory_prefetch_agent(turn: Turn) -> types.Content:
+    instruction = str(turn.request.config.system_instruction or "")
+    block = instruction.partition("<PAST_CONVERSATIONS>")[2].partition("</PAST_CONVERSATIONS>")[0]
+    memories = [line for line in block.splitlines() if line.strip()]
+    return say(f"I found {len(memories)} related memories.")
+
+
+# research_agent/agent.py
+def paper_finder(turn: Turn) -> types.Content:
+    if turn.step == 0:
+        return call("google_search_agent", request=turn.user_text)
+    if "count_papers" in turn.request.tools_dict:
+        if turn.step == 1:
+            return call("count_papers", papers=_text_result(turn))
+        return say(f"Papers found. Count: {turn.last('count_papers').get('result')}")
+    found = turn.last("google_search_agent")
+    titles = "\n".join(paper["title"] for paper in found.get("papers", []))
+    return say(f"{titles}\nPapers found. Count: {found.get('count')}")
+
+
+def google_search_agent(turn: Turn) -> types.Content:
+    return say(
+        "1. Quantum Error Correction Below Threshold (2024), arXiv:2408.13687\n"
+        "2. Logical Quantum Processor Based on Reconfigurable Atom Arrays (2023), doi:10.1038/s41586-023-06927-3\n"
+        "3. Evidence for the utility of quantum computing before fault tolerance (2023), doi:10.1038/s41586-023-06096-3\n"
+        "4. Quantum error correction below threshold, Nature (2024), https://arxiv.org/abs/2408.13687"
+    )
+
+
+AGENTS: dict[str, AgentSpec] = {
+    spec.name: spec
+    for spec in [
+        AgentSpec(
+            name="weird_little_guy",
+            script="1a.py",
+            attr="root_agent",
+            responders={"weird_little_guy": weird_little_guy},
+            sessions=[["What is the tallest mountain on Earth?", "Who wrote Hamlet?"]],
+        ),
+        AgentSpec(
+            name="RootAgent",
+            script="1b.py",
+            attr="root_agent",
+            responders={
+                "RootAgent": research_coordinator,
+                "ResearchAgent": research_agent,
+                "SummaryAgent": summary_agent,
+            },
+            sessions=[["What are the latest advancements in quantum computing?"]],
+        ),
+        AgentSpec(
+            name="ResearchPipeline",
+            script="1b.py",
+            attr="research_pipeline",
+            responders={
+                **{f"ResearchAgent_{i}": research_agent for i in range(3)},
+                "SummaryAgent": summary_agent,
+            },
+            sessions=[["What are the latest advancements in quantum computing?"]],
+        ),
+        AgentSpec(
+            name="enhanced_currency_agent",
+            script="2a.py",
+            attr="enhanced_currency_agent",
+            responders={"enhanced_currency_agent": currency_agent},
+            sessions=[
+                [
+                    "Convert 1,250 USD to INR using a Bank Transfer.",
+                    "Convert 500 USD to EUR using a platinum card.",
+                    "Convert 100 USD to EUR using a gold card; 250 GBP to JPY by bank transfer; "
+                    "75 EUR to INR with a platinum card; 1,000 CAD to USD by bank transfer; "
+                    "60 CHF to SGD using a gold card",
+                ]
+            ],
+        ),
+        AgentSpec(
+            name="code_executor_currency_agent",
+            script="2a.py",
+            attr="code_executor_currency_agent",
+            responders={
+                "code_executor_currency_agent": currency_agent,
+                "CalculationAgent": calculation_agent,
+            },
+            sessions=[
+                [
+                    "Convert 1,250 USD to INR using a Bank Transfer.",
+                    "Convert 500 USD to EUR using a platinum card.",
+                    "Convert 100 USD to EUR using a gold card; 250 GBP to JPY by bank transfer; "
+                    "75 EUR to INR with a platinum card; 1,000 CAD to USD by bank transfer; "
+                    "60 CHF to SGD using a gold card",
+                ]
+            ],
+        ),
+        AgentSpec(
+            name="shipping_agent",
+            script="2b.py",
+            attr="shipping_agent",
+            responders={"shipping_agent": shipping_agent},
+            sessions=[
+                ["Ship 3 containers to Singapore"],
+                ["Ship 10 containers to Rotterdam"],
+                ["Ship 8 containers to Los Angeles"],
+            ],
+            resumable=True,
+            decide=lambda query: "Los Angeles" not in query,
+        ),
+        AgentSpec(
+            name="text_chat_bot",
+            script="3a.py",
+            attr="root_agent",
+            responders={"text_chat_bot": text_chat_bot},
+            sessions=[
+                [
+                    "Hi there, how are you doing today? What is my name?",
+                    "My name is Sam. I'm from Poland.",
+                    "What is my name? Which country am I from?",
+                ]
+            ],
+        ),
+        AgentSpec(
+            name="MemoryDemoAgent",
+            script="3b.py",
+            attr="memory_tool_agent",
+            responders={"MemoryDemoAgent": memory_demo_agent},
+            sessions=[
+                ["My favorite color is blue-green. Can you write a Haiku about it?"],
+                ["What is my favorite color?"],
+            ],
+            remember=True,
+            memory_service=BM25MemoryService,
+        ),
+        AgentSpec(
+            name="MemoryPrefetchAgent",
+            script="3b.py",
+            attr="memory_prefetch_agent",
+            responders={"MemoryPrefetchAgent": memory_prefetch_agent},
+            sessions=[
+                ["My favorite color is blue-green. Can you write a Haiku about it?"],
+                ["What is my favorite color?"],
+            ],
+            remember=True,
+            memory_service=BM25MemoryService,
+        ),
+        AgentSpec(
+            name="research_paper_finder_agent",
+            script="research_agent.agent",
+            attr="root_agent",
+            responders={
+                "research_paper_finder_agent": paper_finder,
+                "google_search_agent": google_search_agent,
+            },
+            sessions=[["Find recent papers on quantum computing"]],
+        ),
+    ]
+}
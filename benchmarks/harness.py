@@ -0,0 +1,329 @@
+"""Drives the course agents through their fixed conversations and times them."""
+
+import contextlib
+import statistics
+import time
+import uuid
+from typing import Iterator, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.apps.app import App, ResumabilityConfig
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.sessions.base_session_service import BaseSessionService
+from google.genai import types
+
+from services.agent_tree import iter_llm_agents
+from services.compaction import TokenBudgetCompactor
+from services.context_accounting import ContextAccounting
+from services.model_cache import ResponseStore, cached_models
+from services.near_duplicates import NearDuplicateIndex
+from services.search_cache import CachedAgentTool, SearchCache
+
+from .conversations import AGENTS, AgentSpec
+from .scripts import load_script
+from .stub_model import Responder, ScriptedGemini
+
+USER_ID = "bench_user"
+
+
+def iter_cached_tools(agent: BaseAgent) -> Iterator[CachedAgentTool]:
+    """Yields every CachedAgentTool used by the agent tree."""
+    for llm_agent in iter_llm_agents(agent):
+        for tool in llm_agent.tools:
+            if isinstance(tool, CachedAgentTool):
+                yield tool
+
+
+def reset_caches(agent: BaseAgent, module=None):
+    """Empties the (benchmark-private) caches and indexes so every run starts cold."""
+    for tool in iter_cached_tools(agent):
+        tool.cache.clear()
+        if getattr(tool, "duplicates", None) is not None:
+            tool.duplicates.clear()
+    for value in vars(module).values() if module else ():
+        if isinstance(value, NearDuplicateIndex):
+            value.clear()
+
+
+@contextlib.contextmanager
+def private_caches(agent: BaseAgent, module=None):
+    """Swaps result caches and near-duplicate indexes for in-memory ones until exit.
+
+    A benchmark then neither reads nor pollutes the real on-disk stores.
+    Indexes are looked up on the tools and, for callbacks that use a global
+    index, on the script module.
+    """
+    swapped = []
+    for tool in iter_cached_tools(agent):
+        swapped.append((tool, "cache", tool.cache))
+        tool.cache = SearchCache(path=None, ttl=tool.cache.ttl)
+        if getattr(tool, "duplicates", None) is not None:
+            swapped.append((tool, "duplicates", tool.duplicates))
+            tool.duplicates = NearDuplicateIndex()
+    for name, value in list(vars(module).items()) if module else ():
+        if isinstance(value, NearDuplicateIndex):
+            swapped.append((module, name, value))
+            setattr(module, name, NearDuplicateIndex())
+    try:
+        yield
+    finally:
+        for owner, name, value in swapped:
+            setattr(owner, name, value)
+
+
+@contextlib.contextmanager
+def stubbed(
+    agent: BaseAgent, responders: dict[str, Responder], latency: float = 0.0, module=None
+):
+    """Swaps every model in the agent tree for a ScriptedGemini.
+
+    Result caches and indexes are swapped for private in-memory ones too
+    (see private_caches).
+
+    Yields:
+        Agent name -> the stub now serving it. Original models and caches
+        are put back on exit.
+    """
+    originals = {}
+    stubs = {}
+    for llm_agent in iter_llm_agents(agent):
+        if llm_agent.name not in responders:
+            raise KeyError(f"no scripted responder for agent '{llm_agent.name}'")
+        originals[llm_agent.name] = (llm_agent, llm_agent.model)
+        stubs[llm_agent.name] = ScriptedGemini(
+            responder=responders[llm_agent.name], latency=latency
+        )
+        llm_agent.model = stubs[llm_agent.name]
+    try:
+        with private_caches(agent, module):
+            yield stubs
+    finally:
+        for llm_agent, model in originals.values():
+            llm_agent.model = model
+
+
+@contextlib.contextmanager
+def recorded(agent: BaseAgent, store: ResponseStore, mode: str = "replay", module=None):
+    """Serves the agent tree's real models through a recorded response store.
+
+    In "record" mode the real models are called and their answers stored; in
+    "replay" mode only stored answers are used, so the run is offline and
+    deterministic. Result caches and indexes are swapped for private
+    in-memory ones too.
+
+    Yields:
+        Agent name -> the CachingLlm now serving it.
+    """
+    with cached_models(agent, store, mode=mode) as models, private_caches(agent, module):
+        yield models
+
+
+def make_runner(
+    spec: AgentSpec,
+    agent: BaseAgent,
+    accounting: Optional[ContextAccounting] = None,
+    session_service: Optional[BaseSessionService] = None,
+    compactor: Optional[TokenBudgetCompactor] = None,
+) -> Runner:
+    """Builds a fresh runner with in-memory services (or the given session service) for one benchmark run."""
+    services = dict(
+        session_service=session_service or InMemorySessionService(),
+        memory_service=spec.memory_service(),
+    )
+    plugins = [plugin for plugin in (compactor, accounting) if plugin is not None]
+    if spec.resumable:
+        app = App(
+            name="benchmark",
+            root_agent=agent,
+            resumability_config=ResumabilityConfig(is_resumable=True),
+            plugins=plugins,
+        )
+        return Runner(app=app, **services)
+    return Runner(agent=agent, app_name="benchmark", plugins=plugins, **services)
+
+
+def find_confirmation(event) -> Optional[types.FunctionCall]:
+    """Returns the adk_request_confirmation call in an event, if any."""
+    for call in event.get_function_calls():
+        if call.name == "adk_request_confirmation":
+            return call
+    return None
+
+
+async def run_turn(
+    runner: Runner, spec: AgentSpec, session_id: str, query: str
+) -> int:
+    """Sends one user turn, answers any confirmation, and counts events."""
+    message = types.Content(role="user", parts=[types.Part(text=query)])
+    invocation_id = None
+    events = 0
+    while message is not None:
+        pending = None
+        async for event in runner.run_async(
+            user_id=USER_ID,
+            session_id=session_id,
+            new_message=message,
+            invocation_id=invocation_id,
+        ):
+            events += 1
+            confirmation = find_confirmation(event)
+            if confirmation and pending is None:
+                pending = (confirmation, event.invocation_id)
+        message = None
+        if pending and spec.decide is not None:
+            confirmation, invocation_id = pending
+            message = types.Content(
+                role="user",
+                parts=[
+                    types.Part(
+                        function_response=types.FunctionResponse(
+                            id=confirmation.id,
+                            name="adk_request_confirmation",
+                            response={"confirmed": spec.decide(query)},
+                        )
+                    )
+                ],
+            )
+    return events
+
+
+async def run_conversation(
+    spec: AgentSpec,
+    agent: BaseAgent,
+    stubs: dict,
+    module=None,
+    accounting: Optional[ContextAccounting] = None,
+    session_service: Optional[BaseSessionService] = None,
+    compactor: Optional[TokenBudgetCompactor] = None,
+) -> list[dict]:
+    """Plays the spec's conversation once and returns per-turn measurements."""
+    reset_caches(agent, module)
+    runner = make_runner(spec, agent, accounting, session_service, compactor)
+    turns = []
+    for session_index, queries in enumerate(spec.sessions):
+        session = await runner.session_service.create_session(
+            app_name=runner.app_name,
+            user_id=USER_ID,
+            session_id=f"bench-{session_index}-{uuid.uuid4().hex[:8]}",
+        )
+        for turn_index, query in enumerate(queries):
+            model_calls = sum(stub.calls for stub in stubs.values())
+            tool_calls = sum(stub.tool_calls for stub in stubs.values())
+            started = time.perf_counter()
+            events = await run_turn(runner, spec, session.id, query)
+            wall_ms = (time.perf_counter() - started) * 1000
+            turns.append(
+                {
+                    "session": session_index,
+                    "turn": turn_index,
+                    "query": query,
+                    "wall_ms": wall_ms,
+                    "model_calls": sum(s.calls for s in stubs.values()) - model_calls,
+                    "tool_calls": sum(s.tool_calls for s in stubs.values()) - tool_calls,
+                    "events": events,
+                }
+            )
+        if spec.remember:
+            session = await runner.session_service.get_session(
+                app_name=runner.app_name, user_id=USER_ID, session_id=session.id
+            )
+            await runner.memory_service.add_session_to_memory(session)
+    await runner.close()
+    return turns
+
+
+async def benchmark_agent(
+    spec: AgentSpec,
+    repeat: int = 5,
+    latency: float = 0.0,
+    store: Optional[ResponseStore] = None,
+    cache_mode: str = "replay",
+    accounting: Optional[ContextAccounting] = None,
+    session_service: Optional[BaseSessionService] = None,
+    compactor: Optional[TokenBudgetCompactor] = None,
+) -> dict:
+    """Runs one agent's conversation `repeat` times.
+
+    Args:
+        spec: The agent to benchmark.
+        repeat: How many times to replay the whole conversation.
+        latency: Simulated seconds per model call (stub models only).
+        store: Recorded responses of the real models. When given, the agents
+            run on their own models through the store instead of the stub.
+        cache_mode: CachingLlm mode used with `store`.
+        accounting: Plugin that records the context size of every model call.
+        session_service: Where the runs' sessions are kept, for a look at
+            their events afterwards (default: a fresh in-memory service per run).
+        compactor: Plugin that compacts the sessions once their context
+            passes its token budget.
+
+    Returns:
+        A JSON-ready dict with per-turn wall times (median/min over the
+        repeats) plus model calls, tool calls and events per turn.
+    """
+    module = load_script(spec.script)
+    agent = getattr(module, spec.attr)
+
+    runs = []
+    if store is not None:
+        models = recorded(agent, store, mode=cache_mode, module=module)
+    else:
+        models = stubbed(agent, spec.responders, latency=latency, module=module)
+    with models as stubs:
+        for _ in range(repeat):
+            runs.append(await run_conversation(spec, agent, stubs, module, accounting, session_service, compactor))
+        model_cache = (
+            {name: model.stats() for name, model in stubs.items()} if store else None
+        )
+
+    turns = []
+    for measurements in zip(*runs):
+        wall = [m["wall_ms"] for m in measurements]
+        turn = dict(measurements[-1])
+        turn["wall_ms"] = round(statistics.median(wall), 3)
+        turn["wall_ms_min"] = round(min(wall), 3)
+        turns.append(turn)
+
+    return {
+        "agent": spec.name,
+        "script": spec.script,
+        "repeat": repeat,
+        "turns": turns,
+        "totals": {
+            "wall_ms": round(sum(turn["wall_ms"] for turn in turns), 3),
+            **{
+                key: sum(turn[key] for turn in turns)
+                for key in ("model_calls", "tool_calls", "events")
+            },
+        },
+        **({"model_cache": model_cache} if model_cache else {}),
+    }
+
+
+async def benchmark_all(
+    names: Optional[list[str]] = None,
+    repeat: int = 5,
+    latency: float = 0.0,
+    store: Optional[ResponseStore] = None,
+    cache_mode: str = "replay",
+    accounting: Optional[ContextAccounting] = None,
+    session_service: Optional[BaseSessionService] = None,
+    compactor: Optional[TokenBudgetCompactor] = None,
+) -> list[dict]:
+    """Benchmarks the named agents (all of them by default), in order."""
+    results = []
+    for name in names or list(AGENTS):
+        results.append(
+            await benchmark_agent(
+                AGENTS[name],
+                repeat=repeat,
+                latency=latency,
+                store=store,
+                cache_mode=cache_mode,
+                accounting=accounting,
+                session_service=session_service,
+                compactor=compactor,
+            )
+        )
+    return results
@@ -0,0 +1,247 @@
+"""Replays a workload of conversations against the course runners under load.
+
+Each workload line is one conversation:
+
+    {"agent": "shipping_agent", "session_id": "order-1", "turns": ["Ship 3 containers to Singapore"]}
+
+N virtual users pull conversations off a shared queue and play their turns
+in order, all against one Runner (with one InMemorySessionService) per agent
+and the scripted stub model. Per-turn latency, throughput, error rate and
+event-loop lag are reported, so a `--users 1,8,64,256` sweep shows where a
+single runner stops scaling.
+
+Usage:
+    python -m benchmarks.loadtest --users 1,8,64 --latency 0.05
+    python -m benchmarks.loadtest --workload my_workload.jsonl --iterations 10
+    python -m benchmarks.loadtest --users 64 --compaction-budget 2000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import time
+import warnings
+from dataclasses import dataclass
+from typing import Optional
+
+from services.compaction import TokenBudgetCompactor
+
+from .conversations import AGENTS
+from .harness import USER_ID, make_runner, run_turn, stubbed
+from .scripts import load_script
+
+
+@dataclass
+class Conversation:
+    """One workload line."""
+
+    agent: str
+    session_id: str
+    turns: list[str]
+
+
+def load_workload(path: str) -> tuple[list[Conversation], int]:
+    """Reads a workload file.
+
+    Lines without an "agent" and "turns" are not conversations (the file may
+    carry other records) and are skipped rather than treated as errors.
+
+    Returns:
+        The conversations, and how many lines were skipped.
+    """
+    conversations = []
+    skipped = 0
+    with open(path) as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "agent" not in record or "turns" not in record:
+                skipped += 1
+                continue
+            if record["agent"] not in AGENTS:
+                raise ValueError(f"{path}:{number}: unknown agent '{record['agent']}'")
+            turns = record["turns"]
+            conversations.append(
+                Conversation(
+                    agent=record["agent"],
+                    session_id=record.get("session_id", f"line-{number}"),
+                    turns=[turns] if isinstance(turns, str) else list(turns),
+                )
+            )
+    return conversations, skipped
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile, q in [0, 100]."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+async def _probe_loop_lag(samples: list[float], interval: float = 0.01):
+    """Records how late the event loop wakes a sleeping task."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - started - interval) * 1000)
+
+
+async def run_load(
+    conversations: list[Conversation], users: int, runners: dict, iterations: int = 1
+) -> dict:
+    """Plays the workload with `users` concurrent virtual users.
+
+    Args:
+        conversations: The workload.
+        users: Number of virtual users (concurrent conversations).
+        runners: Agent name -> the shared Runner serving it.
+        iterations: How many times to replay the whole workload.
+
+    Returns:
+        Latency percentiles, throughput, error rate and loop lag.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for iteration in range(iterations):
+        for conversation in conversations:
+            queue.put_nowait((iteration, conversation))
+
+    latencies: list[float] = []
+    errors: list[str] = []
+
+    async def virtual_user():
+        while True:
+            try:
+                iteration, conversation = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            runner = runners[conversation.agent]
+            spec = AGENTS[conversation.agent]
+            try:
+                session = await runner.session_service.create_session(
+                    app_name=runner.app_name,
+                    user_id=USER_ID,
+                    session_id=f"{conversation.session_id}-u{users}-{iteration}",
+                )
+            except Exception as e:
+                errors.append(f"{conversation.session_id}: {e!r}")
+                continue
+            for query in conversation.turns:
+                started = time.perf_counter()
+                try:
+                    await run_turn(runner, spec, session.id, query)
+                except Exception as e:
+                    errors.append(f"{conversation.session_id}: {e!r}")
+                    break
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    lag: list[float] = []
+    probe = asyncio.create_task(_probe_loop_lag(lag))
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user() for _ in range(users)))
+    elapsed = time.perf_counter() - started
+    probe.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await probe
+
+    attempted = len(latencies) + len(errors)
+    return {
+        "users": users,
+        "turns": len(latencies),
+        "errors": len(errors),
+        "error_rate": len(errors) / attempted if attempted else 0.0,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_tps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(max(latencies, default=0.0), 3),
+        },
+        "loop_lag_ms": {
+            "p50": round(percentile(lag, 50), 3),
+            "p99": round(percentile(lag, 99), 3),
+        },
+        "sample_errors": errors[:5],
+    }
+
+
+async def load_test(
+    workload: str,
+    users: list[int],
+    latency: float,
+    iterations: int,
+    compaction_budget: Optional[int] = None,
+) -> dict:
+    """Sets up one runner per agent in the workload and sweeps the user counts.
+
+    With a `compaction_budget`, every runner shares one TokenBudgetCompactor
+    and each run reports its compaction stats.
+    """
+    conversations, skipped = load_workload(workload)
+    if not conversations:
+        raise ValueError(f"{workload} has no conversations (skipped {skipped} lines)")
+
+    agents = sorted({conversation.agent for conversation in conversations})
+    results = []
+    compactor = TokenBudgetCompactor(token_budget=compaction_budget) if compaction_budget else None
+    with contextlib.ExitStack() as stack:
+        runners = {}
+        for name in agents:
+            spec = AGENTS[name]
+            module = load_script(spec.script)
+            agent = getattr(module, spec.attr)
+            stack.enter_context(stubbed(agent, spec.responders, latency=latency, module=module))
+            runners[name] = make_runner(spec, agent, compactor=compactor)
+        for count in users:
+            results.append(await run_load(conversations, count, runners, iterations))
+            if compactor is not None:
+                results[-1]["compaction"] = compactor.stats()
+        for runner in runners.values():
+            await runner.close()
+
+    return {
+        "workload": workload,
+        "conversations": len(conversations),
+        "skipped_lines": skipped,
+        "agents": agents,
+        "iterations": iterations,
+        "latency": latency,
+        "runs": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workload", default="benchmarks/workload.jsonl", help="workload jsonl file")
+    parser.add_argument(
+        "--users", default="1,8,32",
+        help="comma separated virtual user counts to sweep",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="simulated seconds per model call"
+    )
+    parser.add_argument("--iterations", type=int, default=1, help="replays of the workload")
+    parser.add_argument(
+        "--compaction-budget", type=int, metavar="TOKENS",
+        help="compact each session with TokenBudgetCompactor once its context passes TOKENS",
+    )
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    logging.getLogger("google").setLevel(logging.ERROR)
+
+    users = [int(count) for count in args.users.split(",")]
+    report = asyncio.run(
+        load_test(args.workload, users, args.latency, args.iterations, args.compaction_budget)
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
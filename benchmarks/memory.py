@@ -0,0 +1,146 @@
+"""Query latency of the memory services as the remembered history grows.
+
+Fills InMemoryMemoryService, BM25MemoryService and HashedNgramMemoryService
+with the same synthetic sessions (Zipf-distributed vocabulary, chat-like
+stopwords) and times `search_memory` for queries drawn from the stored text.
+
+Usage:
+    python -m benchmarks.memory
+    python -m benchmarks.memory --sizes 10000,100000,1000000 --baseline-max 100000
+    python -m benchmarks.memory --backends bm25,vector --sizes 100000
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+
+import numpy as np
+from google.adk.events.event import Event
+from google.adk.memory import InMemoryMemoryService
+from google.adk.sessions.session import Session
+from google.genai import types
+
+from services.bm25_memory import BM25MemoryService
+from services.vector_memory import HashedNgramMemoryService
+
+from .loadtest import percentile
+
+APP_NAME = "memory_bench"
+USER_ID = "bench_user"
+EVENTS_PER_SESSION = 100
+_FILLER = ["i", "my", "the", "is", "what", "a", "to", "and", "you", "it"]
+
+
+def synthetic_sessions(events: int, vocabulary: int = 50_000, seed: int = 0):
+    """Yields sessions of EVENTS_PER_SESSION events with 8-24 word messages."""
+    rng = np.random.default_rng(seed)
+    words = np.array([f"w{i}" for i in range(vocabulary)])
+    for start in range(0, events, EVENTS_PER_SESSION):
+        count = min(EVENTS_PER_SESSION, events - start)
+        lengths = rng.integers(8, 25, size=count)
+        ids = np.minimum(rng.zipf(1.2, size=int(lengths.sum())), vocabulary) - 1
+        offset = 0
+        session_events = []
+        for n, length in enumerate(lengths):
+            text = " ".join(
+                _FILLER[(start + n + i) % len(_FILLER)] + " " + word
+                for i, word in enumerate(words[ids[offset : offset + length]])
+            )
+            offset += length
+            session_events.append(
+                Event(
+                    author="user" if n % 2 == 0 else "model",
+                    invocation_id=f"inv-{start + n}",
+                    content=types.Content(role="user", parts=[types.Part(text=text)]),
+                )
+            )
+        yield Session(
+            id=f"session-{start // EVENTS_PER_SESSION}",
+            app_name=APP_NAME,
+            user_id=USER_ID,
+            events=session_events,
+        )
+
+
+def sample_queries(count: int, vocabulary: int = 50_000, seed: int = 1) -> list[str]:
+    """Chat-style questions mixing stopwords with mid-frequency and rare terms."""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(count):
+        terms = [f"w{int(i)}" for i in rng.integers(10, vocabulary // 10, size=3)]
+        queries.append(f"What is my {terms[0]} and the {terms[1]} {terms[2]}?")
+    return queries
+
+
+async def time_service(service, size: int, queries: list[str]) -> dict:
+    """Fills the service with `size` events and times every query."""
+    started = time.perf_counter()
+    for session in synthetic_sessions(size):
+        await service.add_session_to_memory(session)
+    build_s = time.perf_counter() - started
+
+    latencies = []
+    results = 0
+    for query in queries:
+        started = time.perf_counter()
+        response = await service.search_memory(app_name=APP_NAME, user_id=USER_ID, query=query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results += len(response.memories)
+    return {
+        "build_s": round(build_s, 2),
+        "query_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "max": round(max(latencies), 3),
+        },
+        "avg_results": round(results / len(queries), 1),
+    }
+
+
+async def benchmark_memory(
+    sizes: list[int], queries: int, baseline_max: int, backends: list[str]
+) -> list[dict]:
+    questions = sample_queries(queries)
+    runs = []
+    for size in sizes:
+        run = {"events": size}
+        if "bm25" in backends:
+            run["bm25"] = await time_service(BM25MemoryService(), size, questions)
+        if "vector" in backends:
+            with tempfile.TemporaryDirectory() as path:
+                service = HashedNgramMemoryService(path=path)
+                run["vector"] = await time_service(service, size, questions)
+                service.close()
+        if "in_memory" in backends and size <= baseline_max:
+            # the baseline scans every event, so a few queries are enough
+            run["in_memory"] = await time_service(
+                InMemoryMemoryService(), size, questions[: max(1, queries // 10)]
+            )
+        runs.append(run)
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma separated event counts")
+    parser.add_argument("--queries", type=int, default=200, help="queries timed per size")
+    parser.add_argument(
+        "--baseline-max", type=int, default=100_000,
+        help="largest size InMemoryMemoryService is run at (it scans every event per query)",
+    )
+    parser.add_argument(
+        "--backends", default="bm25,vector,in_memory",
+        help="comma separated memory services to run (bm25, vector, in_memory)",
+    )
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    backends = args.backends.split(",")
+    report = asyncio.run(benchmark_memory(sizes, args.queries, args.baseline_max, backends))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
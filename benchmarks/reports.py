@@ -0,0 +1,111 @@
+"""Canned event-log reports for the course agents.
+
+Each agent gets the questions worth asking of its events, answered with
+services.event_analytics:
+- enhanced_currency_agent: tool calls per conversion (one user turn).
+- code_executor_currency_agent: the same, plus the time the
+  CalculationAgent tool takes.
+- shipping_agent: time from adk_request_confirmation to the answer that
+  resumed the order.
+- RootAgent: which sub-agent (AgentTool) dominates its latency.
+- Every other agent: tool calls per invocation.
+
+The events come from a session export (`export_sessions`, see
+benchmarks.archive), or, by default, from a fresh run of the benchmark
+conversations on the stub models, where --latency sets the simulated
+seconds per model call.
+
+Usage:
+    python -m benchmarks.reports                              # run the conversations, report every agent
+    python -m benchmarks.reports --agent RootAgent --latency 0.05 --repeat 3
+    python -m benchmarks.reports --archive session_archive --agent shipping_agent
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import warnings
+from functools import partial
+from typing import Callable
+
+import pyarrow as pa
+from google.adk.sessions import InMemorySessionService
+
+from services.event_analytics import (
+    Events,
+    confirmation_waits,
+    events_dataset,
+    sub_agent_latency,
+    tool_calls_per_invocation,
+)
+from services.session_archive import event_batches
+
+from .conversations import AGENTS
+from .harness import benchmark_all
+
+REPORTS: dict[str, dict[str, Callable[[Events], dict]]] = {
+    "enhanced_currency_agent": {
+        "tool_calls_per_conversion": partial(tool_calls_per_invocation, agent="enhanced_currency_agent"),
+    },
+    "code_executor_currency_agent": {
+        "tool_calls_per_conversion": partial(tool_calls_per_invocation, agent="code_executor_currency_agent"),
+        "sub_agent_latency": partial(sub_agent_latency, agent="code_executor_currency_agent"),
+    },
+    "shipping_agent": {
+        "confirmation_wait": partial(confirmation_waits, caller="shipping_agent"),
+        "tool_calls_per_order": partial(tool_calls_per_invocation, agent="shipping_agent"),
+    },
+    "RootAgent": {
+        "sub_agent_latency": partial(sub_agent_latency, agent="RootAgent"),
+        "tool_calls_per_query": partial(tool_calls_per_invocation, agent="RootAgent"),
+    },
+}
+
+
+def reports_for(agent: str) -> dict[str, Callable[[Events], dict]]:
+    return REPORTS.get(agent, {"tool_calls_per_invocation": partial(tool_calls_per_invocation, agent=agent)})
+
+
+async def run_agents(names: list[str], repeat: int, latency: float) -> pa.Table:
+    """Plays the agents' benchmark conversations on the stub models; returns their events."""
+    session_service = InMemorySessionService()
+    await benchmark_all(names, repeat=repeat, latency=latency, session_service=session_service)
+    batches = [batch async for batch in event_batches(session_service, app_name="benchmark")]
+    return pa.Table.from_batches(batches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--agent", action="append", choices=sorted(AGENTS),
+        help="agent to report on (repeatable, default: all)",
+    )
+    parser.add_argument("--archive", help="read the events of this export_sessions directory instead of running")
+    parser.add_argument("--repeat", type=int, default=1, help="conversation replays when running the agents")
+    parser.add_argument(
+        "--latency", type=float, default=0.01, help="simulated seconds per model call when running the agents"
+    )
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    logging.getLogger("google").setLevel(logging.ERROR)
+
+    names = args.agent or list(AGENTS)
+    if args.archive:
+        events = events_dataset(args.archive)
+    else:
+        events = asyncio.run(run_agents(names, args.repeat, args.latency))
+    report = {name: {title: run(events) for title, run in reports_for(name).items()} for name in names}
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
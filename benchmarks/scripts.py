@@ -0,0 +1,53 @@
+"""Loads the course scripts (1a.py, 2b.py, ...) as modules.
+
+The scripts have names that are not valid identifiers and print a lot while
+they set up, so they cannot be imported the usual way. `load_script` runs
+them once under a private module name with their chatter silenced; their
+`main()` stays behind the `__name__ == "__main__"` guard.
+"""
+
+import contextlib
+import importlib
+import importlib.util
+import io
+import sys
+from pathlib import Path
+from types import ModuleType
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_script(name: str, quiet: bool = True) -> ModuleType:
+    """Imports a course script or package module by file name.
+
+    Args:
+        name: A script name like "2b.py", or a dotted module path like
+              "research_agent.agent".
+        quiet: Whether to swallow whatever the script prints on import.
+
+    Returns:
+        The loaded module. Repeat calls return the same module object.
+    """
+    module_name = name
+    if name.endswith(".py"):
+        module_name = "course_" + Path(name).stem
+
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+
+    sink = io.StringIO() if quiet else sys.stdout
+    with contextlib.redirect_stdout(sink):
+        if not name.endswith(".py"):
+            return importlib.import_module(name)
+        spec = importlib.util.spec_from_file_location(module_name, REPO_ROOT / name)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[module_name]
+            raise
+    return module
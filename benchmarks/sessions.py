@@ -0,0 +1,216 @@
+"""Write throughput and read latency of the session services on a local SQLite file.
+
+Creates sessions and appends synthetic events to them from concurrent tasks,
+timing every `append_event`. Each invocation is a user message, a tool call,
+its response (with a state change) and a final model answer, so the batching
+service commits once per four events. With --state-kb every session starts
+with that much state, which the state changes leave untouched: the pooled
+service writes only the changed keys, DatabaseSessionService rewrites the
+whole state. DatabaseSessionService, which commits
+every event on its own, is run on a smaller number of sessions. With
+--history, reads of one long session are timed too: whole, the last few
+events, the first page of iter_events, and an event count.
+
+Usage:
+    python -m benchmarks.sessions
+    python -m benchmarks.sessions --sessions 10000 --events 50 --baseline-sessions 500
+    python -m benchmarks.sessions --services pooled,pooled_unbatched --sessions 1000
+    python -m benchmarks.sessions --sessions 500 --baseline-sessions 500 --state-kb 16
+    python -m benchmarks.sessions --sessions 0 --history 100000 --window 50
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import tempfile
+import time
+
+from google.adk.events.event import Event, EventActions
+from google.adk.sessions import DatabaseSessionService
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.genai import types
+
+from services.sessions import iter_events
+from services.sqlite_sessions import PooledSqliteSessionService
+
+from .loadtest import percentile
+
+APP_NAME = "session_bench"
+SERVICES = {
+    "pooled": lambda path: PooledSqliteSessionService(path),
+    "pooled_unbatched": lambda path: PooledSqliteSessionService(path, batch_invocations=False),
+    "database": lambda path: DatabaseSessionService(f"sqlite+aiosqlite:///{path}"),
+}
+
+
+def _templates() -> list[Event]:
+    """One event per step of an invocation: user message, tool call, tool response, answer."""
+    call = types.Part(function_call=types.FunctionCall(name="lookup", args={"order": 42}))
+    response = types.Part(function_response=types.FunctionResponse(name="lookup", response={"status": "shipped"}))
+    return [
+        Event(author="user", content=types.Content(role="user", parts=[types.Part(text="Where is order 42?")])),
+        Event(author="agent", content=types.Content(role="model", parts=[call])),
+        Event(
+            author="agent",
+            content=types.Content(role="user", parts=[response]),
+            actions=EventActions(state_delta={"last_status": "shipped", "user:orders_seen": 1}),
+        ),
+        Event(author="agent", content=types.Content(role="model", parts=[types.Part(text="Order 42 has shipped.")])),
+    ]
+
+
+_TEMPLATES = _templates()
+
+
+def synthetic_event(session_index: int, n: int) -> Event:
+    """The n-th event of a session: a copy of its step's template with a fresh id and timestamp.
+
+    Copying skips pydantic validation, which would otherwise cost more than the append itself.
+    """
+    return _TEMPLATES[n % 4].model_copy(
+        update={
+            "id": Event.new_id(),
+            "invocation_id": f"inv-{session_index}-{n // 4}",
+            "timestamp": time.time(),
+            # append_event replaces actions.state_delta, so each copy needs its own actions
+            "actions": _TEMPLATES[n % 4].actions.model_copy(),
+        }
+    )
+
+
+async def write_sessions(service, sessions: int, events: int, concurrency: int, state_kb: int = 0) -> dict:
+    """Creates `sessions` sessions of `events` events from `concurrency` tasks."""
+    latencies: list[float] = []
+    queue = iter(range(sessions))
+    state = {"notes": "x" * (state_kb * 1024)} if state_kb else None
+
+    async def worker():
+        for index in queue:
+            session = await service.create_session(
+                app_name=APP_NAME, user_id=f"user-{index % 100}", session_id=f"session-{index}", state=state
+            )
+            for n in range(events):
+                event = synthetic_event(index, n)
+                started = time.perf_counter()
+                await service.append_event(session, event)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    # DatabaseSessionService creates its tables and app row lazily, and concurrent first
+    # calls race on them, so one session is created (and dropped) before timing starts
+    await service.create_session(app_name=APP_NAME, user_id="warmup", session_id="warmup")
+    await service.delete_session(app_name=APP_NAME, user_id="warmup", session_id="warmup")
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    if hasattr(service, "flush"):
+        await service.flush()
+    wall_s = time.perf_counter() - started
+    return {
+        "sessions": sessions,
+        "events": len(latencies),
+        "wall_s": round(wall_s, 2),
+        "events_per_s": round(len(latencies) / wall_s),
+        "append_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(max(latencies), 3),
+        },
+    }
+
+
+async def read_latency(history: int, window: int, repeat: int = 20) -> dict:
+    """Times reads of one session with `history` events: whole, windowed, paged and counted."""
+    with tempfile.TemporaryDirectory() as directory:
+        async with PooledSqliteSessionService(os.path.join(directory, "sessions.db")) as service:
+            session = await service.create_session(app_name=APP_NAME, user_id="reader", session_id="long")
+            for n in range(history):
+                await service.append_event(session, synthetic_event(0, n))
+            key = dict(app_name=APP_NAME, user_id="reader", session_id="long")
+
+            async def first_page():
+                events = []
+                async with contextlib.aclosing(iter_events(service, page_size=window, **key)) as newest:
+                    async for event in newest:
+                        events.append(event)
+                        if len(events) == window:
+                            break
+                return events
+
+            reads = {
+                "get_session_all": lambda: service.get_session(**key),
+                f"get_session_last_{window}": lambda: service.get_session(
+                    **key, config=GetSessionConfig(num_recent_events=window)
+                ),
+                f"iter_events_first_{window}": first_page,
+                "count_events": lambda: service.count_events(**key),
+            }
+            report = {"history": history}
+            for name, read in reads.items():
+                latencies = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    await read()
+                    latencies.append((time.perf_counter() - started) * 1000)
+                report[name] = {"p50_ms": round(percentile(latencies, 50), 3)}
+            return report
+
+
+async def benchmark_sessions(
+    services: list[str], sessions: int, events: int, concurrency: int, baseline_sessions: int, state_kb: int = 0
+) -> list[dict]:
+    runs = []
+    for name in services:
+        count = min(sessions, baseline_sessions) if name == "database" else sessions
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sessions.db")
+            service = SERVICES[name](path)
+            run = {"service": name, **await write_sessions(service, count, events, concurrency, state_kb)}
+            if hasattr(service, "stats"):
+                run["stats"] = service.stats()
+            await service.close()
+            run["db_mb"] = round(
+                sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / 2**20, 1
+            )
+        runs.append(run)
+    return runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10_000)
+    parser.add_argument("--events", type=int, default=50, help="events per session")
+    parser.add_argument("--concurrency", type=int, default=16, help="sessions written at once")
+    parser.add_argument(
+        "--baseline-sessions", type=int, default=1_000,
+        help="most sessions DatabaseSessionService is run with (it commits every event)",
+    )
+    parser.add_argument(
+        "--services", default="pooled,pooled_unbatched,database",
+        help=f"comma separated services to run ({', '.join(SERVICES)})",
+    )
+    parser.add_argument(
+        "--history", type=int, default=0,
+        help="also time reads of one session with this many events (0: skip)",
+    )
+    parser.add_argument("--window", type=int, default=50, help="events per windowed read")
+    parser.add_argument(
+        "--state-kb", type=int, default=0, help="KB of unchanging state every session starts with"
+    )
+    args = parser.parse_args()
+
+    report = []
+    if args.sessions:
+        report = asyncio.run(
+            benchmark_sessions(
+                args.services.split(","), args.sessions, args.events, args.concurrency, args.baseline_sessions,
+                args.state_kb,
+            )
+        )
+    if args.history:
+        report.append({"service": "pooled", **asyncio.run(read_latency(args.history, args.window))})
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
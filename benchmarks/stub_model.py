@@ -0,0 +1,167 @@
+"""A scripted stand-in for `google.adk.models.google_llm.Gemini`.
+
+The stub never touches the network. Each instance is given a responder, a
+plain function that looks at the conversation so far and decides what the
+"model" says next: either a tool call or some final text. That is enough to
+push every agent in this repo through its real ADK orchestration (runners,
+sessions, AgentTools, confirmations) so the framework overhead can be timed.
+"""
+
+import asyncio
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Callable, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from pydantic import Field, PrivateAttr
+
+from services.tokens import estimate_tokens
+
+DEFAULT_MODEL = "gemini-2.5-flash-lite"
+
+
+@dataclass
+class Turn:
+    """What a responder gets to look at for one model call.
+
+    Attributes:
+        user_text: Text of the most recent user message.
+        responses: (tool name, response dict) for every function response
+            that arrived after that user message, oldest first.
+        request: The raw LlmRequest, for responders that need more.
+    """
+
+    user_text: str
+    responses: list[tuple[str, dict]] = field(default_factory=list)
+    request: Optional[LlmRequest] = None
+
+    @property
+    def step(self) -> int:
+        """How many tool results the model has seen this turn."""
+        return len(self.responses)
+
+    def last(self, name: Optional[str] = None) -> dict:
+        """Returns the latest tool response (optionally for one tool)."""
+        for tool_name, response in reversed(self.responses):
+            if name is None or tool_name == name:
+                return response
+        return {}
+
+
+Responder = Callable[[Turn], types.Content]
+
+
+def call(name: str, **args: Any) -> types.Content:
+    """Builds a model turn that calls a single tool."""
+    return calls((name, args))
+
+
+def calls(*requests: tuple[str, dict]) -> types.Content:
+    """Builds a model turn that calls several tools in parallel."""
+    return types.Content(
+        role="model",
+        parts=[
+            types.Part(
+                function_call=types.FunctionCall(
+                    id=f"stub-{uuid.uuid4().hex[:12]}", name=name, args=args
+                )
+            )
+            for name, args in requests
+        ],
+    )
+
+
+def say(text: str) -> types.Content:
+    """Builds a model turn that answers with plain text."""
+    return types.Content(role="model", parts=[types.Part(text=text)])
+
+
+def read_turn(llm_request: LlmRequest) -> Turn:
+    """Collapses an LlmRequest into the Turn a responder needs."""
+    user_text = ""
+    responses: list[tuple[str, dict]] = []
+    for content in llm_request.contents:
+        for part in content.parts or []:
+            if part.function_response:
+                responses.append(
+                    (part.function_response.name, part.function_response.response or {})
+                )
+            elif content.role == "user" and part.text:
+                # a fresh user message starts a new turn
+                user_text = part.text
+                responses = []
+    return Turn(user_text=user_text, responses=responses, request=llm_request)
+
+
+def _request_text(llm_request: LlmRequest) -> str:
+    chunks = []
+    if llm_request.config and llm_request.config.system_instruction:
+        chunks.append(str(llm_request.config.system_instruction))
+    for content in llm_request.contents:
+        for part in content.parts or []:
+            if part.text:
+                chunks.append(part.text)
+            elif part.function_call:
+                chunks.append(str(part.function_call.args))
+            elif part.function_response:
+                chunks.append(str(part.function_response.response))
+    return "\n".join(chunks)
+
+
+class ScriptedGemini(BaseLlm):
+    """A BaseLlm whose replies come from a local responder function.
+
+    The model name defaults to a Gemini 2.x name so the built-in tools used
+    in this repo (google_search, BuiltInCodeExecutor) accept it.
+
+    Attributes:
+        responder: Decides the next model turn from a Turn.
+        latency: Seconds to sleep per call, to simulate model time.
+        calls: Number of model calls served so far.
+        tool_calls: Number of function calls the stub has asked for.
+    """
+
+    model: str = DEFAULT_MODEL
+    responder: Responder = Field(exclude=True)
+    latency: float = 0.0
+
+    _calls: int = PrivateAttr(default=0)
+    _tool_calls: int = PrivateAttr(default=0)
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    @property
+    def tool_calls(self) -> int:
+        return self._tool_calls
+
+    def reset(self):
+        self._calls = 0
+        self._tool_calls = 0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        self._calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        else:
+            # still yield to the loop like a real network call would
+            await asyncio.sleep(0)
+
+        content = self.responder(read_turn(llm_request))
+        self._tool_calls += sum(1 for part in content.parts if part.function_call)
+
+        reply_text = "".join(part.text or str(part.function_call) for part in content.parts)
+        yield LlmResponse(
+            content=content,
+            model_version=self.model,
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=estimate_tokens(_request_text(llm_request)),
+                candidates_token_count=estimate_tokens(reply_text),
+            ),
+        )
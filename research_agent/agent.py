@@ -1,11 +1,16 @@
 
+import os
+
 from google.adk.agents import LlmAgent
 from google.adk.models.google_llm import Gemini
-from google.adk.tools.agent_tool import AgentTool
 from google.adk.tools.google_search_tool import google_search
 
 from google.genai import types
-from typing import List
+
+from services.near_duplicates import NearDuplicateIndex
+from services.search_cache import SearchCache
+
+from .papers import PaperSearchTool
 
 retry_config = types.HttpRetryOptions(
     attempts=5,  # Maximum retry attempts
@@ -14,17 +19,6 @@ retry_config = types.HttpRetryOptions(
     http_status_codes=[429, 500, 503, 504],  # Retry on these HTTP errors
 )
 
-# ---- Intentionally pass incorrect datatype - `str` instead of `List[str]` ----
-def count_papers(papers: str):
-    """
-    This function counts the number of papers in a list of strings.
-    Args:
-      papers: A list of strings, where each string is a research paper.
-    Returns:
-      The number of papers in the list.
-    """
-    return len(papers)
-
 
 # Google Search agent
 google_search_agent = LlmAgent(
@@ -37,6 +31,17 @@ google_search_agent = LlmAgent(
 )
 
 
+# Repeated topics are answered from the cache instead of re-running the search agent
+search_cache = SearchCache(
+    path=os.getenv("SEARCH_CACHE_PATH", "search_cache.db"),
+    ttl=float(os.getenv("SEARCH_CACHE_TTL", "3600")),
+)
+
+
+# Papers returned before, for any query or session, are flagged as seen
+paper_index = NearDuplicateIndex(path=os.getenv("PAPER_INDEX_PATH", "paper_index.db"))
+
+
 # Root agent
 root_agent = LlmAgent(
     name="research_paper_finder_agent",
@@ -44,10 +49,11 @@ root_agent = LlmAgent(
     instruction="""Your task is to find research papers and count them. 
 
     You MUST ALWAYS follow these steps:
-    1) Find research papers on the user provided topic using the 'google_search_agent'. 
-    2) Then, pass the papers to 'count_papers' tool to count the number of papers returned.
-    3) Return both the list of research papers and the total number of papers.
+    1) Find research papers on the user provided topic using the 'google_search_agent'.
+       It returns the distinct papers it found ('papers') and their number ('count').
+    2) Return both the list of research papers and the total number of papers.
     """,
-    tools=[AgentTool(agent=google_search_agent), count_papers]
+    # Papers are extracted and counted locally, so there is no counting turn
+    tools=[PaperSearchTool(agent=google_search_agent, cache=search_cache, duplicates=paper_index)]
 )
 
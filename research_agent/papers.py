@@ -0,0 +1,206 @@
+"""Local extraction of paper records from the search agent's text.
+
+`google_search_agent` answers with free text: a numbered or bulleted list,
+one paper per item, with the title, authors, year and a DOI or arXiv id in
+whatever layout the model picked. `iter_papers` turns that text (or a stream
+of text chunks) into deduplicated `Paper` records as each item completes, so
+counting needs neither a model turn nor the whole answer up front.
+"""
+
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterable, Iterator, Optional, Union
+
+from google.adk.tools.tool_context import ToolContext
+
+from services.near_duplicates import NearDuplicateIndex
+from services.search_cache import CachedAgentTool
+
+_ITEM_MARKER = re.compile(r"^\s*(?:\d+[.)]|[-*•])\s+")
+_DOI = re.compile(r"\b(10\.\d{4,9}/[^\s\"<>,;()\[\]]+)", re.IGNORECASE)
+_ARXIV = re.compile(
+    r"(?:arxiv(?:\.org/(?:abs|pdf)/|:\s*|\s+))(\d{4}\.\d{4,5})(?:v\d+)?", re.IGNORECASE
+)
+_YEAR = re.compile(r"\b(19[5-9]\d|20\d\d)\b")
+_URL = re.compile(r"https?://\S+|\[[^\]]*\]\([^)]*\)")
+_AUTHORS = re.compile(
+    r"(?:\bby\s+|authors?:\s*)(.+?)(?=\s*(?:\(|\.\s|;|\n|\bin\s+\d|$))", re.IGNORECASE
+)
+_QUOTED_TITLE = re.compile(r"\*\*(.+?)\*\*|\"(.+?)\"|“(.+?)”|\*(.+?)\*")
+_TITLE_END = re.compile(r"\s+(?:by|-|–|—)\s+|\s*[(,:]\s*|\.\s+")
+
+
+@dataclass
+class Paper:
+    """One paper mentioned in the search results."""
+
+    title: str
+    normalized_title: str
+    authors: list[str] = field(default_factory=list)
+    year: Optional[int] = None
+    doi: Optional[str] = None
+    arxiv_id: Optional[str] = None
+
+    def keys(self) -> list[str]:
+        """Identities used for deduplication, strongest first."""
+        keys = []
+        if self.doi:
+            keys.append(f"doi:{self.doi}")
+        if self.arxiv_id:
+            keys.append(f"arxiv:{self.arxiv_id}")
+        if self.normalized_title:
+            keys.append(f"title:{self.normalized_title}")
+        return keys
+
+    def compact(self) -> dict:
+        """The record without empty fields or the normalized title."""
+        record = asdict(self)
+        del record["normalized_title"]
+        return {key: value for key, value in record.items() if value}
+
+
+def normalize_title(title: str) -> str:
+    """Case-folds, drops punctuation and collapses whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", title.casefold()).split())
+
+
+def _iter_lines(source: Union[str, Iterable[str]]) -> Iterator[str]:
+    """Yields complete lines from a string or from arbitrary text chunks."""
+    if isinstance(source, str):
+        yield from source.splitlines()
+        return
+    pending = ""
+    for chunk in source:
+        pending += chunk
+        *lines, pending = pending.split("\n")
+        yield from lines
+    if pending:
+        yield pending
+
+
+def _iter_items(lines: Iterable[str]) -> Iterator[str]:
+    """Groups lines into list items; text outside any list is dropped."""
+    item: list[str] = []
+    for line in lines:
+        if _ITEM_MARKER.match(line):
+            if item:
+                yield " ".join(item)
+            item = [_ITEM_MARKER.sub("", line, count=1).strip()]
+        elif not line.strip():
+            if item:
+                yield " ".join(item)
+            item = []
+        elif item:
+            item.append(line.strip())
+    if item:
+        yield " ".join(item)
+
+
+def _strip_markdown(text: str) -> str:
+    return re.sub(r"[*_`#]+", "", text).strip(" .:-–—")
+
+
+def parse_paper(item: str) -> Optional[Paper]:
+    """Parses one list item, or returns None if it does not look like a paper."""
+    doi = _DOI.search(item)
+    arxiv = _ARXIV.search(item)
+    # ids and links go before the year search, so digits inside them do not count
+    rest = _URL.sub(" ", _ARXIV.sub(" ", _DOI.sub(" ", item)))
+    year = _YEAR.search(rest)
+
+    quoted = _QUOTED_TITLE.search(rest)
+    if quoted:
+        title = next(group for group in quoted.groups() if group)
+    else:
+        title = _TITLE_END.split(rest.strip(), maxsplit=1)[0]
+    title = _strip_markdown(title)
+    if len(title) < 8 or (not (doi or arxiv or year) and len(title.split()) < 3):
+        return None
+
+    authors = []
+    match = _AUTHORS.search(rest)
+    if match:
+        authors = [
+            _strip_markdown(name)
+            for name in re.split(r",\s*|\s+and\s+|\s*&\s*", match.group(1))
+            if _strip_markdown(name)
+        ]
+    return Paper(
+        title=title,
+        normalized_title=normalize_title(title),
+        authors=authors,
+        year=int(year.group()) if year else None,
+        doi=doi.group(1).rstrip(".").lower() if doi else None,
+        arxiv_id=arxiv.group(1) if arxiv else None,
+    )
+
+
+def iter_papers(source: Union[str, Iterable[str]]) -> Iterator[Paper]:
+    """Yields each distinct paper in the search output as soon as its item ends.
+
+    Args:
+        source: The search agent's answer, or a stream of text chunks of it.
+
+    A paper is a duplicate if its DOI, arXiv id or normalized title was
+    already seen.
+    """
+    seen: set[str] = set()
+    for item in _iter_items(_iter_lines(source)):
+        paper = parse_paper(item)
+        if paper is None:
+            continue
+        keys = paper.keys()
+        if seen.intersection(keys):
+            continue
+        seen.update(keys)
+        yield paper
+
+
+def extract_papers(source: Union[str, Iterable[str]]) -> dict:
+    """Counts and collects the papers in one pass over the search output.
+
+    Returns:
+        Dictionary with the count and the compact paper records.
+    """
+    papers = [paper.compact() for paper in iter_papers(source)]
+    return {"count": len(papers), "papers": papers}
+
+
+class PaperSearchTool(CachedAgentTool):
+    """Runs the search agent and hands back structured papers, not raw text.
+
+    The raw answer is what gets cached, so changes to the extraction apply to
+    cached results too. With a `duplicates` index, papers this session was
+    already given (reworded repeats within one answer too) are left out and
+    counted in "already_returned_in_session", and papers returned in another
+    session are flagged with "seen_before".
+    """
+
+    def __init__(self, agent, cache, duplicates: Optional[NearDuplicateIndex] = None, **kwargs):
+        super().__init__(agent, cache, **kwargs)
+        self.duplicates = duplicates
+
+    async def run_async(self, *, args: dict[str, Any], tool_context: ToolContext) -> Any:
+        result = await super().run_async(args=args, tool_context=tool_context)
+        if not isinstance(result, str):
+            return result
+        if self.duplicates is None:
+            return extract_papers(result)
+
+        # scoped to the session, like the findings of 1b.py's ResearchAgent
+        scope = tool_context.session.id
+        papers = []
+        repeated = 0
+        for paper in iter_papers(result):
+            matches = self.duplicates.record(paper.title, scope=scope, key=paper.keys()[0])
+            if any(match.seen_in_scope for match in matches):
+                repeated += 1
+                continue
+            record = paper.compact()
+            if matches:
+                record["seen_before"] = True
+            papers.append(record)
+        result = {"count": len(papers), "papers": papers}
+        if repeated:
+            result["already_returned_in_session"] = repeated
+        return result
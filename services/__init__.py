@@ -0,0 +1,33 @@
+"""Reusable services for the course agents: caches, memory, session backends, archives, analytics and telemetry."""
+
+from .bm25_memory import BM25MemoryService
+from .compaction import ExtractiveSummarizer, TokenBudgetCompactor
+from .context_accounting import ContextAccounting, InvocationTotals, ModelCall
+from .event_analytics import (
+    confirmation_waits,
+    describe,
+    events_dataset,
+    invocations,
+    sub_agent_latency,
+    tool_calls,
+    tool_calls_per_invocation,
+    tool_responses,
+    tool_spans,
+)
+from .memory_prefetch import MemoryPrefetch
+from .model_cache import CacheMissError, CachingLlm, ResponseStore, cached_models, request_key
+from .near_duplicates import Match, NearDuplicateIndex, split_snippets
+from .search_cache import CachedAgentTool, SearchCache, normalize_query
+from .session_archive import event_batches, export_sessions, import_sessions
+from .sessions import (
+    CachedSessionService,
+    EventCursor,
+    count_events,
+    event_cursor,
+    get_or_create_session,
+    iter_events,
+)
+from .sqlite_sessions import PooledSqliteSessionService
+from .state_store import SharedStateTiers, apply_delta, drop_temp, split_state
+from .tokens import estimate_tokens, truncate_to_tokens
+from .vector_memory import HashedNgramMemoryService
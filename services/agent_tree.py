@@ -0,0 +1,23 @@
+"""Helpers for walking an agent tree, including agents wrapped in AgentTools."""
+
+from typing import Iterator
+
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.tools import AgentTool
+
+
+def iter_llm_agents(agent: BaseAgent) -> Iterator[LlmAgent]:
+    """Yields every LlmAgent reachable from `agent`, including AgentTools."""
+    seen = set()
+    stack = [agent]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        if isinstance(current, LlmAgent):
+            yield current
+            stack.extend(
+                tool.agent for tool in current.tools if isinstance(tool, AgentTool)
+            )
+        stack.extend(current.sub_agents)
@@ -0,0 +1,475 @@
+"""Memory service with an incrementally maintained inverted index and BM25 ranking.
+
+`InMemoryMemoryService` keeps every event and, on each `search_memory`,
+re-tokenizes all of them and returns every event sharing a single word with
+the query. 3b.py calls `load_memory` on every response, so that scan grows
+with the whole history. `BM25MemoryService` tokenizes each event once, when
+it is added, and answers a query from the postings of its terms only,
+returning the `top_k` best matches.
+
+Memory can also be bounded, per user and globally, by entry count, an
+estimate of the bytes held and entry age. Evicted events are folded into a
+short per-session digest, which stays searchable.
+"""
+
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from google.adk.events.event import Event
+from google.adk.memory import _utils
+from google.adk.memory.base_memory_service import BaseMemoryService, SearchMemoryResponse
+from google.adk.memory.memory_entry import MemoryEntry
+from google.adk.sessions.session import Session
+from google.genai import types
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# closed-class words carry no topic and would put most events on every query's postings
+STOPWORDS = frozenset(
+    """a about after all also am an and any are as at be been before being but by can
+    could did do does for from had has have he her here him his how i if in into is it
+    its just me more my no not now of on or our out she so some than that the their them
+    then there these they this to too up us was we were what when where which who why
+    will with would you your""".split()
+)
+
+EVICTION_POLICIES = ("lru", "age", "importance")
+DIGEST_AUTHOR = "memory_digest"
+
+# rough per-entry and per-posting overhead of the Python objects, for byte estimates
+_ENTRY_OVERHEAD = 600
+_POSTING_OVERHEAD = 100
+
+# first-person statements are what the demo agent is asked to recall later
+_PERSONAL_FACT = re.compile(
+    r"\b(?:my|i am|i'm|i like|i love|i prefer|i live|favou?rite|call me)\b", re.IGNORECASE
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased alphanumeric tokens, without stopwords."""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _event_text(event: Event) -> str:
+    return " ".join(part.text for part in event.content.parts if part.text)
+
+
+def default_importance(event: Event, text: str) -> float:
+    """Higher for user statements of personal facts, lower for model chatter."""
+    score = 1.0 if event.author == "user" else 0.5
+    if _PERSONAL_FACT.search(text):
+        score += 1.0
+    return score
+
+
+@dataclass
+class _Doc:
+    entry: MemoryEntry
+    session_id: str
+    text: str
+    terms: tuple[str, ...]
+    length: int
+    size: int
+    created: float
+    importance: float
+    hits: int = 0
+
+
+@dataclass
+class _Digest:
+    doc_id: int
+    messages: int
+    first: float
+    last: float
+    terms: Counter
+    highlight: str
+
+
+@dataclass
+class _UserIndex:
+    """Inverted index over one user's remembered events."""
+
+    key: str
+    docs: dict[int, _Doc] = field(default_factory=dict)
+    postings: dict[str, dict[int, int]] = field(default_factory=lambda: defaultdict(dict))
+    total_length: int = 0
+    size: int = 0
+    digest_size: int = 0
+    next_id: int = 0
+    # event doc ids (not digests); its length is the user's entry count
+    arrival: OrderedDict = field(default_factory=OrderedDict)
+    # (created, doc id) of events, lazily cleaned of evicted ids
+    age_heap: list = field(default_factory=list)
+    # event doc ids, least recently returned by a search first
+    recency: OrderedDict = field(default_factory=OrderedDict)
+    # (importance, doc id), lazily cleaned of evicted ids
+    importance_heap: list = field(default_factory=list)
+    # session id -> (latest indexed event timestamp, ids of the events at that timestamp)
+    indexed: dict[str, tuple[float, set[str]]] = field(default_factory=dict)
+    # session id -> its events and digest in the index; the session's `indexed`
+    # entry goes with the last of them, so a session added again later is reindexed
+    sessions: Counter = field(default_factory=Counter)
+    # session id -> digest of its evicted events
+    digests: OrderedDict = field(default_factory=OrderedDict)
+    evictions: Counter = field(default_factory=Counter)
+
+    def add(self, doc: _Doc) -> int:
+        doc_id = self.next_id
+        self.next_id += 1
+        self.docs[doc_id] = doc
+        self.total_length += doc.length
+        self.size += doc.size
+        for term, count in Counter(doc.terms).items():
+            self.postings[term][doc_id] = count
+        self.sessions[doc.session_id] += 1
+        if doc.entry.author == DIGEST_AUTHOR:
+            self.digest_size += doc.size
+        else:
+            self.arrival[doc_id] = None
+            self.recency[doc_id] = None
+            heapq.heappush(self.age_heap, (doc.created, doc_id))
+            heapq.heappush(self.importance_heap, (doc.importance, doc_id))
+        return doc_id
+
+    def remove(self, doc_id: int) -> _Doc:
+        doc = self.docs.pop(doc_id)
+        self.total_length -= doc.length
+        self.size -= doc.size
+        if doc.entry.author == DIGEST_AUTHOR:
+            self.digest_size -= doc.size
+        for term in set(doc.terms):
+            postings = self.postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+        self.arrival.pop(doc_id, None)
+        self.recency.pop(doc_id, None)
+        self.sessions[doc.session_id] -= 1
+        if not self.sessions[doc.session_id]:
+            del self.sessions[doc.session_id]
+            self.indexed.pop(doc.session_id, None)
+        return doc
+
+    def oldest(self) -> Optional[int]:
+        """Live event with the earliest timestamp."""
+        while self.age_heap and self.age_heap[0][1] not in self.docs:
+            heapq.heappop(self.age_heap)
+        return self.age_heap[0][1] if self.age_heap else None
+
+    def victim(self, policy: str) -> Optional[int]:
+        if policy == "lru":
+            return next(iter(self.recency), None)
+        if policy == "age":
+            return self.oldest()
+        while self.importance_heap:
+            importance, doc_id = self.importance_heap[0]
+            if doc_id in self.docs:
+                # retrieval counts toward importance, so re-rank entries that were used
+                current = self.docs[doc_id].importance + 0.5 * math.log1p(self.docs[doc_id].hits)
+                if current > importance:
+                    heapq.heapreplace(self.importance_heap, (current, doc_id))
+                    continue
+                return doc_id
+            heapq.heappop(self.importance_heap)
+        return None
+
+
+class BM25MemoryService(BaseMemoryService):
+    """Drop-in replacement for InMemoryMemoryService with BM25 ranking.
+
+    Args:
+        top_k: Most memories returned per search.
+        k1: BM25 term frequency saturation.
+        b: BM25 document length normalization.
+        max_df_ratio: Terms found in more than this share of a user's events
+            are skipped when the query has rarer terms; their idf is near
+            zero, and skipping them keeps their long postings out of the
+            search.
+        max_entries_per_user: Events kept per user (None: unbounded).
+        max_bytes_per_user: Estimated bytes kept per user.
+        max_entries: Events kept across all users. Past it, the user holding
+            the most events is evicted from first.
+        max_bytes: Estimated bytes kept across all users, evicted from the
+            user holding the most bytes first. Under byte pressure the oldest
+            digests go first once digests hold over half of a user's bytes.
+        max_age: Seconds after which an event is evicted regardless of room.
+        eviction: "lru" (least recently returned by a search), "age" (oldest
+            event) or "importance" (lowest `importance` score, which grows
+            with retrievals).
+        importance: Scores an event from the event and its text.
+        digests: Fold evicted events into one searchable digest per session.
+        max_digests_per_user: Digests kept per user; the oldest goes first.
+    """
+
+    def __init__(
+        self,
+        top_k: int = 10,
+        k1: float = 1.5,
+        b: float = 0.75,
+        max_df_ratio: float = 0.25,
+        max_entries_per_user: Optional[int] = None,
+        max_bytes_per_user: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_age: Optional[float] = None,
+        eviction: str = "lru",
+        importance: Callable[[Event, str], float] = default_importance,
+        digests: bool = True,
+        max_digests_per_user: int = 50,
+    ):
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"eviction must be one of {EVICTION_POLICIES}, got '{eviction}'")
+        self.top_k = top_k
+        self.k1 = k1
+        self.b = b
+        self.max_df_ratio = max_df_ratio
+        self.max_entries_per_user = max_entries_per_user
+        self.max_bytes_per_user = max_bytes_per_user
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.eviction = eviction
+        self.importance = importance
+        self.digests = digests
+        self.max_digests_per_user = max_digests_per_user
+        self._lock = threading.Lock()
+        self._users: dict[str, _UserIndex] = {}
+        # evictions of users dropped once they had nothing left
+        self._evictions = Counter()
+        self._entries = 0
+        self._size = 0
+
+    @staticmethod
+    def _user_key(app_name: str, user_id: str) -> str:
+        return f"{app_name}/{user_id}"
+
+    def _make_doc(self, event: Event, session_id: str, text: str, tokens: list[str]) -> _Doc:
+        return _Doc(
+            entry=MemoryEntry(
+                content=event.content,
+                author=event.author,
+                timestamp=_utils.format_timestamp(event.timestamp),
+            ),
+            session_id=session_id,
+            text=text,
+            terms=tuple(tokens),
+            length=len(tokens),
+            size=_ENTRY_OVERHEAD + 2 * len(text.encode()) + _POSTING_OVERHEAD * len(set(tokens)),
+            created=event.timestamp,
+            importance=self.importance(event, text),
+        )
+
+    def _insert(self, index: _UserIndex, doc: _Doc) -> int:
+        if doc.entry.author != DIGEST_AUTHOR:
+            self._entries += 1
+        self._size += doc.size
+        return index.add(doc)
+
+    def _delete(self, index: _UserIndex, doc_id: int) -> _Doc:
+        doc = index.remove(doc_id)
+        if doc.entry.author != DIGEST_AUTHOR:
+            self._entries -= 1
+        self._size -= doc.size
+        if not index.docs and self._users.pop(index.key, None) is not None:
+            # a user with nothing left in memory is dropped; only its eviction counts stay
+            self._evictions.update(index.evictions)
+        return doc
+
+    def _evict(self, index: _UserIndex, doc_id: int, reason: str):
+        doc = index.docs[doc_id]
+        index.evictions[reason] += 1
+        # digest first, so the session (and the user) never look empty in between
+        if self.digests:
+            self._fold_into_digest(index, doc)
+        self._delete(index, doc_id)
+
+    def _fold_into_digest(self, index: _UserIndex, doc: _Doc):
+        """Replaces the session's digest with one that also covers `doc`."""
+        digest = index.digests.pop(doc.session_id, None)
+        if digest is None:
+            digest = _Digest(
+                doc_id=-1, messages=0, first=doc.created, last=doc.created,
+                terms=Counter(), highlight="",
+            )
+        else:
+            self._delete(index, digest.doc_id)
+        digest.messages += 1
+        digest.first = min(digest.first, doc.created)
+        digest.last = max(digest.last, doc.created)
+        digest.terms.update(doc.terms)
+        if not digest.highlight or doc.importance >= 1.5:
+            digest.highlight = doc.text[:120]
+
+        keywords = [term for term, _ in digest.terms.most_common(8)]
+        text = (
+            f"Digest of {digest.messages} earlier messages"
+            f" ({_utils.format_timestamp(digest.first)[:10]} to {_utils.format_timestamp(digest.last)[:10]}):"
+            f" {', '.join(keywords)}. \"{digest.highlight}\""
+        )
+        tokens = tokenize(text)
+        entry = MemoryEntry(
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            author=DIGEST_AUTHOR,
+            timestamp=_utils.format_timestamp(digest.last),
+        )
+        digest.doc_id = self._insert(
+            index,
+            _Doc(
+                entry=entry, session_id=doc.session_id, text=text, terms=tuple(tokens),
+                length=len(tokens),
+                size=_ENTRY_OVERHEAD + 2 * len(text.encode()) + _POSTING_OVERHEAD * len(set(tokens)),
+                created=digest.last, importance=0.0,
+            ),
+        )
+        index.digests[doc.session_id] = digest
+        while len(index.digests) > self.max_digests_per_user:
+            self._drop_oldest_digest(index)
+
+    def _drop_oldest_digest(self, index: _UserIndex):
+        _, oldest = index.digests.popitem(last=False)
+        self._delete(index, oldest.doc_id)
+        index.evictions["digest"] += 1
+
+    def _free_bytes(self, index: _UserIndex, reason: str) -> bool:
+        """Evicts one event, or the oldest digest once digests hold over half the bytes."""
+        if index.digests and (not index.arrival or 2 * index.digest_size > index.size):
+            self._drop_oldest_digest(index)
+            return True
+        if not index.arrival:
+            return False
+        self._evict(index, index.victim(self.eviction), reason)
+        return True
+
+    def _enforce(self, index: _UserIndex, now: float):
+        """Evicts expired events, then events past the user and global caps."""
+        if self.max_age is not None:
+            while (doc_id := index.oldest()) is not None and index.docs[doc_id].created < now - self.max_age:
+                self._evict(index, doc_id, "age")
+        if self.max_entries_per_user is not None:
+            while len(index.arrival) > self.max_entries_per_user:
+                self._evict(index, index.victim(self.eviction), "user_cap")
+        if self.max_bytes_per_user is not None:
+            while index.size > self.max_bytes_per_user and self._free_bytes(index, "user_cap"):
+                pass
+        if self.max_entries is not None:
+            while self._entries > self.max_entries:
+                largest = max(
+                    (user for user in self._users.values() if user.arrival),
+                    key=lambda user: len(user.arrival),
+                )
+                self._evict(largest, largest.victim(self.eviction), "global_cap")
+        if self.max_bytes is not None:
+            while self._size > self.max_bytes:
+                largest = max(self._users.values(), key=lambda user: user.size)
+                if not self._free_bytes(largest, "global_cap"):
+                    break
+
+    async def add_session_to_memory(self, session: Session):
+        """Indexes the session's events that are not indexed yet."""
+        with self._lock:
+            key = self._user_key(session.app_name, session.user_id)
+            index = self._users.get(key)
+            if index is None:
+                index = self._users[key] = _UserIndex(key)
+            latest, at_latest = index.indexed.get(session.id, (float("-inf"), set()))
+            for event in session.events:
+                if event.timestamp < latest or (event.timestamp == latest and event.id in at_latest):
+                    continue
+                if event.timestamp > latest:
+                    latest, at_latest = event.timestamp, set()
+                at_latest.add(event.id)
+                if not event.content or not event.content.parts:
+                    continue
+                text = _event_text(event)
+                tokens = tokenize(text)
+                if tokens:
+                    self._insert(index, self._make_doc(event, session.id, text, tokens))
+            if session.id in index.sessions:
+                index.indexed[session.id] = (latest, at_latest)
+            if not index.docs:
+                del self._users[key]
+                return
+            self._enforce(index, time.time())
+
+    async def search_memory(
+        self, *, app_name: str, user_id: str, query: str
+    ) -> SearchMemoryResponse:
+        """Returns up to top_k remembered events, best BM25 score first."""
+        with self._lock:
+            index = self._users.get(self._user_key(app_name, user_id))
+            if index is None:
+                return SearchMemoryResponse()
+            if self.max_age is not None:
+                self._enforce(index, time.time())
+            if not index.docs:
+                return SearchMemoryResponse()
+
+            documents = len(index.docs)
+            terms = [term for term in set(tokenize(query)) if term in index.postings]
+            informative = [
+                term for term in terms
+                if len(index.postings[term]) <= self.max_df_ratio * documents
+            ]
+            average_length = index.total_length / documents
+
+            scores: dict[int, float] = defaultdict(float)
+            for term in informative or terms:
+                postings = index.postings[term]
+                df = len(postings)
+                idf = math.log(1 + (documents - df + 0.5) / (df + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * index.docs[doc_id].length / average_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            best = heapq.nlargest(self.top_k, scores.items(), key=lambda item: item[1])
+            for doc_id, _ in best:
+                index.docs[doc_id].hits += 1
+                if doc_id in index.recency:
+                    index.recency.move_to_end(doc_id)
+            return SearchMemoryResponse(memories=[index.docs[doc_id].entry for doc_id, _ in best])
+
+    def user_stats(self, app_name: str, user_id: str) -> dict:
+        """Entries, digests, estimated bytes and evictions of one user."""
+        with self._lock:
+            index = self._users.get(self._user_key(app_name, user_id))
+            return self._user_stats(index) if index else {}
+
+    @staticmethod
+    def _user_stats(index: _UserIndex) -> dict:
+        return {
+            "entries": len(index.arrival),
+            "digests": len(index.digests),
+            "bytes": index.size,
+            "terms": len(index.postings),
+            "evictions": dict(index.evictions),
+        }
+
+    def stats(self, per_user: bool = False) -> dict:
+        """Live footprint: entries, digests, estimated bytes and evictions.
+
+        Args:
+            per_user: Also break the numbers down by "app_name/user_id".
+        """
+        with self._lock:
+            users = {key: self._user_stats(index) for key, index in self._users.items()}
+            evictions = Counter(self._evictions)
+        for user in users.values():
+            evictions.update(user["evictions"])
+        stats = {
+            "users": len(users),
+            "events": sum(user["entries"] for user in users.values()),
+            "digests": sum(user["digests"] for user in users.values()),
+            "terms": sum(user["terms"] for user in users.values()),
+            "bytes": self._size,
+            "evictions": dict(evictions),
+        }
+        if per_user:
+            stats["per_user"] = users
+        return stats
@@ -0,0 +1,336 @@
+"""Model-free event compaction, triggered by a token budget.
+
+ADK's `EventsCompactionConfig` compacts every N invocations and spends a
+model call on each summary. `ExtractiveSummarizer` builds the summary from
+the events themselves, with no model call. It keeps user requests, tool
+calls with their results, and state changes, and trims or drops the model's
+own chatter. It can be plugged into `EventsCompactionConfig(summarizer=...)`.
+
+`TokenBudgetCompactor` is a plugin that decides when to compact by size
+instead. After every run it adds up estimated tokens for the events
+appended since it last looked. Once the uncompacted events and earlier
+summaries exceed the budget, it compacts the events since the previous
+compaction. Work per run is proportional to the new events, not to the
+history.
+
+ADK puts every compaction event into the model's context, so summaries
+accumulate. Each one is capped at `summary_tokens`, and `min_new_tokens` stops
+a conversation whose summaries already fill the budget from compacting on
+every turn.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.apps.base_events_summarizer import BaseEventsSummarizer
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions, EventCompaction
+from google.adk.plugins.base_plugin import BasePlugin
+from google.genai import types
+
+from .tokens import estimate_tokens, truncate_to_tokens
+
+_HEADER = "Summary of the earlier conversation (extracted, not paraphrased):"
+
+# every line has a priority; the lowest go first when a summary is over its cap
+_CHAT, _USER, _TOOL, _STATE = range(4)
+
+
+def _trim(text: str, tokens: int) -> str:
+    return truncate_to_tokens(" ".join(text.split()), tokens)
+
+
+def _first_sentence(text: str) -> str:
+    text = " ".join(text.split())
+    for end in (". ", "! ", "? ", "\n"):
+        if end in text:
+            return text[: text.index(end) + 1]
+    return text
+
+
+def _json(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str, separators=(",", ":"))
+
+
+def event_tokens(event: Event) -> int:
+    """Estimated tokens the event adds to a model request."""
+    if event.actions and event.actions.compaction:
+        content = event.actions.compaction.compacted_content
+    else:
+        content = event.content
+    if not content or not content.parts:
+        return 0
+    size = 0
+    for part in content.parts:
+        if part.text:
+            size += estimate_tokens(part.text)
+        elif part.function_call:
+            size += estimate_tokens(part.function_call.name + _json(part.function_call.args))
+        elif part.function_response:
+            size += estimate_tokens(part.function_response.name + _json(part.function_response.response))
+    # role and turn framing
+    return size + 4
+
+
+class ExtractiveSummarizer(BaseEventsSummarizer):
+    """Compacts events into the lines worth keeping, without a model call.
+
+    Args:
+        summary_tokens: Cap for the whole summary. Chatter goes first, then
+            the oldest user messages and tool results; state changes go last.
+            The per-line caps below are lowered to fit it, so a small
+            summary still keeps its newest lines.
+        tool_tokens: Cap per tool call or result line.
+        user_tokens: Cap per user message.
+        chat_tokens: Cap for the first sentence kept of each model message;
+            0 drops model messages entirely.
+    """
+
+    def __init__(
+        self,
+        summary_tokens: int = 600,
+        tool_tokens: int = 120,
+        user_tokens: int = 80,
+        chat_tokens: int = 24,
+    ):
+        self.summary_tokens = summary_tokens
+        self.tool_tokens = tool_tokens
+        self.user_tokens = user_tokens
+        self.chat_tokens = chat_tokens
+
+    def _cap(self, tokens: int) -> int:
+        """A per-line cap, lowered so that one line always fits the summary."""
+        return max(min(tokens, self.summary_tokens - estimate_tokens(_HEADER) - 1), 1)
+
+    def extract(self, events: list[Event]) -> list[tuple[int, str]]:
+        """(priority, line) pairs for the events, oldest first."""
+        tool_tokens, user_tokens = self._cap(self.tool_tokens), self._cap(self.user_tokens)
+        chat_tokens = self._cap(self.chat_tokens) if self.chat_tokens else 0
+        lines = []
+        for event in events:
+            if event.partial or (event.actions and event.actions.compaction):
+                continue
+            parts = event.content.parts if event.content and event.content.parts else []
+            for part in parts:
+                if part.function_call:
+                    call = part.function_call
+                    lines.append((_TOOL, _trim(f"{event.author} called {call.name}({_json(call.args)})", tool_tokens)))
+                elif part.function_response:
+                    response = part.function_response
+                    lines.append((_TOOL, _trim(f"{response.name} returned {_json(response.response)}", tool_tokens)))
+                elif part.text and not part.thought:
+                    if event.author == "user":
+                        lines.append((_USER, "user: " + _trim(part.text, user_tokens)))
+                    elif chat_tokens:
+                        sentence = _trim(_first_sentence(part.text), chat_tokens)
+                        lines.append((_CHAT, f"{event.author}: {sentence}"))
+            if event.actions and event.actions.state_delta:
+                changes = ", ".join(f"{key}={_json(value)}" for key, value in event.actions.state_delta.items())
+                lines.append((_STATE, _trim(f"state set: {changes}", tool_tokens)))
+        return lines
+
+    def fit(self, lines: list[tuple[int, str]]) -> list[str]:
+        """Drops the lowest-priority, oldest lines until the summary is under its cap.
+
+        A line that is over the cap on its own (its prefix pushed it past the
+        per-line cap) is trimmed rather than leaving the summary empty.
+        """
+        budget = self.summary_tokens - estimate_tokens(_HEADER)
+        costs = [estimate_tokens(line) + 1 for _, line in lines]
+        total = sum(costs)
+        keep = [True] * len(lines)
+        order = sorted(range(len(lines)), key=lambda i: (lines[i][0], i))
+        for index in order:
+            if total <= budget:
+                break
+            keep[index] = False
+            total -= costs[index]
+        if lines and not any(keep):
+            return [_trim(lines[order[-1]][1], max(budget - 1, 1))]
+        return [line for (_, line), kept in zip(lines, keep) if kept]
+
+    async def maybe_summarize_events(self, *, events: list[Event]) -> Optional[Event]:
+        events = [event for event in events if not (event.actions and event.actions.compaction)]
+        lines = self.fit(self.extract(events))
+        if not lines:
+            return None
+        content = types.Content(role="model", parts=[types.Part(text="\n".join([_HEADER, *lines]))])
+        return Event(
+            author="user",
+            invocation_id=Event.new_id(),
+            actions=EventActions(
+                compaction=EventCompaction(
+                    start_timestamp=events[0].timestamp,
+                    end_timestamp=events[-1].timestamp,
+                    compacted_content=content,
+                )
+            ),
+        )
+
+
+@dataclass
+class _SessionTokens:
+    """Running token counts of one session, updated from its new events only."""
+
+    last_seen: float = 0.0
+    compacted_until: float = 0.0
+    raw_tokens: int = 0
+    summary_tokens: int = 0
+    compactions: int = 0
+    events_compacted: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    last_ms: float = 0.0
+    max_ms: float = 0.0
+    total_ms: float = 0.0
+    skipped_open_calls: int = 0
+    empty_summaries: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+def _open_calls(events: list[Event]) -> bool:
+    """Whether a tool call in the events still waits for its result (e.g. a confirmation)."""
+    calls, responses = set(), set()
+    for event in events:
+        calls.update(call.id for call in event.get_function_calls())
+        responses.update(response.id for response in event.get_function_responses())
+    return bool(calls - responses)
+
+
+class TokenBudgetCompactor(BasePlugin):
+    """Plugin that compacts a session's events once its context passes a token budget.
+
+    Args:
+        token_budget: Estimated context tokens (summaries plus events not
+            compacted yet) above which the session is compacted.
+        min_new_tokens: Fewest uncompacted tokens worth a compaction
+            (default: a quarter of the budget).
+        summarizer: Builds the compaction event; ExtractiveSummarizer by
+            default, but any BaseEventsSummarizer (an LlmEventSummarizer too)
+            can be used.
+        max_sessions: Sessions whose running counts are kept; a session
+            dropped from the table is recounted once when it comes back.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 8_000,
+        min_new_tokens: Optional[int] = None,
+        summarizer: Optional[BaseEventsSummarizer] = None,
+        max_sessions: int = 4_096,
+        name: str = "token_budget_compactor",
+    ):
+        super().__init__(name=name)
+        self.token_budget = token_budget
+        self.min_new_tokens = token_budget // 4 if min_new_tokens is None else min_new_tokens
+        self.summarizer = summarizer or ExtractiveSummarizer(summary_tokens=max(token_budget // 12, 64))
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions: OrderedDict[tuple[str, str, str], _SessionTokens] = OrderedDict()
+
+    def _tokens(self, key: tuple[str, str, str]) -> _SessionTokens:
+        with self._lock:
+            tokens = self._sessions.get(key)
+            if tokens is None:
+                tokens = self._sessions[key] = _SessionTokens()
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return tokens
+
+    @staticmethod
+    def _count_new(tokens: _SessionTokens, events: list[Event]) -> list[Event]:
+        """Adds the events after `last_seen` to the running counts; returns the uncompacted tail."""
+        new = []
+        for event in reversed(events):
+            if event.timestamp <= tokens.last_seen:
+                break
+            new.append(event)
+        for event in reversed(new):
+            if event.actions and event.actions.compaction:
+                tokens.summary_tokens += event_tokens(event)
+                tokens.compacted_until = max(tokens.compacted_until, event.actions.compaction.end_timestamp)
+                tokens.raw_tokens = 0
+            elif event.timestamp > tokens.compacted_until and not event.partial:
+                tokens.raw_tokens += event_tokens(event)
+        if events:
+            tokens.last_seen = max(tokens.last_seen, events[-1].timestamp)
+        tail = []
+        for event in reversed(events):
+            if event.timestamp <= tokens.compacted_until:
+                break
+            if not (event.actions and event.actions.compaction):
+                tail.append(event)
+        return tail[::-1]
+
+    async def after_run_callback(self, *, invocation_context: InvocationContext) -> None:
+        session = invocation_context.session
+        tokens = self._tokens((session.app_name, session.user_id, session.id))
+        with tokens.lock:
+            tail = self._count_new(tokens, session.events)
+            context = tokens.raw_tokens + tokens.summary_tokens
+            if context <= self.token_budget or tokens.raw_tokens < self.min_new_tokens or not tail:
+                return
+            if _open_calls(tail):
+                # compacting a call away from its pending result would break the resumed turn
+                tokens.skipped_open_calls += 1
+                return
+        started = time.perf_counter()
+        compaction = await self.summarizer.maybe_summarize_events(events=tail)
+        if compaction is None:
+            # over budget but nothing to compact with; the context keeps growing
+            with tokens.lock:
+                tokens.empty_summaries += 1
+            return
+        await invocation_context.session_service.append_event(session=session, event=compaction)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with tokens.lock:
+            tokens.tokens_before = context
+            self._count_new(tokens, session.events)
+            tokens.tokens_after = tokens.raw_tokens + tokens.summary_tokens
+            tokens.compactions += 1
+            tokens.events_compacted += len(tail)
+            tokens.last_ms = elapsed_ms
+            tokens.max_ms = max(tokens.max_ms, elapsed_ms)
+            tokens.total_ms += elapsed_ms
+
+    def session_stats(self, app_name: str, user_id: str, session_id: str) -> Optional[dict]:
+        """Context tokens now and around the last compaction, and time spent compacting."""
+        with self._lock:
+            tokens = self._sessions.get((app_name, user_id, session_id))
+        if tokens is None:
+            return None
+        return {
+            "context_tokens": tokens.raw_tokens + tokens.summary_tokens,
+            "summary_tokens": tokens.summary_tokens,
+            "compactions": tokens.compactions,
+            "events_compacted": tokens.events_compacted,
+            "last_tokens_before": tokens.tokens_before,
+            "last_tokens_after": tokens.tokens_after,
+            "last_ms": round(tokens.last_ms, 3),
+            "total_ms": round(tokens.total_ms, 3),
+            "skipped_open_calls": tokens.skipped_open_calls,
+            "empty_summaries": tokens.empty_summaries,
+        }
+
+    def stats(self) -> dict:
+        """Totals over the tracked sessions."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        compactions = sum(s.compactions for s in sessions)
+        total_ms = sum(s.total_ms for s in sessions)
+        return {
+            "sessions": len(sessions),
+            "compactions": compactions,
+            "events_compacted": sum(s.events_compacted for s in sessions),
+            "context_tokens": sum(s.raw_tokens + s.summary_tokens for s in sessions),
+            "max_context_tokens": max((s.raw_tokens + s.summary_tokens for s in sessions), default=0),
+            "empty_summaries": sum(s.empty_summaries for s in sessions),
+            "avg_compaction_ms": round(total_ms / compactions, 3) if compactions else 0.0,
+            "max_compaction_ms": round(max((s.max_ms for s in sessions), default=0.0), 3),
+        }
@@ -0,0 +1,462 @@
+"""Per-invocation and per-model-call accounting of what goes into the prompt.
+
+`ContextAccounting` is a plugin that records, for every model call, the
+prompt and response tokens, the events in the request's contents, the bytes
+of the system instruction (where ADK fills in `{state}` templates and
+callbacks like MemoryPrefetch add memories) and the bytes of the session
+state the agent sees. The model call sums are kept per invocation. Token
+counts come from the response's usage metadata. When a model reports none,
+they are estimated from the text, and the call is flagged as estimated.
+
+The numbers are exported through the OpenTelemetry SDK. Every invocation
+and model call becomes a span, and the sizes go into histograms with the
+app and agent as attributes. Spans and metrics are written as JSON lines to
+a file, or to the console. `summary()` groups the recorded calls by agent,
+session or app in process, with or without an exporter.
+
+The plugin has its own tracer and meter providers. It neither touches nor
+depends on a global OpenTelemetry setup.
+"""
+
+import json
+import math
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass
+from typing import IO, Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.genai import types
+from opentelemetry import trace
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import ConsoleMetricExporter, PeriodicExportingMetricReader
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+from .tokens import estimate_tokens
+
+_GROUPS = ("agent", "session", "app")
+
+
+@dataclass
+class ModelCall:
+    """Context size and cost of one model call."""
+
+    app_name: str
+    user_id: str
+    session_id: str
+    invocation_id: str
+    agent_name: str
+    model: str
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+    context_events: int = 0
+    session_events: int = 0
+    instruction_bytes: int = 0
+    state_bytes: int = 0
+    estimated: bool = False
+    duration_ms: float = 0.0
+
+
+@dataclass
+class InvocationTotals:
+    """Model calls of one invocation, summed."""
+
+    app_name: str
+    user_id: str
+    session_id: str
+    invocation_id: str
+    agent_name: str
+    model_calls: int = 0
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+    max_context_events: int = 0
+    max_instruction_bytes: int = 0
+    max_state_bytes: int = 0
+    model_ms: float = 0.0
+    duration_ms: float = 0.0
+
+
+class _LockedWriter:
+    """A text stream shared by the span and metric export threads."""
+
+    def __init__(self, out: IO[str], owned: bool):
+        self._out = out
+        self._owned = owned
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        with self._lock:
+            return self._out.write(text)
+
+    def flush(self):
+        with self._lock:
+            self._out.flush()
+
+    def close(self):
+        if self._owned:
+            with self._lock:
+                self._out.close()
+
+
+def _text_bytes(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def _instruction(llm_request: LlmRequest) -> str:
+    instruction = llm_request.config.system_instruction if llm_request.config else None
+    if instruction is None:
+        return ""
+    if isinstance(instruction, str):
+        return instruction
+    if isinstance(instruction, types.Content):
+        return "\n".join(part.text or "" for part in instruction.parts or [])
+    return str(instruction)
+
+
+def _contents_text(contents: list[types.Content]) -> str:
+    chunks = []
+    for content in contents:
+        for part in content.parts or []:
+            if part.text:
+                chunks.append(part.text)
+            elif part.function_call:
+                chunks.append(part.function_call.name + json.dumps(part.function_call.args, default=str))
+            elif part.function_response:
+                chunks.append(part.function_response.name + json.dumps(part.function_response.response, default=str))
+    return "\n".join(chunks)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile, q in [0, 100]."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(q / 100 * len(ordered))) - 1]
+
+
+class ContextAccounting(BasePlugin):
+    """Plugin that records prompt size, context events and state bytes of every model call.
+
+    Add it to a Runner or App (`plugins=[accounting]`). AgentTools pass their
+    runner's plugins on, so their sub-agents are counted too (under their own
+    invocations and sessions).
+
+    Args:
+        export: Where spans and metrics go: "console" for stdout, a file
+            path for JSON lines appended to it, or None to keep the numbers
+            in process only.
+        export_interval_s: Seconds between metric exports. Spans are
+            exported in batches as they end.
+        max_calls: Model calls kept for `summary()`; the oldest are dropped.
+        max_invocations: Finished invocations kept for `invocation()`.
+        service_name: The `service.name` resource attribute of the export.
+    """
+
+    def __init__(
+        self,
+        export: Optional[str] = None,
+        export_interval_s: float = 60.0,
+        max_calls: int = 100_000,
+        max_invocations: int = 10_000,
+        service_name: str = "adk-agents",
+        name: str = "context_accounting",
+    ):
+        super().__init__(name=name)
+        self._lock = threading.Lock()
+        self._calls: deque[ModelCall] = deque(maxlen=max_calls)
+        self._invocations: OrderedDict[str, InvocationTotals] = OrderedDict()
+        self.max_invocations = max_invocations
+        # invocation id -> (totals, started, span) while it runs
+        self._running: dict[str, tuple[InvocationTotals, float, trace.Span]] = {}
+        # (invocation id, agent name) -> (started, request, span) while the model answers
+        self._pending: dict[tuple[str, str], tuple[float, LlmRequest, trace.Span]] = {}
+
+        self._out = None
+        readers, resource = [], Resource.create({"service.name": service_name})
+        self._tracer_provider = TracerProvider(resource=resource)
+        if export is not None:
+            if export == "console":
+                self._out = _LockedWriter(sys.stdout, owned=False)
+            else:
+                self._out = _LockedWriter(open(export, "a", encoding="utf-8"), owned=True)
+            self._tracer_provider.add_span_processor(
+                BatchSpanProcessor(
+                    ConsoleSpanExporter(out=self._out, formatter=lambda span: span.to_json(indent=None) + "\n")
+                )
+            )
+            readers.append(
+                PeriodicExportingMetricReader(
+                    ConsoleMetricExporter(out=self._out, formatter=lambda data: data.to_json(indent=None) + "\n"),
+                    export_interval_millis=export_interval_s * 1000,
+                )
+            )
+        self._meter_provider = MeterProvider(resource=resource, metric_readers=readers)
+        self._tracer = self._tracer_provider.get_tracer(__name__)
+        meter = self._meter_provider.get_meter(__name__)
+        self._histograms = {
+            "prompt_tokens": meter.create_histogram("adk.context.prompt_tokens", unit="{token}"),
+            "response_tokens": meter.create_histogram("adk.context.response_tokens", unit="{token}"),
+            "context_events": meter.create_histogram("adk.context.events", unit="{event}"),
+            "instruction_bytes": meter.create_histogram("adk.context.instruction_bytes", unit="By"),
+            "state_bytes": meter.create_histogram("adk.context.state_bytes", unit="By"),
+            "duration_ms": meter.create_histogram("adk.context.model_call.duration", unit="ms"),
+        }
+        self._invocation_tokens = meter.create_histogram("adk.context.invocation.prompt_tokens", unit="{token}")
+
+    async def before_run_callback(self, *, invocation_context: InvocationContext) -> Optional[types.Content]:
+        session = invocation_context.session
+        totals = InvocationTotals(
+            app_name=session.app_name,
+            user_id=session.user_id,
+            session_id=session.id,
+            invocation_id=invocation_context.invocation_id,
+            agent_name=invocation_context.agent.name,
+        )
+        span = self._tracer.start_span(
+            f"invocation {totals.agent_name}",
+            attributes={
+                "adk.app_name": totals.app_name,
+                "adk.user_id": totals.user_id,
+                "adk.session_id": totals.session_id,
+                "adk.invocation_id": totals.invocation_id,
+                "adk.agent_name": totals.agent_name,
+            },
+        )
+        with self._lock:
+            self._running[totals.invocation_id] = (totals, time.perf_counter(), span)
+        return None
+
+    async def before_model_callback(
+        self, *, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> Optional[LlmResponse]:
+        running = self._running.get(callback_context.invocation_id)
+        span = self._tracer.start_span(
+            f"model_call {callback_context.agent_name}",
+            context=trace.set_span_in_context(running[2]) if running else None,
+        )
+        with self._lock:
+            self._pending[(callback_context.invocation_id, callback_context.agent_name)] = (
+                time.perf_counter(), llm_request, span,
+            )
+        return None
+
+    async def after_model_callback(
+        self, *, callback_context: CallbackContext, llm_response: LlmResponse
+    ) -> Optional[LlmResponse]:
+        # a streamed answer is measured once, on its final chunk
+        if llm_response.partial:
+            return None
+        with self._lock:
+            pending = self._pending.pop((callback_context.invocation_id, callback_context.agent_name), None)
+        if pending is None:
+            return None
+        started, llm_request, span = pending
+        # measured now rather than before the call: the agent's own before-model
+        # callbacks run after the plugins' and may still have grown the request
+        call = self._measure(callback_context, llm_request, llm_response)
+        call.duration_ms = (time.perf_counter() - started) * 1000
+        self._record(call, span)
+        return None
+
+    async def on_model_error_callback(
+        self, *, callback_context: CallbackContext, llm_request: LlmRequest, error: Exception
+    ) -> Optional[LlmResponse]:
+        with self._lock:
+            pending = self._pending.pop((callback_context.invocation_id, callback_context.agent_name), None)
+        if pending is not None:
+            pending[2].record_exception(error)
+            pending[2].set_status(trace.StatusCode.ERROR, str(error))
+            pending[2].end()
+        return None
+
+    async def after_run_callback(self, *, invocation_context: InvocationContext) -> None:
+        invocation_id = invocation_context.invocation_id
+        with self._lock:
+            running = self._running.pop(invocation_id, None)
+            # calls a callback short-circuited never reach after_model
+            abandoned = [key for key in self._pending if key[0] == invocation_id]
+            spans = [self._pending.pop(key)[2] for key in abandoned]
+        for span in spans:
+            span.end()
+        if running is None:
+            return
+        totals, started, span = running
+        totals.duration_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._invocations[invocation_id] = totals
+            while len(self._invocations) > self.max_invocations:
+                self._invocations.popitem(last=False)
+        self._invocation_tokens.record(
+            totals.prompt_tokens, {"adk.app_name": totals.app_name, "adk.agent_name": totals.agent_name}
+        )
+        span.set_attributes(
+            {
+                "adk.context.model_calls": totals.model_calls,
+                "gen_ai.usage.input_tokens": totals.prompt_tokens,
+                "gen_ai.usage.output_tokens": totals.response_tokens,
+                "adk.context.max_events": totals.max_context_events,
+                "adk.context.max_instruction_bytes": totals.max_instruction_bytes,
+                "adk.context.max_state_bytes": totals.max_state_bytes,
+            }
+        )
+        span.end()
+
+    async def close(self):
+        """Exports the ended spans. Runners call this when they close, AgentTool's
+        inner runner after every call, so the exporters stay open (see `shutdown`)."""
+        self._tracer_provider.force_flush()
+
+    def shutdown(self):
+        """Exports spans and metrics and stops the exporters for good (also done at exit)."""
+        self._tracer_provider.shutdown()
+        self._meter_provider.shutdown()
+        if self._out is not None:
+            self._out.close()
+
+    @staticmethod
+    def _measure(
+        callback_context: CallbackContext, llm_request: LlmRequest, llm_response: LlmResponse
+    ) -> ModelCall:
+        session = callback_context.session
+        instruction = _instruction(llm_request)
+        usage = llm_response.usage_metadata
+        call = ModelCall(
+            app_name=session.app_name,
+            user_id=session.user_id,
+            session_id=session.id,
+            invocation_id=callback_context.invocation_id,
+            agent_name=callback_context.agent_name,
+            model=llm_request.model or "",
+            context_events=len(llm_request.contents),
+            session_events=len(session.events),
+            instruction_bytes=_text_bytes(instruction),
+            state_bytes=_text_bytes(json.dumps(callback_context.state.to_dict(), default=str)),
+        )
+        if usage is not None and usage.prompt_token_count is not None:
+            call.prompt_tokens = usage.prompt_token_count
+            call.response_tokens = usage.candidates_token_count or 0
+        else:
+            call.estimated = True
+            call.prompt_tokens = estimate_tokens(instruction) + estimate_tokens(_contents_text(llm_request.contents))
+            if llm_response.content:
+                call.response_tokens = estimate_tokens(_contents_text([llm_response.content]))
+        return call
+
+    def _record(self, call: ModelCall, span: trace.Span):
+        attributes = {"adk.app_name": call.app_name, "adk.agent_name": call.agent_name}
+        for field, histogram in self._histograms.items():
+            histogram.record(getattr(call, field), attributes)
+        span.set_attributes(
+            {
+                **attributes,
+                "adk.user_id": call.user_id,
+                "adk.session_id": call.session_id,
+                "adk.invocation_id": call.invocation_id,
+                "gen_ai.request.model": call.model,
+                "gen_ai.usage.input_tokens": call.prompt_tokens,
+                "gen_ai.usage.output_tokens": call.response_tokens,
+                "adk.context.events": call.context_events,
+                "adk.context.session_events": call.session_events,
+                "adk.context.instruction_bytes": call.instruction_bytes,
+                "adk.context.state_bytes": call.state_bytes,
+                "adk.context.estimated": call.estimated,
+            }
+        )
+        span.end()
+        with self._lock:
+            self._calls.append(call)
+            running = self._running.get(call.invocation_id)
+            if running is not None:
+                totals = running[0]
+                totals.model_calls += 1
+                totals.prompt_tokens += call.prompt_tokens
+                totals.response_tokens += call.response_tokens
+                totals.max_context_events = max(totals.max_context_events, call.context_events)
+                totals.max_instruction_bytes = max(totals.max_instruction_bytes, call.instruction_bytes)
+                totals.max_state_bytes = max(totals.max_state_bytes, call.state_bytes)
+                totals.model_ms += call.duration_ms
+
+    def calls(
+        self, *, agent_name: Optional[str] = None, session_id: Optional[str] = None
+    ) -> list[ModelCall]:
+        """The recorded model calls, oldest first, optionally of one agent or session."""
+        with self._lock:
+            calls = list(self._calls)
+        return [
+            call for call in calls
+            if (agent_name is None or call.agent_name == agent_name)
+            and (session_id is None or call.session_id == session_id)
+        ]
+
+    def invocation(self, invocation_id: str) -> Optional[dict]:
+        """Totals of a finished invocation, or None if it is unknown (or was dropped)."""
+        with self._lock:
+            totals = self._invocations.get(invocation_id)
+        return asdict(totals) if totals is not None else None
+
+    def summary(self, by: str = "agent", top: Optional[int] = None) -> list[dict]:
+        """Model calls grouped by agent, session or app, the largest prompt total first.
+
+        Every group has its call count and totals, the mean, p95 and max of
+        prompt tokens, the most context events and state bytes seen, and the
+        p50/p95 model call time. Sessions are keyed "app/user/session".
+        """
+        if by not in _GROUPS:
+            raise ValueError(f"by must be one of {', '.join(_GROUPS)}, not {by!r}")
+        groups: dict[str, list[ModelCall]] = {}
+        for call in self.calls():
+            if by == "agent":
+                key = call.agent_name
+            elif by == "session":
+                key = f"{call.app_name}/{call.user_id}/{call.session_id}"
+            else:
+                key = call.app_name
+            groups.setdefault(key, []).append(call)
+        rows = []
+        for key, calls in groups.items():
+            prompt = [call.prompt_tokens for call in calls]
+            durations = [call.duration_ms for call in calls]
+            rows.append(
+                {
+                    by: key,
+                    "model_calls": len(calls),
+                    "invocations": len({call.invocation_id for call in calls}),
+                    "prompt_tokens": sum(prompt),
+                    "response_tokens": sum(call.response_tokens for call in calls),
+                    "prompt_tokens_mean": round(sum(prompt) / len(calls), 1),
+                    "prompt_tokens_p95": _percentile(prompt, 95),
+                    "prompt_tokens_max": max(prompt),
+                    "max_context_events": max(call.context_events for call in calls),
+                    "max_instruction_bytes": max(call.instruction_bytes for call in calls),
+                    "max_state_bytes": max(call.state_bytes for call in calls),
+                    "model_ms_p50": round(_percentile(durations, 50), 3),
+                    "model_ms_p95": round(_percentile(durations, 95), 3),
+                    "estimated_calls": sum(call.estimated for call in calls),
+                }
+            )
+        rows.sort(key=lambda row: row["prompt_tokens"], reverse=True)
+        return rows[:top] if top is not None else rows
+
+    def stats(self) -> dict:
+        """Totals over the recorded model calls and finished invocations."""
+        with self._lock:
+            calls = list(self._calls)
+            invocations = len(self._invocations)
+            running = len(self._running)
+        return {
+            "model_calls": len(calls),
+            "invocations": invocations,
+            "running": running,
+            "prompt_tokens": sum(call.prompt_tokens for call in calls),
+            "response_tokens": sum(call.response_tokens for call in calls),
+            "max_prompt_tokens": max((call.prompt_tokens for call in calls), default=0),
+            "max_context_events": max((call.context_events for call in calls), default=0),
+        }
@@ -0,0 +1,260 @@
+"""Columnar analytics over agent event logs, with Arrow compute kernels.
+
+The input is the event table written by services.session_archive (a
+Parquet dataset from `export_sessions`, or an Arrow table built from
+`event_batches`). Every function scans it a record batch at a time, reading
+only the columns it needs and filtering inside the scan. List columns
+(function_calls and their ids) are exploded with `list_parent_indices`.
+Calls are matched to their responses with a hash join, and grouped figures
+come from `group_by` aggregations. No step loops over rows in Python. What
+is kept between batches is what the question needs (tool calls, per
+invocation times), not the events, so the event count is limited by disk,
+not memory.
+
+A tool call's span runs from the event that made the call to the event that
+carries its response. For an AgentTool that is the sub-agent's latency; for
+`adk_request_confirmation` it is the wait until the user's answer resumed
+the invocation. ADK stamps a model's event when it starts the model call, so
+a span also covers the caller's model call that decided on the tool.
+"""
+
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from .session_archive import PARTITIONING
+
+Events = Union[ds.Dataset, pa.Table]
+
+CONFIRMATION = "adk_request_confirmation"
+_SESSION_KEY = ["app_name", "user_id", "session_id"]
+_CALL_SCHEMA = pa.schema(
+    [
+        ("app_name", pa.string()),
+        ("user_id", pa.string()),
+        ("session_id", pa.string()),
+        ("invocation_id", pa.string()),
+        ("author", pa.string()),
+        ("timestamp", pa.float64()),
+        ("name", pa.string()),
+        ("call_id", pa.string()),
+    ]
+)
+
+
+def events_dataset(root: Union[str, Path]) -> ds.Dataset:
+    """The events of an export_sessions directory (its root, or its events/ subdirectory)."""
+    root = Path(root)
+    if (root / "events").is_dir():
+        root = root / "events"
+    return ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+
+
+def _scan(events: Events, columns: list[str], condition: Optional[pc.Expression] = None) -> Iterator[pa.RecordBatch]:
+    if isinstance(events, pa.Table):
+        events = ds.dataset(events)
+    for batch in events.to_batches(columns=columns, filter=condition):
+        if batch.num_rows:
+            yield batch
+
+
+def _concat(tables: Iterable[pa.Table], schema: pa.Schema) -> pa.Table:
+    tables = list(tables)
+    return pa.concat_tables(tables).combine_chunks() if tables else schema.empty_table()
+
+
+def _explode(batch: pa.RecordBatch, names: str, ids: str) -> pa.Table:
+    """One row per list element of `names` (and `ids`), with the event's other columns repeated."""
+    parents = pc.list_parent_indices(batch.column(names))
+    rows = pa.Table.from_batches([batch]).drop_columns([names, ids]).take(parents)
+    return rows.append_column("name", pc.list_flatten(batch.column(names))).append_column(
+        "call_id", pc.list_flatten(batch.column(ids))
+    )
+
+
+def _function_parts(
+    events: Events, names: str, ids: str, author: Optional[str], tools: Optional[list[str]]
+) -> pa.Table:
+    condition = pc.list_value_length(pc.field(names)) > 0
+    if author is not None:
+        condition &= pc.field("author") == author
+    tables = []
+    for batch in _scan(events, [*_CALL_SCHEMA.names[:6], names, ids], condition):
+        table = _explode(batch, names, ids)
+        if tools is not None:
+            table = table.filter(pc.is_in(table.column("name"), pa.array(tools, pa.string())))
+        tables.append(table.cast(_CALL_SCHEMA))
+    return _concat(tables, _CALL_SCHEMA)
+
+
+def tool_calls(events: Events, *, author: Optional[str] = None, tools: Optional[list[str]] = None) -> pa.Table:
+    """One row per function call (made by `author`, of the named tools), with its event's time and invocation."""
+    return _function_parts(events, "function_calls", "function_call_ids", author, tools)
+
+
+def tool_responses(events: Events, *, tools: Optional[list[str]] = None) -> pa.Table:
+    """One row per function response, like tool_calls."""
+    return _function_parts(events, "function_responses", "function_response_ids", None, tools)
+
+
+def tool_spans(events: Events, *, caller: Optional[str] = None, tools: Optional[list[str]] = None) -> pa.Table:
+    """Tool calls joined to their responses, with `duration_s` between the two events.
+
+    Calls still waiting for a response are kept, with a null duration.
+    """
+    calls = tool_calls(events, author=caller, tools=tools)
+    responses = (
+        tool_responses(events, tools=tools)
+        .select([*_SESSION_KEY, "call_id", "author", "timestamp"])
+        .rename_columns([*_SESSION_KEY, "call_id", "responder", "response_timestamp"])
+    )
+    spans = calls.filter(pc.not_equal(calls.column("call_id"), "")).join(
+        responses, keys=[*_SESSION_KEY, "call_id"], join_type="left outer"
+    )
+    return spans.append_column(
+        "duration_s", pc.subtract(spans.column("response_timestamp"), spans.column("timestamp"))
+    ).sort_by([("timestamp", "ascending")])
+
+
+def invocations(events: Events, *, author: Optional[str] = None) -> pa.Table:
+    """Start, end and duration_s of every invocation (every one `author` took part in).
+
+    One scan: each batch is reduced to a row per invocation (first and last
+    timestamp, whether `author` wrote any of its events) before the batches
+    are merged, so only one row per invocation is held.
+    """
+    columns = ["invocation_id", "timestamp"] + ([] if author is None else ["author"])
+    partial_times = []
+    for batch in _scan(events, columns):
+        table = pa.Table.from_batches([batch])
+        aggregates = [("timestamp", "min"), ("timestamp", "max")]
+        if author is not None:
+            table = table.set_column(2, "ran", pc.equal(table.column("author"), author))
+            aggregates.append(("ran", "any"))
+        partial_times.append(table.group_by("invocation_id").aggregate(aggregates))
+    schema = pa.schema(
+        [("invocation_id", pa.string()), ("timestamp_min", pa.float64()), ("timestamp_max", pa.float64())]
+        + ([] if author is None else [("ran_any", pa.bool_())])
+    )
+    merged = _concat(partial_times, schema).group_by("invocation_id").aggregate(
+        [("timestamp_min", "min"), ("timestamp_max", "max")] + ([] if author is None else [("ran_any", "any")])
+    )
+    if author is not None:
+        merged = merged.filter(merged.column("ran_any_any"))
+    start, end = merged.column("timestamp_min_min"), merged.column("timestamp_max_max")
+    return pa.table(
+        {
+            "invocation_id": merged.column("invocation_id"),
+            "start": start,
+            "end": end,
+            "duration_s": pc.subtract(end, start),
+        }
+    )
+
+
+def describe(values: Union[pa.Array, pa.ChunkedArray]) -> dict:
+    """Count, mean, p50, p95, p99 and max of the non-null values."""
+    values = pc.drop_null(values)
+    if not len(values):
+        return {"count": 0}
+    p50, p95, p99 = pc.quantile(values, q=[0.5, 0.95, 0.99]).to_pylist()
+    return {
+        "count": len(values),
+        "mean": round(pc.mean(values).as_py(), 4),
+        "p50": round(p50, 4),
+        "p95": round(p95, 4),
+        "p99": round(p99, 4),
+        "max": round(pc.max(values).as_py(), 4),
+    }
+
+
+def _records(table: pa.Table, digits: int = 4) -> list[dict]:
+    return [
+        {key: round(value, digits) if isinstance(value, float) else value for key, value in row.items()}
+        for row in table.to_pylist()
+    ]
+
+
+def tool_calls_per_invocation(events: Events, agent: str) -> dict:
+    """How many tools `agent` calls per invocation (a user turn), overall and per tool."""
+    calls = tool_calls(events, author=agent)
+    ran = invocations(events, author=agent).select(["invocation_id"])
+    per_invocation = ran.join(
+        calls.group_by("invocation_id").aggregate([("name", "count")]), keys="invocation_id", join_type="left outer"
+    )
+    counts = pc.fill_null(per_invocation.column("name_count"), 0)
+    per_tool = calls.group_by("name").aggregate([("name", "count"), ("invocation_id", "count_distinct")])
+    per_tool = pa.table(
+        {
+            "tool": per_tool.column("name"),
+            "calls": per_tool.column("name_count"),
+            "per_invocation": pc.divide(pc.cast(per_tool.column("name_count"), pa.float64()), max(ran.num_rows, 1)),
+            "invocations_using": per_tool.column("invocation_id_count_distinct"),
+        }
+    ).sort_by([("calls", "descending")])
+    return {
+        "agent": agent,
+        "invocations": ran.num_rows,
+        "tool_calls": calls.num_rows,
+        "per_invocation": describe(pc.cast(counts, pa.float64())),
+        "by_tool": _records(per_tool),
+    }
+
+
+def _span_stats(spans: pa.Table, by: str) -> pa.Table:
+    answered = spans.filter(pc.is_valid(spans.column("duration_s")))
+    stats = answered.group_by(by).aggregate(
+        [
+            ("duration_s", "count"),
+            ("duration_s", "sum"),
+            ("duration_s", "mean"),
+            ("duration_s", "tdigest", pc.TDigestOptions(q=0.95)),
+            ("duration_s", "max"),
+        ]
+    ).rename_columns([by, "calls", "total_s", "mean_s", "p95_s", "max_s"])
+    # tdigest gives a list of the requested quantiles per group
+    return stats.set_column(4, "p95_s", pc.list_flatten(stats.column("p95_s")))
+
+
+def confirmation_waits(events: Events, *, caller: Optional[str] = None) -> dict:
+    """Time from each adk_request_confirmation to the answer that resumed the invocation."""
+    spans = tool_spans(events, caller=caller, tools=[CONFIRMATION])
+    waits = spans.column("duration_s")
+    by_caller = _span_stats(spans, "author").sort_by([("calls", "descending")])
+    return {
+        "requests": spans.num_rows,
+        "unanswered": waits.null_count,
+        "wait_s": describe(waits),
+        "by_caller": _records(by_caller),
+    }
+
+
+def sub_agent_latency(events: Events, agent: str) -> dict:
+    """Which tools (AgentTool sub-agents among them) `agent`'s invocations spend their time in.
+
+    `share` is a tool's summed span over the summed duration of the
+    invocations `agent` ran in; parallel calls can push the shares past 1.
+    The rest of the time (`other_s`) is the agent's own model calls and
+    everything around them.
+    """
+    spans = tool_spans(events, caller=agent)
+    ran = invocations(events, author=agent)
+    wall_s = pc.sum(ran.column("duration_s")).as_py() or 0.0
+    stats = _span_stats(spans, "name")
+    stats = stats.append_column(
+        "share", pc.divide(stats.column("total_s"), wall_s) if wall_s else pa.nulls(stats.num_rows, pa.float64())
+    ).sort_by([("total_s", "descending")])
+    tools_s = pc.sum(stats.column("total_s")).as_py() or 0.0
+    by_tool = _records(stats.rename_columns(["tool", *stats.column_names[1:]]))
+    return {
+        "agent": agent,
+        "invocations": ran.num_rows,
+        "wall_s": round(wall_s, 4),
+        "invocation_s": describe(ran.column("duration_s")),
+        "dominant": by_tool[0]["tool"] if by_tool else None,
+        "by_tool": by_tool,
+        "other_s": round(max(wall_s - tools_s, 0.0), 4),
+    }
@@ -0,0 +1,133 @@
+"""Before-model callback that puts relevant memories straight into the request.
+
+3b.py's `MemoryDemoAgent` is told to call `load_memory` at the start of every
+response, which costs a whole model round trip before the real answer.
+`MemoryPrefetch` searches the memory service itself, once per invocation,
+with the latest user message, and appends the best results to the system
+instruction of every model call in that invocation. Memories already present
+in the conversation are skipped, and the block stays within a token budget.
+"""
+
+from collections import OrderedDict
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.memory.base_memory_service import BaseMemoryService
+from google.adk.memory.memory_entry import MemoryEntry
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+from .search_cache import normalize_query
+from .tokens import estimate_tokens, truncate_to_tokens
+
+_HEADER = """The following content is from your previous conversations with the user.
+It may be useful for answering the user's current query.
+<PAST_CONVERSATIONS>
+{memories}
+</PAST_CONVERSATIONS>"""
+
+
+def _memory_service(callback_context: CallbackContext) -> Optional[BaseMemoryService]:
+    """The runner's memory service, or None.
+
+    CallbackContext has no public way to reach it (only ToolContext can
+    search memory), so this is the one place that reads the private
+    invocation context. If ADK renames it, no memories are injected rather
+    than the model call failing.
+    """
+    invocation_context = getattr(callback_context, "_invocation_context", None)
+    return getattr(invocation_context, "memory_service", None)
+
+
+def _entry_text(entry: MemoryEntry) -> str:
+    if not entry.content or not entry.content.parts:
+        return ""
+    return " ".join(part.text for part in entry.content.parts if part.text).strip()
+
+
+class MemoryPrefetch:
+    """before_model_callback that injects the top memories for the user's message.
+
+    Args:
+        top_k: Most memories injected per turn.
+        token_budget: Most tokens (estimated) the memory block may add.
+        max_cached_invocations: Invocations whose block is kept, so the
+            memory service is searched once per turn, not once per model call.
+    """
+
+    def __init__(self, top_k: int = 5, token_budget: int = 400, max_cached_invocations: int = 1024):
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.max_cached_invocations = max_cached_invocations
+        self._blocks: OrderedDict[str, Optional[str]] = OrderedDict()
+        self._stats = dict(searches=0, injected=0, duplicates=0, over_budget=0, tokens=0)
+
+    async def __call__(
+        self, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> Optional[LlmResponse]:
+        invocation_id = callback_context.invocation_id
+        if invocation_id not in self._blocks:
+            self._blocks[invocation_id] = await self._build_block(callback_context, llm_request)
+            while len(self._blocks) > self.max_cached_invocations:
+                self._blocks.popitem(last=False)
+        block = self._blocks[invocation_id]
+        if block:
+            llm_request.append_instructions([block])
+        return None
+
+    async def _build_block(
+        self, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> Optional[str]:
+        user_content = callback_context.user_content
+        parts = user_content.parts if user_content and user_content.parts else []
+        query = " ".join(part.text for part in parts if part.text)
+        memory_service = _memory_service(callback_context)
+        if not query.strip() or memory_service is None:
+            return None
+
+        response = await memory_service.search_memory(
+            app_name=callback_context.session.app_name,
+            user_id=callback_context.user_id,
+            query=query,
+        )
+        self._stats["searches"] += 1
+
+        # anything already in the conversation needs no second copy
+        seen = {
+            normalize_query(part.text)
+            for content in llm_request.contents
+            for part in content.parts or []
+            if part.text
+        }
+        lines = []
+        budget = self.token_budget - estimate_tokens(_HEADER)
+        for entry in response.memories:
+            if len(lines) == self.top_k:
+                break
+            text = _entry_text(entry)
+            key = normalize_query(text)
+            if not key or key in seen:
+                self._stats["duplicates"] += 1
+                continue
+            seen.add(key)
+            line = f"[{entry.timestamp}] {entry.author}: {text}" if entry.author else text
+            cost = estimate_tokens(line)
+            if cost > budget:
+                self._stats["over_budget"] += 1
+                if lines or budget < 16:
+                    break
+                line = truncate_to_tokens(line, budget)
+                cost = budget
+            lines.append(line)
+            budget -= cost
+        if not lines:
+            return None
+
+        block = _HEADER.format(memories="\n".join(lines))
+        self._stats["injected"] += len(lines)
+        self._stats["tokens"] += estimate_tokens(block)
+        return block
+
+    def stats(self) -> dict:
+        """Searches run, memories injected or skipped, and tokens added."""
+        return dict(self._stats)
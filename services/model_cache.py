@@ -0,0 +1,266 @@
+"""Content-addressed cache for model responses, with record and replay modes.
+
+Every script builds its own `Gemini(model="gemini-2.5-flash-lite", ...)` and
+pays full latency for prompts it has already sent. `CachingLlm` wraps any
+BaseLlm: it hashes the whole request (model, system instruction, contents,
+tool declarations and generation settings) and keeps the responses in a
+`ResponseStore`, a SQLite file with LRU eviction.
+
+Modes:
+    readwrite  serve hits, call the model on a miss and store the answer
+    record     always call the model and (re)store the answer
+    replay     serve hits only; a miss raises CacheMissError, so CI and
+               benchmarks run offline and deterministically
+    off        pass straight through
+"""
+
+import contextlib
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncGenerator, Iterator, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.base_llm_connection import BaseLlmConnection
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from pydantic import Field, PrivateAttr
+
+from .agent_tree import iter_llm_agents
+
+MODES = ("readwrite", "record", "replay", "off")
+
+# request config fields that do not change what the model answers
+_IGNORED_CONFIG_FIELDS = {"http_options", "labels"}
+
+
+class CacheMissError(LookupError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+# load_memory results carry the wall-clock time each memory was saved at
+_MEMORY_TOOL = "load_memory"
+
+
+def _strip_volatile(content: dict) -> dict:
+    """Drops what differs between otherwise identical runs from a dumped Content.
+
+    Only the random function call and response ids, and the saved-at time of
+    load_memory results; tool arguments and other results are kept whole,
+    since they are what the answer depends on.
+    """
+    for part in content.get("parts", []):
+        call = part.get("function_call")
+        if call is not None:
+            call.pop("id", None)
+        response = part.get("function_response")
+        if response is not None:
+            response.pop("id", None)
+            memories = response.get("response", {}).get("memories") if response.get("name") == _MEMORY_TOOL else None
+            for memory in memories if isinstance(memories, list) else ():
+                if isinstance(memory, dict):
+                    memory.pop("timestamp", None)
+    return content
+
+
+def request_key(llm_request: LlmRequest) -> str:
+    """SHA-256 of the canonical JSON form of everything that shapes the answer."""
+    config = llm_request.config.model_dump(
+        mode="json", exclude_none=True, exclude=_IGNORED_CONFIG_FIELDS
+    )
+    canonical = {
+        "model": llm_request.model,
+        "config": config,
+        "contents": [
+            _strip_volatile(content.model_dump(mode="json", exclude_none=True))
+            for content in llm_request.contents
+        ],
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseStore:
+    """SQLite store of recorded responses, evicting least recently used rows.
+
+    Args:
+        path: SQLite file (":memory:" for a throwaway store).
+        max_entries: Row limit; least recently used rows are evicted past it.
+    """
+
+    def __init__(self, path: str = "model_cache.db", max_entries: int = 50_000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                responses TEXT NOT NULL,
+                latency REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[tuple[list[LlmResponse], float]]:
+        """Returns (responses, recorded latency in seconds) or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT responses, latency FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+        responses = [LlmResponse.model_validate(item) for item in json.loads(row[0])]
+        return responses, row[1]
+
+    def put(self, key: str, model: str, responses: list[LlmResponse], latency: float):
+        payload = json.dumps(
+            [response.model_dump(mode="json", exclude_none=True) for response in responses]
+        )
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, model, responses, latency, created_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, payload, latency, now, now),
+            )
+            overflow = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN"
+                    " (SELECT key FROM responses ORDER BY last_access LIMIT ?)",
+                    (overflow,),
+                )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+
+class CachingLlm(BaseLlm):
+    """Wraps a BaseLlm and serves repeated requests from a ResponseStore.
+
+    Attributes:
+        inner: The real model (e.g. Gemini) that answers misses.
+        store: Where responses are recorded.
+        mode: One of MODES.
+    """
+
+    inner: BaseLlm
+    store: ResponseStore = Field(exclude=True)
+    mode: str = "readwrite"
+
+    _stats: dict = PrivateAttr(
+        default_factory=lambda: dict(hits=0, misses=0, stored=0, latency_saved_s=0.0)
+    )
+    _tool_calls: int = PrivateAttr(default=0)
+
+    def __init__(self, **data):
+        data.setdefault("model", data["inner"].model)
+        super().__init__(**data)
+        if self.mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got '{self.mode}'")
+
+    @property
+    def calls(self) -> int:
+        return self._stats["hits"] + self._stats["misses"]
+
+    @property
+    def tool_calls(self) -> int:
+        return self._tool_calls
+
+    def stats(self) -> dict:
+        """Hits, misses, hit ratio and model time saved by hits."""
+        stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        stats["latency_saved_s"] = round(stats["latency_saved_s"], 3)
+        return stats
+
+    def _count_tool_calls(self, response: LlmResponse):
+        if response.content and response.content.parts:
+            self._tool_calls += sum(1 for part in response.content.parts if part.function_call)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        if self.mode == "off":
+            async for response in self.inner.generate_content_async(llm_request, stream):
+                yield response
+            return
+
+        key = request_key(llm_request)
+        if self.mode != "record":
+            cached = self.store.get(key)
+            if cached is not None:
+                responses, latency = cached
+                self._stats["hits"] += 1
+                self._stats["latency_saved_s"] += latency
+                for response in responses:
+                    self._count_tool_calls(response)
+                    yield response
+                return
+            if self.mode == "replay":
+                self._stats["misses"] += 1
+                raise CacheMissError(
+                    f"no recorded response for {llm_request.model} request {key[:12]}"
+                    f" in {self.store.path}; record it first"
+                )
+
+        self._stats["misses"] += 1
+        started = time.perf_counter()
+        final = []
+        async for response in self.inner.generate_content_async(llm_request, stream):
+            if not response.partial:
+                final.append(response)
+                self._count_tool_calls(response)
+            yield response
+        if final and not any(response.error_code for response in final):
+            self.store.put(key, self.model, final, time.perf_counter() - started)
+            self._stats["stored"] += 1
+
+    def connect(self, llm_request: LlmRequest) -> BaseLlmConnection:
+        return self.inner.connect(llm_request)
+
+
+@contextlib.contextmanager
+def cached_models(
+    agent: BaseAgent, store: ResponseStore, mode: str = "readwrite"
+) -> Iterator[dict[str, CachingLlm]]:
+    """Wraps the model of every LlmAgent in the tree in a CachingLlm.
+
+    Yields:
+        Agent name -> its CachingLlm. The original models are restored on exit.
+    """
+    originals = []
+    wrapped = {}
+    for llm_agent in iter_llm_agents(agent):
+        originals.append((llm_agent, llm_agent.model))
+        wrapped[llm_agent.name] = CachingLlm(
+            inner=llm_agent.canonical_model, store=store, mode=mode
+        )
+        llm_agent.model = wrapped[llm_agent.name]
+    try:
+        yield wrapped
+    finally:
+        for llm_agent, model in originals:
+            llm_agent.model = model
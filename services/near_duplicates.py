@@ -0,0 +1,300 @@
+"""MinHash/LSH index for spotting near-duplicate research results.
+
+`ResearchAgent` and `research_paper_finder_agent` often return the same
+finding or paper again, reworded, for a related query or in a later session.
+`NearDuplicateIndex` keeps a MinHash signature of every snippet it has seen
+and buckets it by LSH bands in SQLite. A lookup touches only the items that
+share a band bucket with the new text, so it stays fast as the corpus grows.
+
+Similarity is the Jaccard similarity of character 5-gram shingles. With the
+default 128 permutations in 32 bands of 4 rows, pairs above ~0.6 are almost
+always found as candidates, and candidates are then checked against
+`threshold` on their full signatures.
+
+`record` stores a text once: a near duplicate seen again, in the same or
+another scope, only adds that scope to the item it matched, so buckets do
+not fill up with copies of the findings that keep coming back.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import mmh3
+import numpy as np
+
+from .search_cache import normalize_query
+
+_PRIME = np.uint64(4_294_967_291)  # largest prime below 2**32
+_ITEM_MARKER = re.compile(r"^\s*(?:\d+[.)]|[-*•])\s+")
+
+
+@dataclass
+class Match:
+    """An indexed item that a new text nearly duplicates."""
+
+    key: str
+    scope: str
+    similarity: float
+    # set by record(): the item was already seen in the scope being recorded
+    seen_in_scope: bool = False
+
+
+def split_snippets(text: str) -> list[str]:
+    """Splits research output into list items and paragraphs."""
+    snippets: list[str] = []
+    current: list[str] = []
+    for line in text.splitlines():
+        if _ITEM_MARKER.match(line) or not line.strip():
+            if current:
+                snippets.append(" ".join(current))
+            current = [line.strip()] if line.strip() else []
+        else:
+            current.append(line.strip())
+    if current:
+        snippets.append(" ".join(current))
+    return snippets
+
+
+class NearDuplicateIndex:
+    """Persistent MinHash/LSH index with incremental inserts.
+
+    Args:
+        path: SQLite file, or ":memory:" for a throwaway index. The file is
+            opened on first use, so creating an index (at import time, say)
+            does not create it.
+        num_perm: MinHash permutations per signature.
+        bands: LSH bands; num_perm must be divisible by it.
+        threshold: Estimated Jaccard similarity at which texts are duplicates.
+        shingle_size: Characters per shingle.
+        seed: Seed of the permutations. An index must always be opened with
+            the same seed and num_perm it was built with.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        num_perm: int = 128,
+        bands: int = 32,
+        threshold: float = 0.8,
+        shingle_size: int = 5,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        # a < 2**31 and x < 2**32 keep a * x + b inside uint64
+        self._a = rng.integers(1, 2**31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**31, size=num_perm, dtype=np.uint64)
+
+        self._lock = threading.Lock()
+        self._stats = dict(lookups=0, candidates=0, duplicates=0, inserts=0)
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """The SQLite store, opened (and its tables created) on first use."""
+        if self._connection is None:
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY,
+                    key TEXT NOT NULL,
+                    scope TEXT NOT NULL,
+                    signature BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )"""
+            )
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS buckets (
+                    bucket INTEGER NOT NULL,
+                    item_id INTEGER NOT NULL,
+                    PRIMARY KEY (bucket, item_id)
+                ) WITHOUT ROWID"""
+            )
+            # scopes an item was seen in after the one it was indexed under
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS sightings (
+                    item_id INTEGER NOT NULL,
+                    scope TEXT NOT NULL,
+                    PRIMARY KEY (item_id, scope)
+                ) WITHOUT ROWID"""
+            )
+            db.commit()
+            self._connection = db
+        return self._connection
+
+    def shingles(self, text: str) -> set[str]:
+        normalized = normalize_query(text)
+        k = self.shingle_size
+        if len(normalized) <= k:
+            return {normalized} if normalized else set()
+        return {normalized[i : i + k] for i in range(len(normalized) - k + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (num_perm uint32 values) of a text."""
+        hashes = np.fromiter(
+            (mmh3.hash(shingle, signed=False) for shingle in self.shingles(text)),
+            dtype=np.uint64,
+        )
+        if not hashes.size:
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _bucket_ids(self, signature: np.ndarray) -> list[int]:
+        return [
+            mmh3.hash64(
+                band.to_bytes(2, "little") + signature[band * self.rows : (band + 1) * self.rows].tobytes()
+            )[0]
+            for band in range(self.bands)
+        ]
+
+    def _query(
+        self, signature: np.ndarray, threshold: float, scope: Optional[str] = None
+    ) -> list[tuple[int, Match]]:
+        """(item id, match) pairs, most similar first, flagged if seen in `scope`."""
+        buckets = self._bucket_ids(signature)
+        rows = self._db.execute(
+            "SELECT id, key, scope, signature FROM items WHERE id IN"
+            f" (SELECT item_id FROM buckets WHERE bucket IN ({','.join('?' * len(buckets))}))",
+            buckets,
+        ).fetchall()
+        self._stats["lookups"] += 1
+        self._stats["candidates"] += len(rows)
+        matches = []
+        for item_id, key, item_scope, blob in rows:
+            similarity = float(np.mean(np.frombuffer(blob, dtype=np.uint32) == signature))
+            if similarity >= threshold:
+                matches.append((item_id, Match(key=key, scope=item_scope, similarity=similarity)))
+        if matches and scope is not None:
+            ids = [item_id for item_id, _ in matches]
+            # one primary key probe per match, however many scopes an item was seen in
+            seen = {
+                item_id
+                for (item_id,) in self._db.execute(
+                    f"SELECT item_id FROM sightings WHERE scope = ? AND item_id IN ({','.join('?' * len(ids))})",
+                    [scope, *ids],
+                )
+            }
+            for item_id, match in matches:
+                match.seen_in_scope = match.scope == scope or item_id in seen
+        matches.sort(key=lambda pair: pair[1].similarity, reverse=True)
+        return matches
+
+    def _insert(self, key: str, signature: np.ndarray, scope: str):
+        """Stores a new item and its band buckets."""
+        cursor = self._db.execute(
+            "INSERT INTO items (key, scope, signature, created_at) VALUES (?, ?, ?, ?)",
+            (key, scope, signature.tobytes(), time.time()),
+        )
+        self._db.executemany(
+            "INSERT OR IGNORE INTO buckets (bucket, item_id) VALUES (?, ?)",
+            [(bucket, cursor.lastrowid) for bucket in self._bucket_ids(signature)],
+        )
+        self._stats["inserts"] += 1
+
+    def query(self, text: str, threshold: Optional[float] = None) -> list[Match]:
+        """Indexed items that `text` nearly duplicates, most similar first."""
+        signature = self.signature(text)
+        with self._lock:
+            return [match for _, match in self._query(signature, self.threshold if threshold is None else threshold)]
+
+    def add(self, key: str, text: str, scope: str = ""):
+        """Indexes a text under `key`, whether or not it duplicates anything."""
+        self.add_many([(key, text)], scope=scope)
+
+    def add_many(self, items: Iterable[tuple[str, str]], scope: str = ""):
+        """Indexes (key, text) pairs in a single transaction."""
+        signatures = [(key, self.signature(text)) for key, text in items]
+        with self._lock:
+            for key, signature in signatures:
+                self._insert(key, signature, scope)
+            self._db.commit()
+
+    def register(self, key: str, text: str, scope: str = "") -> Optional[Match]:
+        """Indexes a text unless it nearly duplicates one already indexed.
+
+        Args:
+            key: Identifier reported back when a later text duplicates this one.
+            text: The snippet or paper title.
+            scope: Where the text came from (an invocation or session id), so
+                callers can tell repeats within one answer from repeats of an
+                earlier query.
+
+        Returns:
+            The best existing match, or None if the text was new and is now
+            indexed.
+        """
+        signature = self.signature(text)
+        with self._lock:
+            matches = self._query(signature, self.threshold)
+            if matches:
+                self._stats["duplicates"] += 1
+                return matches[0][1]
+            self._insert(key, signature, scope)
+            self._db.commit()
+            return None
+
+    def record(self, text: str, scope: str = "", key: Optional[str] = None) -> list[Match]:
+        """Looks a text up and records that it was seen in `scope`.
+
+        A text that nearly duplicates indexed items is not stored again; the
+        items it matched are marked as seen in `scope` instead. A new text is
+        indexed under `key` (a random one by default).
+
+        Returns:
+            The matches, most similar first. `seen_in_scope` tells a repeat
+            within the scope from a text first seen elsewhere.
+        """
+        signature = self.signature(text)
+        with self._lock:
+            matches = self._query(signature, self.threshold, scope)
+            if matches:
+                self._stats["duplicates"] += 1
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO sightings (item_id, scope) VALUES (?, ?)",
+                    [(item_id, scope) for item_id, match in matches if not match.seen_in_scope],
+                )
+            else:
+                self._insert(key or uuid.uuid4().hex, signature, scope)
+            self._db.commit()
+            return [match for _, match in matches]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM buckets")
+            self._db.execute("DELETE FROM sightings")
+            self._db.execute("DELETE FROM items")
+            self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def stats(self) -> dict:
+        """Lookup, candidate and duplicate counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["items"] = len(self)
+        stats["candidates_per_lookup"] = (
+            stats["candidates"] / stats["lookups"] if stats["lookups"] else 0.0
+        )
+        return stats
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
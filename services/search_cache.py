@@ -0,0 +1,206 @@
+"""Two-tier TTL/LRU cache for search sub-agent results.
+
+`google_search_agent` (research_agent/agent.py) and `ResearchAgent` (1b.py)
+spend a model call plus a search every time, even for a topic asked a few
+minutes ago. `SearchCache` keeps recent answers in an in-memory LRU and
+everything else in a size-bounded SQLite file, both with per-entry expiry,
+and `CachedAgentTool` consults it before running the wrapped agent.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from google.adk.tools import AgentTool
+from google.adk.tools.tool_context import ToolContext
+
+
+def normalize_query(query: str) -> str:
+    """Case-folds, drops punctuation and collapses whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.casefold()).split())
+
+
+class SearchCache:
+    """In-memory LRU in front of an on-disk SQLite store, with per-entry TTL.
+
+    Args:
+        path: SQLite file for the disk tier, or None for memory only. The
+            file is opened on first use, so creating a cache (at import
+            time, say) does not create it.
+        ttl: Default seconds an entry stays valid.
+        max_memory_entries: LRU size of the memory tier.
+        max_disk_entries: Row limit of the disk tier; least recently used
+            rows are evicted past it.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: float = 3600.0,
+        max_memory_entries: int = 256,
+        max_disk_entries: int = 10_000,
+    ):
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = dict(memory_hits=0, disk_hits=0, misses=0, expired=0, evictions=0, puts=0)
+
+        self._path = path
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> Optional[sqlite3.Connection]:
+        """The disk tier, opened on first use; None when memory only."""
+        if self._connection is None and self._path is not None:
+            db = sqlite3.connect(self._path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS search_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS search_cache_last_access ON search_cache (last_access)"
+            )
+            db.commit()
+            self._connection = db
+        return self._connection
+
+    @staticmethod
+    def key(query: str, namespace: str = "") -> str:
+        return f"{namespace}\x1f{normalize_query(query)}"
+
+    def get(self, query: str, namespace: str = "") -> Optional[Any]:
+        """Returns the cached value for a query, or None on a miss."""
+        key = self.key(query, namespace)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+                self._stats["expired"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM search_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._db.execute(
+                        "UPDATE search_cache SET last_access = ? WHERE key = ?", (now, key)
+                    )
+                    self._db.commit()
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self._stats["disk_hits"] += 1
+                    return value
+                if row is not None:
+                    self._db.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._stats["expired"] += 1
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, query: str, value: Any, namespace: str = "", ttl: Optional[float] = None):
+        """Stores a JSON-serializable value under a query."""
+        key = self.key(query, namespace)
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._stats["puts"] += 1
+            self._remember(key, expires_at, value)
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO search_cache (key, value, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            # expired rows go first, then the least recently used ones over the limit
+            self._db.execute("DELETE FROM search_cache WHERE expires_at <= ?", (now,))
+            overflow = self._db.execute(
+                "SELECT COUNT(*) FROM search_cache"
+            ).fetchone()[0] - self.max_disk_entries
+            if overflow > 0:
+                self._db.execute(
+                    "DELETE FROM search_cache WHERE key IN"
+                    " (SELECT key FROM search_cache ORDER BY last_access LIMIT ?)",
+                    (overflow,),
+                )
+                self._stats["evictions"] += overflow
+            self._db.commit()
+
+    def _remember(self, key: str, expires_at: float, value: Any):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM search_cache")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters plus the overall hit rate."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        """Closes the disk tier; the cache keeps working from memory only."""
+        self._path = None
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class CachedAgentTool(AgentTool):
+    """An AgentTool that answers repeated requests from a SearchCache.
+
+    On a hit the sub-agent is not run at all. If the agent has an
+    `output_key`, the cached text is written to that state key, just as a
+    real run would have done.
+    """
+
+    def __init__(self, agent, cache: SearchCache, ttl: Optional[float] = None, **kwargs):
+        super().__init__(agent, **kwargs)
+        self.cache = cache
+        self.ttl = ttl
+
+    async def run_async(self, *, args: dict[str, Any], tool_context: ToolContext) -> Any:
+        request = args.get("request")
+        if not isinstance(request, str):
+            return await super().run_async(args=args, tool_context=tool_context)
+
+        cached = self.cache.get(request, namespace=self.agent.name)
+        if cached is not None:
+            output_key = getattr(self.agent, "output_key", None)
+            if output_key:
+                tool_context.state[output_key] = cached
+            return cached
+
+        result = await super().run_async(args=args, tool_context=tool_context)
+        if result:
+            self.cache.put(request, result, namespace=self.agent.name, ttl=self.ttl)
+        return result
@@ -0,0 +1,469 @@
+"""Bulk export and import of sessions, events and state as Arrow / Parquet.
+
+`export_sessions` streams an app's sessions out of any session service into
+Parquet files under `root`, in three datasets:
+
+    root/sessions/app_name=.../user_id=.../date=.../part-*.parquet
+    root/events/app_name=.../user_id=.../date=.../part-*.parquet
+    root/state/app_name=.../part-*.parquet
+
+Directories are hive-style partitions (values percent-encoded), so
+`pyarrow.dataset.dataset(root / "events", partitioning=PARTITIONING)` reads
+them back with app_name, user_id and date as columns. Events are read a page
+at a time (iter_events), buffered per partition up to `batch_rows` and
+written as one row group. At most `max_open_files` partitions are open at
+once, so memory stays bounded by those buffers, not by the export's size.
+Next to the lossless `event_json`, each event row carries flattened
+columns (author, tool call names and ids, state keys, token counts) for
+analytics that never decode the JSON.
+
+`import_sessions` reads the files back into a service. Sessions are created
+with their final state, and events are stored as they were without
+replaying their state deltas. InMemorySessionService,
+DatabaseSessionService and PooledSqliteSessionService have a bulk path for
+the events. Any other service gets them through append_event, which does
+re-apply the deltas.
+"""
+
+import json
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional, Union
+from urllib.parse import quote
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from google.adk.events.event import Event
+from google.adk.sessions import DatabaseSessionService, InMemorySessionService
+from google.adk.sessions.base_session_service import BaseSessionService
+from google.adk.sessions.session import Session
+from google.adk.sessions.state import State
+
+from .sessions import CachedSessionService, iter_events
+from .sqlite_sessions import PooledSqliteSessionService
+from .state_store import split_state
+
+EVENT_SCHEMA = pa.schema(
+    [
+        ("session_id", pa.string()),
+        ("id", pa.string()),
+        ("invocation_id", pa.string()),
+        ("author", pa.string()),
+        ("branch", pa.string()),
+        ("timestamp", pa.float64()),
+        ("final", pa.bool_()),
+        ("text_chars", pa.int32()),
+        ("function_calls", pa.list_(pa.string())),
+        ("function_call_ids", pa.list_(pa.string())),
+        ("function_responses", pa.list_(pa.string())),
+        ("function_response_ids", pa.list_(pa.string())),
+        ("state_keys", pa.list_(pa.string())),
+        ("prompt_tokens", pa.int32()),
+        ("response_tokens", pa.int32()),
+        ("event_json", pa.string()),
+    ]
+)
+SESSION_SCHEMA = pa.schema(
+    [
+        ("session_id", pa.string()),
+        ("last_update_time", pa.float64()),
+        ("events", pa.int64()),
+        ("state_json", pa.string()),
+    ]
+)
+STATE_SCHEMA = pa.schema(
+    [
+        ("scope", pa.string()),
+        ("user_id", pa.string()),
+        ("key", pa.string()),
+        ("value_json", pa.string()),
+    ]
+)
+PARTITION_SCHEMA = pa.schema([("app_name", pa.string()), ("user_id", pa.string()), ("date", pa.string())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+"""Partitioning of the sessions and events datasets (all strings, so user ids are never parsed as numbers)."""
+STATE_PARTITIONING = ds.partitioning(pa.schema([("app_name", pa.string())]), flavor="hive")
+
+
+def _day(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(timestamp))
+
+
+def event_row(event: Event) -> dict[str, Any]:
+    """An event as a row of EVENT_SCHEMA, without its session_id."""
+    calls = event.get_function_calls()
+    responses = event.get_function_responses()
+    parts = event.content.parts if event.content and event.content.parts else []
+    usage = event.usage_metadata
+    return {
+        "id": event.id,
+        "invocation_id": event.invocation_id,
+        "author": event.author,
+        "branch": event.branch,
+        "timestamp": event.timestamp,
+        "final": event.is_final_response(),
+        "text_chars": sum(len(part.text) for part in parts if part.text),
+        "function_calls": [call.name for call in calls],
+        "function_call_ids": [call.id or "" for call in calls],
+        "function_responses": [response.name for response in responses],
+        "function_response_ids": [response.id or "" for response in responses],
+        "state_keys": list(event.actions.state_delta) if event.actions and event.actions.state_delta else [],
+        "prompt_tokens": usage.prompt_token_count if usage else None,
+        "response_tokens": usage.candidates_token_count if usage else None,
+        "event_json": event.model_dump_json(exclude_none=True),
+    }
+
+
+class _PartitionedWriter:
+    """Appends rows to Parquet files in hive-style partition directories.
+
+    Rows are buffered per partition and written a row group at a time, when
+    a partition has `batch_rows` of them or when all buffers together pass
+    `max_buffered` (the largest one goes). When more than `max_open`
+    partitions are open, the least recently used one is written out and its
+    file closed; rows that come later for it go to a new part file.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        schema: pa.Schema,
+        partition_by: tuple[str, ...],
+        batch_rows: int,
+        max_open: int,
+        compression: str,
+        max_buffered: Optional[int] = None,
+    ):
+        self.root = root
+        self.schema = schema
+        self.partition_by = partition_by
+        self.batch_rows = batch_rows
+        self.max_open = max_open
+        self.max_buffered = max_buffered or 2 * batch_rows
+        self.compression = compression
+        self.run = uuid.uuid4().hex[:8]
+        self._open: OrderedDict[tuple, tuple[Optional[pq.ParquetWriter], list[dict]]] = OrderedDict()
+        self._parts: dict[tuple, int] = {}
+        self._buffered = 0
+        self.files = 0
+        self.rows = 0
+
+    def add(self, partition: tuple, row: dict):
+        entry = self._open.get(partition)
+        if entry is None:
+            while len(self._open) >= self.max_open:
+                self._close(next(iter(self._open)))
+            entry = self._open[partition] = (None, [])
+        self._open.move_to_end(partition)
+        entry[1].append(row)
+        self._buffered += 1
+        if len(entry[1]) >= self.batch_rows:
+            self._write(partition)
+        elif self._buffered > self.max_buffered:
+            self._write(max(self._open, key=lambda key: len(self._open[key][1])))
+
+    def _write(self, partition: tuple):
+        writer, rows = self._open[partition]
+        if not rows:
+            return
+        if writer is None:
+            directory = self.root.joinpath(
+                *(f"{name}={quote(value, safe='')}" for name, value in zip(self.partition_by, partition))
+            )
+            directory.mkdir(parents=True, exist_ok=True)
+            part = self._parts.get(partition, 0)
+            self._parts[partition] = part + 1
+            writer = pq.ParquetWriter(
+                directory / f"part-{self.run}-{part:05d}.parquet", self.schema, compression=self.compression
+            )
+            self.files += 1
+        writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+        self.rows += len(rows)
+        self._buffered -= len(rows)
+        self._open[partition] = (writer, [])
+
+    def _close(self, partition: tuple):
+        self._write(partition)
+        writer, _ = self._open.pop(partition)
+        if writer is not None:
+            writer.close()
+
+    def close(self):
+        for partition in list(self._open):
+            self._close(partition)
+
+
+async def _listed(session_service: BaseSessionService, app_name: str, user_id: Optional[str]) -> list[Session]:
+    response = await session_service.list_sessions(app_name=app_name, user_id=user_id)
+    return sorted(response.sessions, key=lambda session: (session.user_id, session.id))
+
+
+async def event_batches(
+    session_service: BaseSessionService,
+    *,
+    app_name: str,
+    user_id: Optional[str] = None,
+    batch_rows: int = 8192,
+    page_size: int = 500,
+) -> AsyncIterator[pa.RecordBatch]:
+    """Yields an app's (or one user's) events as record batches of EVENT_SCHEMA plus app_name and user_id.
+
+    Sessions are read one after another, oldest event first, a page at a
+    time; only one batch of rows is held.
+    """
+    schema = EVENT_SCHEMA.append(pa.field("app_name", pa.string())).append(pa.field("user_id", pa.string()))
+    rows = []
+    for session in await _listed(session_service, app_name, user_id):
+        async for event in iter_events(
+            session_service, app_name=app_name, user_id=session.user_id, session_id=session.id,
+            newest_first=False, page_size=page_size,
+        ):
+            rows.append(event_row(event) | {"session_id": session.id, "app_name": app_name, "user_id": session.user_id})
+            if len(rows) >= batch_rows:
+                yield pa.RecordBatch.from_pylist(rows, schema=schema)
+                rows = []
+    if rows:
+        yield pa.RecordBatch.from_pylist(rows, schema=schema)
+
+
+async def export_sessions(
+    session_service: BaseSessionService,
+    root: Union[str, Path],
+    *,
+    app_name: str,
+    user_id: Optional[str] = None,
+    batch_rows: int = 8192,
+    page_size: int = 500,
+    max_open_files: int = 64,
+    compression: str = "zstd",
+) -> dict:
+    """Writes an app's (or one user's) sessions, events and state under `root` as Parquet.
+
+    Args:
+        session_service: Any session service; services that page their
+            events (PooledSqliteSessionService) are read a page at a time,
+            others a session at a time.
+        root: Directory of the three datasets; later exports add files.
+        batch_rows: Rows per row group, and per partition buffer.
+        page_size: Events per read from the service.
+        max_open_files: Partitions (files) written to at once.
+        compression: Parquet codec.
+
+    Returns:
+        Counts of sessions, events, state keys and files written, and the seconds taken.
+    """
+    started = time.perf_counter()
+    root = Path(root)
+    writers = {
+        name: _PartitionedWriter(root / name, schema, partition_by, batch_rows, max_open_files, compression)
+        for name, schema, partition_by in (
+            ("sessions", SESSION_SCHEMA, ("app_name", "user_id", "date")),
+            ("events", EVENT_SCHEMA, ("app_name", "user_id", "date")),
+            ("state", STATE_SCHEMA, ("app_name",)),
+        )
+    }
+    app_state: Optional[dict] = None
+    users_seen: set[str] = set()
+    try:
+        for session in await _listed(session_service, app_name, user_id):
+            tiers = split_state(session.state)
+            if app_state is None:
+                app_state = tiers["app"]
+            if session.user_id not in users_seen:
+                users_seen.add(session.user_id)
+                for key, value in tiers["user"].items():
+                    writers["state"].add(
+                        (app_name,),
+                        {"scope": "user", "user_id": session.user_id, "key": key, "value_json": json.dumps(value)},
+                    )
+            events = 0
+            last_update_time = session.last_update_time
+            async for event in iter_events(
+                session_service, app_name=app_name, user_id=session.user_id, session_id=session.id,
+                newest_first=False, page_size=page_size,
+            ):
+                row = event_row(event)
+                row["session_id"] = session.id
+                writers["events"].add((app_name, session.user_id, _day(event.timestamp)), row)
+                events += 1
+                last_update_time = max(last_update_time, event.timestamp)
+            writers["sessions"].add(
+                (app_name, session.user_id, _day(last_update_time)),
+                {
+                    "session_id": session.id,
+                    "last_update_time": last_update_time,
+                    "events": events,
+                    "state_json": json.dumps(tiers["session"]),
+                },
+            )
+        for key, value in (app_state or {}).items():
+            writers["state"].add((app_name,), {"scope": "app", "user_id": None, "key": key, "value_json": json.dumps(value)})
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return {
+        "sessions": writers["sessions"].rows,
+        "events": writers["events"].rows,
+        "state_keys": writers["state"].rows,
+        "files": sum(writer.files for writer in writers.values()),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _fragments(
+    path: Path, partitioning: ds.Partitioning, app_name: Optional[str], user_id: Optional[str]
+) -> Iterator[tuple[dict, ds.Fragment]]:
+    """The dataset's files for the app (and user), in path order: users, then dates, then parts."""
+    if not path.exists():
+        return
+    dataset = ds.dataset(path, format="parquet", partitioning=partitioning)
+    condition = None
+    if app_name is not None:
+        condition = pc.field("app_name") == app_name
+    if user_id is not None and "user_id" in dataset.schema.names:
+        user_condition = pc.field("user_id") == user_id
+        condition = user_condition if condition is None else condition & user_condition
+    fragments = dataset.get_fragments(filter=condition) if condition is not None else dataset.get_fragments()
+    for fragment in sorted(fragments, key=lambda fragment: fragment.path):
+        yield ds.get_partition_keys(fragment.partition_expression), fragment
+
+
+def _rows(fragment: ds.Fragment, columns: list[str], batch_rows: int) -> Iterator[dict]:
+    for batch in fragment.to_batches(columns=columns, batch_size=batch_rows):
+        yield from batch.to_pylist()
+
+
+EventStore = Callable[[tuple[str, str, str], list[Event]], Awaitable[None]]
+
+
+def _event_store(session_service: BaseSessionService) -> EventStore:
+    """How events are written into the service without re-applying their state deltas."""
+    if isinstance(session_service, InMemorySessionService):
+
+        async def store(key, events):
+            app_name, user_id, session_id = key
+            session = session_service.sessions[app_name][user_id][session_id]
+            session.events.extend(events)
+            session.last_update_time = events[-1].timestamp
+
+        return store
+
+    if isinstance(session_service, PooledSqliteSessionService):
+
+        async def store(key, events):
+            await session_service.store_events(*key, events)
+
+        return store
+
+    if isinstance(session_service, DatabaseSessionService):
+
+        async def store(key, events):
+            # the service's own (version-pinned) storage classes, one transaction per group of events
+            await session_service._prepare_tables()
+            schema = session_service._get_schema_classes()
+            is_sqlite = session_service.db_engine.dialect.name == "sqlite"
+            owner = Session(app_name=key[0], user_id=key[1], id=key[2])
+            async with session_service._rollback_on_exception_session() as sql_session:
+                sql_session.add_all([schema.StorageEvent.from_event(owner, event) for event in events])
+                storage_session = await sql_session.get(schema.StorageSession, key)
+                last = events[-1].timestamp
+                storage_session.update_time = (
+                    datetime.fromtimestamp(last, timezone.utc).replace(tzinfo=None)
+                    if is_sqlite
+                    else datetime.fromtimestamp(last)
+                )
+                await sql_session.commit()
+
+        return store
+
+    handles: dict[tuple[str, str, str], Session] = {}
+
+    async def store(key, events):
+        session = handles.get(key)
+        if session is None:
+            handles.clear()
+            session = handles[key] = await session_service.get_session(
+                app_name=key[0], user_id=key[1], session_id=key[2]
+            )
+        for event in events:
+            await session_service.append_event(session, event)
+
+    return store
+
+
+async def import_sessions(
+    session_service: BaseSessionService,
+    root: Union[str, Path],
+    *,
+    app_name: Optional[str] = None,
+    user_id: Optional[str] = None,
+    batch_rows: int = 8192,
+) -> dict:
+    """Creates the exported sessions under `root` in a session service, events and state included.
+
+    Sessions must not exist yet (AlreadyExistsError). App and user state is
+    held in memory while the sessions are created; events stream through a
+    batch at a time.
+
+    Args:
+        session_service: The service to seed. A CachedSessionService is
+            seeded through the service it wraps.
+        root: Directory written by export_sessions.
+        app_name: Only this app (default: every app in the files).
+        user_id: Only this user.
+        batch_rows: Rows read per batch, and most events stored at once.
+
+    Returns:
+        Counts of sessions and events imported, and the seconds taken.
+    """
+    started = time.perf_counter()
+    root = Path(root)
+    cached = session_service if isinstance(session_service, CachedSessionService) else None
+    if cached is not None:
+        session_service = cached.inner
+
+    shared: dict[tuple[str, Optional[str]], dict] = {}
+    for keys, fragment in _fragments(root / "state", STATE_PARTITIONING, app_name, None):
+        for row in _rows(fragment, STATE_SCHEMA.names, batch_rows):
+            if row["scope"] == "app":
+                shared.setdefault((keys["app_name"], None), {})[State.APP_PREFIX + row["key"]] = json.loads(row["value_json"])
+            elif user_id is None or row["user_id"] == user_id:
+                shared.setdefault((keys["app_name"], row["user_id"]), {})[State.USER_PREFIX + row["key"]] = json.loads(
+                    row["value_json"]
+                )
+
+    sessions = 0
+    for keys, fragment in _fragments(root / "sessions", PARTITIONING, app_name, user_id):
+        for row in _rows(fragment, ["session_id", "state_json"], batch_rows):
+            state = json.loads(row["state_json"])
+            state.update(shared.get((keys["app_name"], None), {}))
+            state.update(shared.get((keys["app_name"], keys["user_id"]), {}))
+            await session_service.create_session(
+                app_name=keys["app_name"], user_id=keys["user_id"], session_id=row["session_id"], state=state
+            )
+            sessions += 1
+
+    store = _event_store(session_service)
+    events = 0
+    for keys, fragment in _fragments(root / "events", PARTITIONING, app_name, user_id):
+        for batch in fragment.to_batches(columns=["session_id", "event_json"], batch_size=batch_rows):
+            group_key, group = None, []
+            for session_id, data in zip(batch.column("session_id").to_pylist(), batch.column("event_json").to_pylist()):
+                key = (keys["app_name"], keys["user_id"], session_id)
+                if key != group_key and group:
+                    await store(group_key, group)
+                    group = []
+                group_key = key
+                group.append(Event.model_validate_json(data))
+            if group:
+                await store(group_key, group)
+            events += batch.num_rows
+
+    if cached is not None:
+        cached.invalidate_all()
+    return {"sessions": sessions, "events": events, "seconds": round(time.perf_counter() - started, 3)}
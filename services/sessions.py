@@ -0,0 +1,359 @@
+"""Session helpers: one-call get-or-create, a cache of open session handles
+and windowed event reads.
+
+`run_session` in 3a.py and 3b.py tried `create_session` and fell back to
+`get_session` on the exception, which is two round trips (two transactions
+with a database service) for every existing session. `get_or_create_session`
+reads first and only creates on a miss. `CachedSessionService` wraps any
+session service and keeps recently used sessions in process, so a hot
+session is not fetched (and, for InMemorySessionService, deep-copied) again
+on every turn.
+
+`iter_events` and `count_events` read a session's events without loading the
+whole session where the service can page (PooledSqliteSessionService), and
+fall back to one get_session call elsewhere.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Optional
+
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.events.event import Event
+from google.adk.sessions.base_session_service import (
+    BaseSessionService,
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+from google.adk.sessions.session import Session
+from google.adk.sessions.state import State
+
+from .state_store import apply_delta, drop_temp
+
+
+EventCursor = tuple[float, str]
+"""A position in a session's history: an event's (timestamp, id), the order events are stored in."""
+
+
+def event_cursor(event: Event) -> EventCursor:
+    """The cursor just at `event`, for reading the events before or after it."""
+    return (event.timestamp, event.id)
+
+
+def window(
+    events: list[Event],
+    *,
+    before: Optional[EventCursor] = None,
+    after: Optional[EventCursor] = None,
+    newest_first: bool = True,
+) -> list[Event]:
+    """The events strictly between two cursors, in cursor order."""
+    selected = [
+        event for event in events
+        if (before is None or event_cursor(event) < before)
+        and (after is None or event_cursor(event) > after)
+    ]
+    return sorted(selected, key=event_cursor, reverse=newest_first)
+
+
+async def iter_events(
+    session_service: BaseSessionService,
+    *,
+    app_name: str,
+    user_id: str,
+    session_id: str,
+    before: Optional[EventCursor] = None,
+    after: Optional[EventCursor] = None,
+    newest_first: bool = True,
+    page_size: int = 200,
+) -> AsyncIterator[Event]:
+    """Yields a session's events between two cursors, newest first by default.
+
+    Services with their own `iter_events` read lazily, one page at a time, so
+    a caller that stops early (say, at the latest compaction event) never
+    touches the older history. Other services load the session once.
+    """
+    paged = getattr(session_service, "iter_events", None)
+    if paged is not None:
+        async for event in paged(
+            app_name=app_name, user_id=user_id, session_id=session_id,
+            before=before, after=after, newest_first=newest_first, page_size=page_size,
+        ):
+            yield event
+        return
+    config = GetSessionConfig(after_timestamp=after[0]) if after else None
+    session = await session_service.get_session(
+        app_name=app_name, user_id=user_id, session_id=session_id, config=config
+    )
+    if session is not None:
+        for event in window(session.events, before=before, after=after, newest_first=newest_first):
+            yield event
+
+
+async def count_events(
+    session_service: BaseSessionService, *, app_name: str, user_id: str, session_id: str
+) -> int:
+    """Number of events stored for the session (0 if it does not exist)."""
+    counter = getattr(session_service, "count_events", None)
+    if counter is not None:
+        return await counter(app_name=app_name, user_id=user_id, session_id=session_id)
+    session = await session_service.get_session(
+        app_name=app_name, user_id=user_id, session_id=session_id
+    )
+    return len(session.events) if session is not None else 0
+
+
+async def get_or_create_session(
+    session_service: BaseSessionService,
+    *,
+    app_name: str,
+    user_id: str,
+    session_id: str,
+    state: Optional[dict[str, Any]] = None,
+) -> tuple[Session, bool]:
+    """Returns the session, creating it if it does not exist yet.
+
+    Works with any session service: one read for an existing session, a read
+    and a create for a new one. If another task creates the session in
+    between, its session is returned.
+
+    Returns:
+        The session, and whether it was created by this call.
+    """
+    if isinstance(session_service, CachedSessionService):
+        return await session_service.get_or_create_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, state=state
+        )
+    session = await session_service.get_session(
+        app_name=app_name, user_id=user_id, session_id=session_id
+    )
+    if session is not None:
+        return session, False
+    try:
+        session = await session_service.create_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, state=state
+        )
+        return session, True
+    except AlreadyExistsError:
+        session = await session_service.get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+        return session, False
+
+
+class CachedSessionService(BaseSessionService):
+    """Wraps a session service and serves repeated get_session calls from memory.
+
+    Returned sessions are shared handles, not copies. Events appended through
+    this service to a cached handle keep it current (the wrapped service
+    updates the handle in place). "user:" and "app:" state an event changes
+    is written through to the user's (or app's) other cached handles, which
+    share it. An append made with a different copy of the session and a
+    delete invalidate the handle. "temp:" keys an invocation left on a handle
+    are dropped when the next invocation appends its first event, as a fresh
+    load would not have them; reads never change a handle, so a concurrent
+    read cannot clear the keys of an invocation still running on it.
+
+    Args:
+        inner: The session service that stores the sessions.
+        max_sessions: Handles kept; the least recently used are dropped.
+        ttl: Seconds a handle is trusted, which bounds how stale it can get
+            when other processes write to the same database (None: forever).
+    """
+
+    def __init__(self, inner: BaseSessionService, max_sessions: int = 1024, ttl: Optional[float] = None):
+        self.inner = inner
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._handles: OrderedDict[tuple[str, str, str], tuple[float, Session]] = OrderedDict()
+        self._stats = dict(hits=0, misses=0, invalidations=0, shared_writes=0)
+
+    def _cached(self, key: tuple[str, str, str]) -> Optional[Session]:
+        with self._lock:
+            entry = self._handles.get(key)
+            if entry is None or (self.ttl is not None and entry[0] < time.time() - self.ttl):
+                self._handles.pop(key, None)
+                self._stats["misses"] += 1
+                return None
+            self._handles.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def _remember(self, session: Session):
+        with self._lock:
+            self._handles[(session.app_name, session.user_id, session.id)] = (time.time(), session)
+            self._handles.move_to_end((session.app_name, session.user_id, session.id))
+            while len(self._handles) > self.max_sessions:
+                self._handles.popitem(last=False)
+
+    def invalidate(self, app_name: str, user_id: Optional[str] = None, session_id: Optional[str] = None):
+        """Drops the cached handles of one session, one user or a whole app."""
+        with self._lock:
+            stale = [
+                key for key in self._handles
+                if key[0] == app_name
+                and (user_id is None or key[1] == user_id)
+                and (session_id is None or key[2] == session_id)
+            ]
+            for key in stale:
+                del self._handles[key]
+            self._stats["invalidations"] += len(stale)
+
+    def invalidate_all(self):
+        """Drops every cached handle."""
+        with self._lock:
+            self._stats["invalidations"] += len(self._handles)
+            self._handles.clear()
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session = await self.inner.create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        self._remember(session)
+        return session
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        # a filtered view of the events is not a handle worth sharing
+        if config is not None:
+            return await self.inner.get_session(
+                app_name=app_name, user_id=user_id, session_id=session_id, config=config
+            )
+        session = self._cached((app_name, user_id, session_id))
+        if session is None:
+            session = await self.inner.get_session(
+                app_name=app_name, user_id=user_id, session_id=session_id
+            )
+            if session is not None:
+                self._remember(session)
+        return session
+
+    async def get_or_create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        state: Optional[dict[str, Any]] = None,
+    ) -> tuple[Session, bool]:
+        """Like the module-level get_or_create_session, answering hot sessions from memory."""
+        session = self._cached((app_name, user_id, session_id))
+        if session is not None:
+            return session, False
+        session, created = await get_or_create_session(
+            self.inner, app_name=app_name, user_id=user_id, session_id=session_id, state=state
+        )
+        self._remember(session)
+        return session, created
+
+    def _complete_handle(self, app_name: str, user_id: str, session_id: str) -> Optional[Session]:
+        """The cached handle, if it holds the whole history (the inner service may load a window)."""
+        if getattr(self.inner, "recent_events", None):
+            return None
+        return self._cached((app_name, user_id, session_id))
+
+    async def iter_events(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        before: Optional[EventCursor] = None,
+        after: Optional[EventCursor] = None,
+        newest_first: bool = True,
+        page_size: int = 200,
+    ) -> AsyncIterator[Event]:
+        """Like the module-level iter_events, reading a hot session's handle instead of storage."""
+        session = self._complete_handle(app_name, user_id, session_id)
+        if session is not None:
+            for event in window(session.events, before=before, after=after, newest_first=newest_first):
+                yield event
+            return
+        async for event in iter_events(
+            self.inner, app_name=app_name, user_id=user_id, session_id=session_id,
+            before=before, after=after, newest_first=newest_first, page_size=page_size,
+        ):
+            yield event
+
+    async def count_events(self, *, app_name: str, user_id: str, session_id: str) -> int:
+        session = self._complete_handle(app_name, user_id, session_id)
+        if session is not None:
+            return len(session.events)
+        return await count_events(self.inner, app_name=app_name, user_id=user_id, session_id=session_id)
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: Optional[str] = None
+    ) -> ListSessionsResponse:
+        return await self.inner.list_sessions(app_name=app_name, user_id=user_id)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        self.invalidate(app_name, user_id, session_id)
+        await self.inner.delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if session.events and session.events[-1].invocation_id != event.invocation_id:
+            # the previous invocation is over; its temp: keys go with it
+            drop_temp(session.state)
+        event = await self.inner.append_event(session, event)
+        if event.partial:
+            return event
+        key = (session.app_name, session.user_id, session.id)
+        with self._lock:
+            entry = self._handles.get(key)
+            if entry is not None and entry[1] is not session:
+                del self._handles[key]
+                self._stats["invalidations"] += 1
+        delta = event.actions.state_delta if event.actions else None
+        if delta:
+            self._share(session, delta)
+        return event
+
+    def _share(self, writer: Session, delta: dict[str, Any]):
+        """Writes the delta's "app:" and "user:" keys through to the other handles that share them.
+
+        A key set to None is removed from those handles, as state_store and
+        the pooled SQLite service do.
+        """
+        app_keys = {k: v for k, v in delta.items() if k.startswith(State.APP_PREFIX)}
+        user_keys = {k: v for k, v in delta.items() if k.startswith(State.USER_PREFIX)}
+        if not app_keys and not user_keys:
+            return
+        with self._lock:
+            for (app_name, user_id, _), (_, handle) in self._handles.items():
+                if handle is writer or app_name != writer.app_name:
+                    continue
+                same_user = user_id == writer.user_id
+                if app_keys or (same_user and user_keys):
+                    apply_delta(handle.state, app_keys)
+                    apply_delta(handle.state, user_keys if same_user else {})
+                    self._stats["shared_writes"] += 1
+
+    async def close(self):
+        """Drops every handle and closes the wrapped service, if it can be closed."""
+        self.invalidate_all()
+        close = getattr(self.inner, "close", None)
+        if close is not None:
+            await close()
+
+    def stats(self) -> dict:
+        """Handle hits, misses, invalidations and shared state written through to handles."""
+        with self._lock:
+            stats = dict(self._stats, sessions=len(self._handles))
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,666 @@
+"""Session service tuned for write throughput on a local SQLite file.
+
+`DatabaseSessionService("sqlite:///...")` commits every event in its own
+SQLAlchemy transaction, after re-reading the session, app and user rows.
+`PooledSqliteSessionService` keeps a small pool of aiosqlite connections open
+(WAL journal, synchronous=NORMAL, a statement cache per connection) and
+buffers the events of one invocation in memory, writing them together with
+the keys of state the invocation changed in a single transaction when the
+invocation's final response arrives.
+
+State is stored one row per key, in a table per scope (app, user, session),
+so a commit writes only the changed keys rather than a whole state blob.
+App and user state is read through a SharedStateTiers cache that every
+commit writes through (see services.state_store); temp: keys are never
+stored.
+
+Buffered events are flushed before any read, when the next invocation of the
+session starts, when `max_batch` is reached and on `flush()`/`close()`. A
+process that dies mid-invocation loses that invocation's unflushed events;
+pass `batch_invocations=False` to commit every event as it is appended.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, AsyncIterator, Optional
+
+import aiosqlite
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.events.event import Event
+from google.adk.sessions.base_session_service import (
+    BaseSessionService,
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+from google.adk.sessions.session import Session
+from google.adk.sessions.state import State
+
+from .sessions import EventCursor
+from .state_store import SharedStateTiers, apply_delta, split_state
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS app_state_keys (
+    app_name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS user_state_keys (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS session_state_keys (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    create_time REAL NOT NULL,
+    update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS events (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    id TEXT NOT NULL,
+    invocation_id TEXT NOT NULL,
+    author TEXT NOT NULL,
+    event_data TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, timestamp, id)
+) WITHOUT ROWID;
+"""
+
+_PRAGMAS = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+PRAGMA busy_timeout = 5000;
+PRAGMA temp_store = MEMORY;
+PRAGMA cache_size = -16384;
+PRAGMA mmap_size = 268435456;
+"""
+
+# constant statement texts, so every connection's statement cache hits
+_INSERT_EVENT = (
+    "INSERT INTO events (app_name, user_id, session_id, timestamp, id, invocation_id, author, event_data)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_UPDATE_SESSION = "UPDATE sessions SET update_time = ? WHERE app_name = ? AND user_id = ? AND id = ?"
+_UPSERT_APP_KEY = (
+    "INSERT INTO app_state_keys (app_name, key, value, update_time) VALUES (?, ?, ?, ?)"
+    " ON CONFLICT (app_name, key) DO UPDATE SET value = excluded.value, update_time = excluded.update_time"
+)
+_DELETE_APP_KEY = "DELETE FROM app_state_keys WHERE app_name = ? AND key = ?"
+_UPSERT_USER_KEY = (
+    "INSERT INTO user_state_keys (app_name, user_id, key, value, update_time) VALUES (?, ?, ?, ?, ?)"
+    " ON CONFLICT (app_name, user_id, key) DO UPDATE SET value = excluded.value, update_time = excluded.update_time"
+)
+_DELETE_USER_KEY = "DELETE FROM user_state_keys WHERE app_name = ? AND user_id = ? AND key = ?"
+_UPSERT_SESSION_KEY = (
+    "INSERT INTO session_state_keys (app_name, user_id, session_id, key, value) VALUES (?, ?, ?, ?, ?)"
+    " ON CONFLICT (app_name, user_id, session_id, key) DO UPDATE SET value = excluded.value"
+)
+_DELETE_SESSION_KEY = "DELETE FROM session_state_keys WHERE app_name = ? AND user_id = ? AND session_id = ? AND key = ?"
+_SELECT_SESSION = "SELECT update_time FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?"
+_SELECT_APP_STATE = "SELECT key, value FROM app_state_keys WHERE app_name = ?"
+_SELECT_USER_STATE = "SELECT key, value FROM user_state_keys WHERE app_name = ? AND user_id = ?"
+_SELECT_SESSION_STATE = (
+    "SELECT key, value FROM session_state_keys WHERE app_name = ? AND user_id = ? AND session_id = ?"
+)
+
+def sqlite_path(db_url: str) -> str:
+    """Filesystem path for a path or a `sqlite:///` / `sqlite+aiosqlite:///` URL."""
+    for scheme in ("sqlite+aiosqlite://", "sqlite://"):
+        if db_url.startswith(scheme):
+            path = db_url[len(scheme):]
+            # sqlite:///relative.db and sqlite:////absolute.db, as in SQLAlchemy
+            return path[1:] if path.startswith("/") else path
+    return db_url
+
+
+def merge_state(app_state: dict, user_state: dict, session_state: dict) -> dict:
+    """The state a session sees: its own keys plus prefixed app and user keys."""
+    merged = dict(session_state)
+    merged.update((State.APP_PREFIX + key, value) for key, value in app_state.items())
+    merged.update((State.USER_PREFIX + key, value) for key, value in user_state.items())
+    return merged
+
+
+def _key_rows(owner: tuple, delta: dict, *extra) -> tuple[list[tuple], list[tuple]]:
+    """(upserts, deletes) parameters for a scope's changed keys; None deletes a key."""
+    upserts, deletes = [], []
+    for key, value in delta.items():
+        if value is None:
+            deletes.append((*owner, key))
+        else:
+            upserts.append((*owner, key, json.dumps(value), *extra))
+    return upserts, deletes
+
+
+@dataclass
+class _Pending:
+    """Events and changed state keys of one session waiting for a commit."""
+
+    invocation_id: str
+    rows: list[tuple] = field(default_factory=list)
+    app: dict = field(default_factory=dict)
+    user: dict = field(default_factory=dict)
+    session: dict = field(default_factory=dict)
+    update_time: float = 0.0
+
+
+class PooledSqliteSessionService(BaseSessionService):
+    """SQLite session service with pooled connections and per-invocation commits.
+
+    As in ADK's own SqliteSessionService, a state value set to None is
+    removed rather than stored as null.
+
+    Args:
+        db_url: SQLite file path or `sqlite:///` URL.
+        pool_size: Read connections; all writes share one connection, since
+            SQLite allows a single writer at a time anyway.
+        batch_invocations: Buffer an invocation's events and commit them
+            together. If False, every event is its own transaction.
+        max_batch: Buffered events per session that force a commit.
+        recent_events: Events loaded by a get_session call without a config
+            (the Runner's call at the start of every turn). None loads them
+            all; a number keeps each turn's cost flat as a session grows, at
+            the price of the agent seeing only that many recent events. Older
+            events stay reachable through iter_events.
+        shared_state: The app and user state cache; services on the same
+            file can share one. A new one by default.
+    """
+
+    def __init__(
+        self,
+        db_url: str = "sessions.db",
+        pool_size: int = 4,
+        batch_invocations: bool = True,
+        max_batch: int = 256,
+        recent_events: Optional[int] = None,
+        shared_state: Optional[SharedStateTiers] = None,
+    ):
+        self.path = sqlite_path(db_url)
+        self.pool_size = pool_size
+        self.batch_invocations = batch_invocations
+        self.max_batch = max_batch
+        self.recent_events = recent_events
+        self.shared_state = shared_state or SharedStateTiers()
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._readers: list[aiosqlite.Connection] = []
+        self._loop = None
+        self._pending: dict[tuple[str, str, str], _Pending] = {}
+        self._queued: set[tuple[str, str, str]] = set()
+        self._stats = dict(events=0, transactions=0, flushes=0, flushed_events=0, state_keys_written=0)
+
+    async def _connect(self) -> aiosqlite.Connection:
+        connection = await aiosqlite.connect(self.path, isolation_level=None, cached_statements=256)
+        await connection.executescript(_PRAGMAS)
+        return connection
+
+    async def _ready(self):
+        """Opens the pool on first use; rebinds its locks when the event loop changes."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._open_lock = asyncio.Lock()
+            self._write_lock = asyncio.Lock()
+            self._idle: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+            for connection in self._readers:
+                self._idle.put_nowait(connection)
+        if self._writer is not None:
+            return
+        async with self._open_lock:
+            if self._writer is None:
+                if os.path.dirname(self.path):
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                writer = await self._connect()
+                try:
+                    await writer.executescript(_SCHEMA)
+                except BaseException:
+                    await writer.close()
+                    raise
+                for _ in range(self.pool_size):
+                    connection = await self._connect()
+                    self._readers.append(connection)
+                    self._idle.put_nowait(connection)
+                self._writer = writer
+
+    def _visible(self, app_name: str, user_id: Optional[str]) -> list[tuple[str, str, str]]:
+        """Buffered sessions whose events or state a read of the user (or app) would see."""
+        return [
+            key for key, pending in self._pending.items()
+            if key[0] == app_name and (user_id is None or key[1] == user_id or pending.app)
+        ]
+
+    async def _read(self, fn, app_name: str, user_id: Optional[str] = None):
+        """Runs `fn(connection)` inside one read transaction on a pooled connection.
+
+        Buffered events the read can see (the user's sessions, or the app's
+        when user_id is None, and any pending app state) are committed first.
+        """
+        await self._ready()
+        await self.flush(self._visible(app_name, user_id))
+        connection = await self._idle.get()
+        try:
+            await connection.execute("BEGIN")
+            try:
+                return await fn(connection)
+            finally:
+                await connection.execute("COMMIT")
+        finally:
+            self._idle.put_nowait(connection)
+
+    async def _write(self, fn):
+        """Runs `fn(connection)` inside one write transaction."""
+        await self._ready()
+        async with self._write_lock:
+            return await self._transaction(fn)
+
+    async def _transaction(self, fn):
+        """Runs `fn` on the writer connection between BEGIN IMMEDIATE and COMMIT; needs the write lock."""
+        await self._writer.execute("BEGIN IMMEDIATE")
+        try:
+            result = await fn(self._writer)
+        except BaseException:
+            await self._writer.execute("ROLLBACK")
+            raise
+        await self._writer.execute("COMMIT")
+        self._stats["transactions"] += 1
+        return result
+
+    @staticmethod
+    async def _state(connection: aiosqlite.Connection, sql: str, params: tuple) -> dict:
+        return {key: json.loads(value) for key, value in await connection.execute_fetchall(sql, params)}
+
+    async def _shared(self, connection: aiosqlite.Connection, app_name: str, user_id: str) -> tuple[dict, dict]:
+        """App and user state from the shared tier, read from storage (and cached) on a miss."""
+        generation = self.shared_state.generation()
+        app_state = self.shared_state.app(app_name)
+        user_state = self.shared_state.user(app_name, user_id)
+        if app_state is not None and user_state is not None:
+            return app_state, user_state
+        read_app = app_state is None
+        if read_app:
+            app_state = await self._state(connection, _SELECT_APP_STATE, (app_name,))
+        if user_state is None:
+            user_state = await self._state(connection, _SELECT_USER_STATE, (app_name, user_id))
+            self.shared_state.fill(generation, app_name, app_state if read_app else None, user_id, user_state)
+        else:
+            self.shared_state.fill(generation, app_name, app_state)
+        return app_state, user_state
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = (session_id or "").strip() or str(uuid.uuid4())
+        deltas = split_state(state)
+        now = time.time()
+
+        async def create(connection):
+            rows = await connection.execute_fetchall(
+                "SELECT 1 FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?",
+                (app_name, user_id, session_id),
+            )
+            if rows:
+                raise AlreadyExistsError(f"Session with id {session_id} already exists.")
+            await self._write_keys(
+                connection,
+                apps={app_name: (deltas["app"], now)},
+                users={(app_name, user_id): (deltas["user"], now)},
+                sessions={(app_name, user_id, session_id): deltas["session"]},
+            )
+            await connection.execute(
+                "INSERT INTO sessions (app_name, user_id, id, create_time, update_time) VALUES (?, ?, ?, ?, ?)",
+                (app_name, user_id, session_id, now, now),
+            )
+            # read before this commit's own changes are written through, so they are applied here
+            app_state = self.shared_state.app(app_name)
+            if app_state is None:
+                app_state = await self._state(connection, _SELECT_APP_STATE, (app_name,))
+            user_state = self.shared_state.user(app_name, user_id)
+            if user_state is None:
+                user_state = await self._state(connection, _SELECT_USER_STATE, (app_name, user_id))
+            return merge_state(
+                apply_delta(app_state, deltas["app"]),
+                apply_delta(user_state, deltas["user"]),
+                {key: value for key, value in deltas["session"].items() if value is not None},
+            )
+
+        # the new session sees the user's and app's state, including buffered changes
+        await self.flush(self._visible(app_name, user_id))
+        merged = await self._write(create)
+        self.shared_state.write(app_name, user_id, deltas["app"], deltas["user"])
+        return Session(
+            app_name=app_name, user_id=user_id, id=session_id, state=merged, events=[],
+            last_update_time=now,
+        )
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        if config is None and self.recent_events:
+            config = GetSessionConfig(num_recent_events=self.recent_events)
+
+        async def load(connection):
+            # first, so the shared tier's generation is taken before this read's snapshot
+            app_state, user_state = await self._shared(connection, app_name, user_id)
+            rows = await connection.execute_fetchall(_SELECT_SESSION, (app_name, user_id, session_id))
+            if not rows:
+                return None
+            (update_time,) = rows[0]
+            sql = "SELECT event_data FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?"
+            params: list[Any] = [app_name, user_id, session_id]
+            if config and config.after_timestamp:
+                sql += " AND timestamp >= ?"
+                params.append(config.after_timestamp)
+            sql += " ORDER BY timestamp DESC, id DESC"
+            if config and config.num_recent_events:
+                sql += " LIMIT ?"
+                params.append(config.num_recent_events)
+            events = await connection.execute_fetchall(sql, params)
+            session_state = await self._state(connection, _SELECT_SESSION_STATE, (app_name, user_id, session_id))
+            return Session(
+                app_name=app_name,
+                user_id=user_id,
+                id=session_id,
+                state=merge_state(app_state, user_state, session_state),
+                events=[Event.model_validate_json(data) for (data,) in reversed(events)],
+                last_update_time=update_time,
+            )
+
+        return await self._read(load, app_name, user_id)
+
+    async def iter_events(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        before: Optional[EventCursor] = None,
+        after: Optional[EventCursor] = None,
+        newest_first: bool = True,
+        page_size: int = 200,
+    ) -> AsyncIterator[Event]:
+        """Yields the session's events between two cursors, one page per query.
+
+        Pages are keyset range scans of the events primary key, so reaching
+        back into a long history costs the pages read, not the history size.
+        """
+        order = "DESC" if newest_first else "ASC"
+        while True:
+            sql = "SELECT timestamp, id, event_data FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?"
+            params: list[Any] = [app_name, user_id, session_id]
+            if before is not None:
+                sql += " AND (timestamp, id) < (?, ?)"
+                params.extend(before)
+            if after is not None:
+                sql += " AND (timestamp, id) > (?, ?)"
+                params.extend(after)
+            sql += f" ORDER BY timestamp {order}, id {order} LIMIT ?"
+            params.append(page_size)
+
+            async def page(connection, sql=sql, params=params):
+                return await connection.execute_fetchall(sql, params)
+
+            rows = await self._read(page, app_name, user_id)
+            for _, _, data in rows:
+                yield Event.model_validate_json(data)
+            if len(rows) < page_size:
+                return
+            if newest_first:
+                before = tuple(rows[-1][:2])
+            else:
+                after = tuple(rows[-1][:2])
+
+    async def count_events(self, *, app_name: str, user_id: str, session_id: str) -> int:
+        """Stored events of the session, counted on the index without decoding them."""
+        async def count(connection):
+            rows = await connection.execute_fetchall(
+                "SELECT COUNT(*) FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                (app_name, user_id, session_id),
+            )
+            return rows[0][0]
+
+        return await self._read(count, app_name, user_id)
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: Optional[str] = None
+    ) -> ListSessionsResponse:
+        async def load(connection):
+            where, params = "app_name = ?", (app_name,)
+            if user_id is not None:
+                where, params = "app_name = ? AND user_id = ?", (app_name, user_id)
+            user_states: dict[str, dict] = {}
+            for user, key, value in await connection.execute_fetchall(
+                f"SELECT user_id, key, value FROM user_state_keys WHERE {where}", params
+            ):
+                user_states.setdefault(user, {})[key] = json.loads(value)
+            session_states: dict[tuple[str, str], dict] = {}
+            for user, session_id, key, value in await connection.execute_fetchall(
+                f"SELECT user_id, session_id, key, value FROM session_state_keys WHERE {where}", params
+            ):
+                session_states.setdefault((user, session_id), {})[key] = json.loads(value)
+            app_state = await self._state(connection, _SELECT_APP_STATE, (app_name,))
+            return [
+                Session(
+                    app_name=app_name,
+                    user_id=user,
+                    id=session_id,
+                    state=merge_state(
+                        app_state, user_states.get(user, {}), session_states.get((user, session_id), {})
+                    ),
+                    events=[],
+                    last_update_time=update_time,
+                )
+                for user, session_id, update_time in await connection.execute_fetchall(
+                    f"SELECT user_id, id, update_time FROM sessions WHERE {where}", params
+                )
+            ]
+
+        return ListSessionsResponse(sessions=await self._read(load, app_name, user_id))
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        self._pending.pop((app_name, user_id, session_id), None)
+
+        async def delete(connection):
+            key = (app_name, user_id, session_id)
+            await connection.execute(
+                "DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+            )
+            await connection.execute(
+                "DELETE FROM session_state_keys WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+            )
+            await connection.execute(
+                "DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key
+            )
+
+        await self._write(delete)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        event = await super().append_event(session=session, event=event)
+        if event.partial:
+            return event
+        key = (session.app_name, session.user_id, session.id)
+        pending = self._pending.get(key)
+        if pending is not None and pending.invocation_id != event.invocation_id:
+            await self.flush([key])
+            pending = None
+        if pending is None:
+            pending = self._pending[key] = _Pending(event.invocation_id)
+
+        pending.rows.append(
+            (
+                *key, event.timestamp, event.id, event.invocation_id, event.author,
+                event.model_dump_json(exclude_none=True),
+            )
+        )
+        if event.actions and event.actions.state_delta:
+            deltas = split_state(event.actions.state_delta)
+            pending.app.update(deltas["app"])
+            pending.user.update(deltas["user"])
+            pending.session.update(deltas["session"])
+        pending.update_time = max(pending.update_time, event.timestamp)
+        session.last_update_time = pending.update_time
+        self._stats["events"] += 1
+
+        # the user's message opens an invocation; the final response closes it
+        closes = event.author != "user" and event.is_final_response()
+        if not self.batch_invocations or closes or len(pending.rows) >= self.max_batch:
+            await self.flush([key])
+        return event
+
+    async def store_events(self, app_name: str, user_id: str, session_id: str, events: list[Event]):
+        """Stores events of an existing session as they are, in one transaction.
+
+        For bulk imports, oldest first: the events' state deltas are not
+        applied, since the session was created with its final state, and the
+        session's update time becomes the last event's.
+        """
+        key = (app_name, user_id, session_id)
+        await self.flush([key])
+        rows = [
+            (*key, event.timestamp, event.id, event.invocation_id, event.author, event.model_dump_json(exclude_none=True))
+            for event in events
+        ]
+
+        async def store(connection):
+            await connection.executemany(_INSERT_EVENT, rows)
+            await connection.execute(_UPDATE_SESSION, (events[-1].timestamp, *key))
+
+        await self._write(store)
+        self._stats["events"] += len(rows)
+
+    async def flush(self, keys: Optional[list[tuple[str, str, str]]] = None):
+        """Commits buffered events (of the given sessions, or all) and waits for commits in flight.
+
+        Group commit: whoever gets the write lock also commits every session
+        other tasks queued for flushing while it waited, in the same
+        transaction.
+        """
+        await self._ready()
+        wanted = set(self._pending) if keys is None else {key for key in keys if key in self._pending}
+        if not wanted and not self._write_lock.locked():
+            return
+        self._queued |= wanted
+        async with self._write_lock:
+            keys = [key for key in self._queued | wanted if key in self._pending]
+            self._queued.clear()
+            batch = [(key, self._pending.pop(key)) for key in keys]
+            if not batch:
+                return
+            try:
+                await self._transaction(partial(self._commit, batch))
+            except BaseException:
+                self._restore(batch)
+                raise
+            # still under the write lock, so the cache sees commits in order
+            for (app_name, user_id, _), pending in batch:
+                self.shared_state.write(app_name, user_id, pending.app, pending.user)
+        self._stats["flushes"] += 1
+        self._stats["flushed_events"] += sum(len(pending.rows) for _, pending in batch)
+
+    async def _commit(self, batch: list[tuple[tuple[str, str, str], _Pending]], connection: aiosqlite.Connection):
+        """Writes a batch with one statement per kind of row, whatever its size."""
+        apps: dict[str, tuple[dict, float]] = {}
+        users: dict[tuple[str, str], tuple[dict, float]] = {}
+        for (app_name, user_id, _), pending in batch:
+            if pending.app:
+                state, _ = apps.get(app_name, ({}, 0.0))
+                apps[app_name] = (state | pending.app, pending.update_time)
+            if pending.user:
+                state, _ = users.get((app_name, user_id), ({}, 0.0))
+                users[app_name, user_id] = (state | pending.user, pending.update_time)
+        await connection.executemany(_INSERT_EVENT, [row for _, pending in batch for row in pending.rows])
+        await self._write_keys(
+            connection, apps=apps, users=users, sessions={key: pending.session for key, pending in batch}
+        )
+        await connection.executemany(
+            _UPDATE_SESSION, [(pending.update_time, *key) for key, pending in batch]
+        )
+
+    async def _write_keys(
+        self,
+        connection: aiosqlite.Connection,
+        apps: dict[str, tuple[dict, float]],
+        users: dict[tuple[str, str], tuple[dict, float]],
+        sessions: dict[tuple[str, str, str], dict],
+    ):
+        """Upserts the changed keys of each scope and deletes the ones set to None."""
+        statements = [
+            (_UPSERT_APP_KEY, _DELETE_APP_KEY, [_key_rows((app,), delta, at) for app, (delta, at) in apps.items()]),
+            (_UPSERT_USER_KEY, _DELETE_USER_KEY, [_key_rows(user, delta, at) for user, (delta, at) in users.items()]),
+            (_UPSERT_SESSION_KEY, _DELETE_SESSION_KEY, [_key_rows(key, delta) for key, delta in sessions.items()]),
+        ]
+        for upsert, delete, rows in statements:
+            upserts = [row for scope_upserts, _ in rows for row in scope_upserts]
+            deletes = [row for _, scope_deletes in rows for row in scope_deletes]
+            if upserts:
+                await connection.executemany(upsert, upserts)
+            if deletes:
+                await connection.executemany(delete, deletes)
+            self._stats["state_keys_written"] += len(upserts) + len(deletes)
+
+    def _restore(self, batch: list[tuple[tuple[str, str, str], _Pending]]):
+        """Puts a failed batch back, ahead of anything appended meanwhile."""
+        for key, pending in batch:
+            later = self._pending.get(key)
+            if later is not None:
+                pending.rows.extend(later.rows)
+                pending.app.update(later.app)
+                pending.user.update(later.user)
+                pending.session.update(later.session)
+                pending.update_time = max(pending.update_time, later.update_time)
+                pending.invocation_id = later.invocation_id
+            self._pending[key] = pending
+
+    def stats(self) -> dict:
+        """Events appended, transactions committed, state keys written and events still buffered."""
+        stats = dict(self._stats, pending=sum(len(p.rows) for p in self._pending.values()))
+        stats["shared_state"] = self.shared_state.stats()
+        stats["events_per_flush"] = (
+            round(stats["flushed_events"] / stats["flushes"], 2) if stats["flushes"] else 0.0
+        )
+        return stats
+
+    async def close(self):
+        """Flushes buffered events and closes every connection."""
+        if self._writer is None:
+            return
+        await self.flush()
+        for connection in [self._writer, *self._readers]:
+            await connection.close()
+        self._writer, self._readers, self._loop = None, [], None
+
+    async def __aenter__(self) -> "PooledSqliteSessionService":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
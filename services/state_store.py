@@ -0,0 +1,172 @@
+"""Tiered session state: app, user and session keys kept apart, temp keys never stored.
+
+ADK hands an agent one flat state dict whose keys live at four scopes.
+`app:` keys are shared by every session of the app, `user:` keys by every
+session of the user, unprefixed keys belong to the session, and `temp:` keys
+last one invocation. `split_state` sorts a state dict or a delta into those
+tiers.
+
+`SharedStateTiers` is the in-process tier for the two shared scopes. A
+session service reads app and user state from it instead of from storage,
+and writes every committed change through it, so the next session loaded
+sees the change without a read. PooledSqliteSessionService uses it, and
+stores each scope in its own table with one row per key, so a commit writes
+only the keys the invocation changed.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from google.adk.sessions.state import State
+
+SCOPES = ("app", "user", "session", "temp")
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def split_state(state: Optional[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """Sorts keys into their scope, with the app:, user: and temp: prefixes removed."""
+    tiers: dict[str, dict[str, Any]] = {scope: {} for scope in SCOPES}
+    for key, value in (state or {}).items():
+        if key.startswith(State.APP_PREFIX):
+            tiers["app"][key.removeprefix(State.APP_PREFIX)] = value
+        elif key.startswith(State.USER_PREFIX):
+            tiers["user"][key.removeprefix(State.USER_PREFIX)] = value
+        elif key.startswith(State.TEMP_PREFIX):
+            tiers["temp"][key.removeprefix(State.TEMP_PREFIX)] = value
+        else:
+            tiers["session"][key] = value
+    return tiers
+
+
+def apply_delta(state: dict[str, Any], delta: dict[str, Any]) -> dict[str, Any]:
+    """Applies changed keys to a scope's state in place; None removes a key, as in storage."""
+    for key, value in delta.items():
+        if value is None:
+            state.pop(key, None)
+        else:
+            state[key] = value
+    return state
+
+
+def drop_temp(state: dict[str, Any]) -> int:
+    """Removes the temp: keys an invocation left in a live state dict; returns how many."""
+    stale = [key for key in state if key.startswith(State.TEMP_PREFIX)]
+    for key in stale:
+        del state[key]
+    return len(stale)
+
+
+def _copy(state: dict[str, Any]) -> dict[str, Any]:
+    """A copy callers may change, nested values included, without touching the tier."""
+    return {key: value if isinstance(value, _SCALARS) else copy.deepcopy(value) for key, value in state.items()}
+
+
+class SharedStateTiers:
+    """Write-through cache of app and user state, shared by every session in the process.
+
+    Only committed state belongs here: readers fill it from storage and
+    writers patch it after their commit. A fill is dropped when any write
+    happened since its read began (see `generation`), so a slow read cannot
+    put back a value a commit has replaced.
+
+    Args:
+        max_users: User states kept; the least recently used are dropped.
+            App states are few and are all kept.
+        ttl: Seconds a cached state is trusted, which bounds how stale it
+            can get when other processes write to the same storage (None:
+            forever).
+    """
+
+    def __init__(self, max_users: int = 10_000, ttl: Optional[float] = None):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._apps: dict[str, tuple[float, dict]] = {}
+        self._users: OrderedDict[tuple[str, str], tuple[float, dict]] = OrderedDict()
+        self._writes = 0
+        self._stats = dict(hits=0, misses=0, fills=0, writes=0, keys_written=0)
+
+    def _fresh(self, entry: Optional[tuple[float, dict]]) -> Optional[dict]:
+        if entry is None or (self.ttl is not None and entry[0] < time.time() - self.ttl):
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        return _copy(entry[1])
+
+    def generation(self) -> int:
+        """Taken before a storage read and passed to `fill` after it."""
+        with self._lock:
+            return self._writes
+
+    def app(self, app_name: str) -> Optional[dict]:
+        """A copy of the app's state, or None if it is not cached."""
+        with self._lock:
+            return self._fresh(self._apps.get(app_name))
+
+    def user(self, app_name: str, user_id: str) -> Optional[dict]:
+        """A copy of the user's state, or None if it is not cached."""
+        with self._lock:
+            state = self._fresh(self._users.get((app_name, user_id)))
+            if state is not None:
+                self._users.move_to_end((app_name, user_id))
+            return state
+
+    def fill(
+        self,
+        generation: int,
+        app_name: str,
+        app_state: Optional[dict] = None,
+        user_id: Optional[str] = None,
+        user_state: Optional[dict] = None,
+    ):
+        """Caches state just read from storage, unless a write came in since `generation`."""
+        with self._lock:
+            if generation != self._writes:
+                return
+            now = time.time()
+            if app_state is not None:
+                self._apps[app_name] = (now, _copy(app_state))
+            if user_id is not None and user_state is not None:
+                self._users[(app_name, user_id)] = (now, _copy(user_state))
+                self._users.move_to_end((app_name, user_id))
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            self._stats["fills"] += 1
+
+    def write(self, app_name: str, user_id: Optional[str], app_delta: dict, user_delta: dict):
+        """Applies committed changes to the cached states (uncached ones are read when needed)."""
+        if not app_delta and not user_delta:
+            return
+        with self._lock:
+            self._writes += 1
+            self._stats["writes"] += 1
+            self._stats["keys_written"] += len(app_delta) + len(user_delta)
+            if app_delta and app_name in self._apps:
+                apply_delta(self._apps[app_name][1], _copy(app_delta))
+            if user_delta and (app_name, user_id) in self._users:
+                apply_delta(self._users[(app_name, user_id)][1], _copy(user_delta))
+
+    def invalidate(self, app_name: Optional[str] = None, user_id: Optional[str] = None):
+        """Drops the cached state of one user, one app and its users, or everything."""
+        with self._lock:
+            self._writes += 1
+            if app_name is None:
+                self._apps.clear()
+                self._users.clear()
+                return
+            if user_id is None:
+                self._apps.pop(app_name, None)
+            for key in [key for key in self._users if key[0] == app_name and user_id in (None, key[1])]:
+                del self._users[key]
+
+    def stats(self) -> dict:
+        """Cache hits and misses, fills from storage and write-throughs."""
+        with self._lock:
+            stats = dict(self._stats, apps=len(self._apps), users=len(self._users))
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
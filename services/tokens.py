@@ -0,0 +1,20 @@
+"""The one token estimate used for budgets and accounting, with no tokenizer call.
+
+Prompt budgets (memory prefetch, compaction), context accounting and the
+benchmark stub model's usage metadata all count with these, so their
+numbers agree with each other.
+"""
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token, rounded up)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """The text cut to about `tokens` tokens, with "..." marking the cut."""
+    if estimate_tokens(text) <= tokens:
+        return text
+    return text[: max(tokens * CHARS_PER_TOKEN - 3, 0)] + "..."
@@ -0,0 +1,259 @@
+"""Memory service over hashed character n-gram vectors in a memory-mapped matrix.
+
+Needs no network and no embedding model. Each event's text is turned into
+character 3-5 grams, which are hashed (with a random sign) into a fixed
+number of dimensions, and the L2-normalized vector becomes one row of a
+float32 matrix in a memory-mapped file. A query is encoded the same way and
+answered with a dot product against the matrix, in fixed-size row chunks,
+keeping the top_k rows of the asking user.
+
+N-gram overlap matches spelling variants ("blue green" / "blue-green",
+"color" / "colours"); it does not know that "teal" and "blue-green" are
+related. Vectors and metadata live on disk, so a restarted process searches
+the stored history right away without re-ingesting sessions.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+import mmh3
+import numpy as np
+from google.adk.events.event import Event
+from google.adk.memory import _utils
+from google.adk.memory.base_memory_service import BaseMemoryService, SearchMemoryResponse
+from google.adk.memory.memory_entry import MemoryEntry
+from google.adk.sessions.session import Session
+from google.genai import types
+
+from .search_cache import normalize_query
+
+
+def _event_text(event: Event) -> str:
+    return " ".join(part.text for part in event.content.parts if part.text)
+
+
+class HashedNgramMemoryService(BaseMemoryService):
+    """Vector memory with a memory-mapped float32 matrix and SQLite metadata.
+
+    Args:
+        path: Directory holding vectors.f32, owners.i32 and meta.db.
+        dim: Vector dimensions. Fixed when the directory is created.
+        ngram_range: Smallest and largest character n-gram.
+        top_k: Most memories returned per search.
+        min_score: Cosine similarity below which rows are not returned.
+        chunk_rows: Rows multiplied per step, which bounds search memory.
+    """
+
+    def __init__(
+        self,
+        path: str = "vector_memory",
+        dim: int = 1024,
+        ngram_range: tuple[int, int] = (3, 5),
+        top_k: int = 10,
+        min_score: float = 0.1,
+        chunk_rows: int = 65_536,
+    ):
+        self.path = path
+        self.ngram_range = ngram_range
+        self.top_k = top_k
+        self.min_score = min_score
+        self.chunk_rows = chunk_rows
+        self._lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(path, "meta.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL);
+            CREATE TABLE IF NOT EXISTS entries (
+                row INTEGER PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                event_id TEXT NOT NULL,
+                author TEXT,
+                timestamp REAL NOT NULL,
+                content TEXT NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS entries_event ON entries (session_id, event_id);"""
+        )
+        stored = self._db.execute("SELECT value FROM settings WHERE key = 'dim'").fetchone()
+        if stored is None:
+            self._db.execute("INSERT INTO settings VALUES ('dim', ?)", (str(dim),))
+        elif int(stored[0]) != dim:
+            raise ValueError(f"{path} was built with dim={stored[0]}, not {dim}")
+        self._db.commit()
+        self.dim = dim
+
+        self._rows = self._db.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM entries").fetchone()[0]
+        self._vectors = self._owners = None
+        self._open(max(self._rows, 1024))
+
+    def _open(self, capacity: int):
+        """(Re)maps the vector and owner files with room for `capacity` rows."""
+        for name, dtype, width in (("vectors.f32", np.float32, self.dim), ("owners.i32", np.int32, 1)):
+            filename = os.path.join(self.path, name)
+            size = capacity * width * np.dtype(dtype).itemsize
+            with open(filename, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+        self._capacity = capacity
+        self._vectors = np.memmap(
+            os.path.join(self.path, "vectors.f32"), dtype=np.float32, mode="r+",
+            shape=(capacity, self.dim),
+        )
+        self._owners = np.memmap(
+            os.path.join(self.path, "owners.i32"), dtype=np.int32, mode="r+", shape=(capacity,)
+        )
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """L2-normalized hashed n-gram vectors, one row per text."""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        low, high = self.ngram_range
+        for row, text in enumerate(texts):
+            padded = f" {normalize_query(text)} "
+            grams = [
+                padded[i : i + n]
+                for n in range(low, high + 1)
+                for i in range(len(padded) - n + 1)
+            ]
+            if not grams:
+                continue
+            hashes = np.fromiter((mmh3.hash(gram) for gram in grams), dtype=np.int64, count=len(grams))
+            signs = np.where(hashes & 1, 1.0, -1.0).astype(np.float32)
+            np.add.at(vectors[row], (hashes >> 1) % self.dim, signs)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _user_id(self, app_name: str, user_id: str, create: bool) -> Optional[int]:
+        key = f"{app_name}/{user_id}"
+        row = self._db.execute("SELECT id FROM users WHERE key = ?", (key,)).fetchone()
+        if row is not None or not create:
+            return row and row[0]
+        return self._db.execute("INSERT INTO users (key) VALUES (?)", (key,)).lastrowid
+
+    async def add_session_to_memory(self, session: Session):
+        """Encodes and appends the session's events that are not stored yet."""
+        with self._lock:
+            known = {
+                event_id
+                for (event_id,) in self._db.execute(
+                    "SELECT event_id FROM entries WHERE session_id = ?", (session.id,)
+                )
+            }
+            events = [
+                event for event in session.events
+                if event.id not in known and event.content and event.content.parts
+                and _event_text(event).strip()
+            ]
+            if not events:
+                return
+            owner = self._user_id(session.app_name, session.user_id, create=True)
+            start, end = self._rows, self._rows + len(events)
+            if end > self._capacity:
+                self._vectors.flush()
+                self._open(max(end, self._capacity * 2))
+            self._vectors[start:end] = self.embed([_event_text(event) for event in events])
+            self._owners[start:end] = owner
+            self._vectors.flush()
+            self._owners.flush()
+            self._db.executemany(
+                "INSERT INTO entries (row, session_id, event_id, author, timestamp, content)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        start + n, session.id, event.id, event.author, event.timestamp,
+                        event.content.model_dump_json(exclude_none=True),
+                    )
+                    for n, event in enumerate(events)
+                ],
+            )
+            self._db.commit()
+            self._rows = end
+
+    def _top_k(self, queries: np.ndarray, owner: int) -> list[list[tuple[int, float]]]:
+        """Best (row, score) pairs per query row, scanning the matrix in chunks."""
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, self._rows, self.chunk_rows):
+            end = min(start + self.chunk_rows, self._rows)
+            scores = queries @ self._vectors[start:end].T
+            scores[:, self._owners[start:end] != owner] = -np.inf
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            best_rows = np.concatenate([best_rows, rows], axis=1)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            if best_scores.shape[1] > self.top_k:
+                keep = np.argpartition(-best_scores, self.top_k, axis=1)[:, : self.top_k]
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+
+        results = []
+        for rows, scores in zip(best_rows, best_scores):
+            order = np.argsort(-scores)
+            results.append(
+                [
+                    (int(rows[i]), float(scores[i]))
+                    for i in order
+                    if scores[i] >= self.min_score
+                ]
+            )
+        return results
+
+    def _entries(self, rows: list[int]) -> list[MemoryEntry]:
+        if not rows:
+            return []
+        found = {
+            row: (author, timestamp, content)
+            for row, author, timestamp, content in self._db.execute(
+                "SELECT row, author, timestamp, content FROM entries"
+                f" WHERE row IN ({','.join('?' * len(rows))})",
+                rows,
+            )
+        }
+        return [
+            MemoryEntry(
+                content=types.Content.model_validate(json.loads(found[row][2])),
+                author=found[row][0],
+                timestamp=_utils.format_timestamp(found[row][1]),
+            )
+            for row in rows
+        ]
+
+    async def search_memory(
+        self, *, app_name: str, user_id: str, query: str
+    ) -> SearchMemoryResponse:
+        """Returns up to top_k remembered events, most similar first."""
+        return (await self.search_memory_batch(app_name=app_name, user_id=user_id, queries=[query]))[0]
+
+    async def search_memory_batch(
+        self, *, app_name: str, user_id: str, queries: list[str]
+    ) -> list[SearchMemoryResponse]:
+        """Answers several queries with one pass over the matrix."""
+        with self._lock:
+            owner = self._user_id(app_name, user_id, create=False)
+            if owner is None or not self._rows:
+                return [SearchMemoryResponse() for _ in queries]
+            matches = self._top_k(self.embed(queries), owner)
+            return [
+                SearchMemoryResponse(memories=self._entries([row for row, _ in found]))
+                for found in matches
+            ]
+
+    def stats(self) -> dict:
+        """Stored rows, capacity and file sizes."""
+        with self._lock:
+            return {
+                "events": self._rows,
+                "capacity": self._capacity,
+                "dim": self.dim,
+                "vector_mb": round(self._capacity * self.dim * 4 / 2**20, 1),
+            }
+
+    def close(self):
+        with self._lock:
+            self._vectors.flush()
+            self._owners.flush()
+            self._vectors = self._owners = None
+            self._db.close()